@@ -1,5 +1,9 @@
 """
 ASGI config for VentaLibros project.
+
+Para producción con uvicorn:
+
+    gunicorn VentaLibros.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
 """
 
 import os
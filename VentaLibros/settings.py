@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir también a los demás middleware; inactivo sin TIENDA_MEDICION
+    'tienda.medicion.MedicionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +45,8 @@ ROOT_URLCONF = 'VentaLibros.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el render cuando TIENDA_MEDICION está activo
+        'BACKEND': 'tienda.medicion.PlantillasMedidas',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -52,6 +55,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tienda.context_processors.carrito',
+                'tienda.context_processors.categorias',
             ],
         },
     },
@@ -64,6 +69,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # La base de pruebas va en disco: las pruebas con varios hilos necesitan
+        # bloqueos entre conexiones, que la base en memoria compartida no espera
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -99,6 +107,16 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# En producción con varios procesos conviene un caché compartido (Redis o Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Una entrada por tarjeta de libro en caché; revisa la tasa de aciertos del panel
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -110,3 +128,64 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/admin/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Reservas de stock
+TIENDA_RESERVA_MINUTOS = 15
+TIENDA_DISPONIBLES_CACHE_SEGUNDOS = 30
+# El detalle de un libro muestra la cifra exacta de unidades solo desde esta
+# cantidad; por encima dice "Disponible" y las reservas no renuevan la página
+TIENDA_POCAS_UNIDADES = 5
+
+# Dónde se guarda el carrito de los visitantes anónimos: 'sesion' (sin filas ni
+# reservas de stock) o 'bd' (Carrito con reservas, como los usuarios registrados)
+TIENDA_CARRITO_ANONIMO = 'sesion'
+
+# Días sin cambios tras los que limpiar_carritos elimina un carrito anónimo o de
+# un usuario registrado, nunca menos que SESSION_COOKIE_AGE; con 0 en los de
+# usuarios estos se conservan siempre
+TIENDA_CARRITO_INACTIVO_DIAS = 30
+TIENDA_CARRITO_USUARIO_INACTIVO_DIAS = 180
+
+# Segundos que las estadísticas del panel del vendedor permanecen en caché
+TIENDA_PANEL_CACHE_SEGUNDOS = 300
+
+# Segundos que se reutiliza el número de resultados del catálogo
+TIENDA_CONTEO_CACHE_SEGUNDOS = 300
+
+# Filas a partir de las cuales los listados del admin estiman el total en lugar
+# de contarlo (ver PaginadorEstimado en tienda/paginacion.py)
+TIENDA_CONTEO_ESTIMADO_DESDE = 10000
+
+# Segundos que se guardan los fragmentos de plantilla; las claves llevan versión
+TIENDA_FRAGMENTOS_CACHE_SEGUNDOS = 3600
+
+# Anchos en píxeles de las miniaturas de las portadas (ver tienda/miniaturas.py)
+TIENDA_MINIATURAS_ANCHOS = [80, 160, 320, 640]
+
+# Procesos que generan las miniaturas de las portadas subidas desde el admin
+TIENDA_MINIATURAS_PROCESOS = 1
+
+# Segundos que se guardan las páginas completas para visitantes anónimos
+TIENDA_PAGINAS_CACHE_SEGUNDOS = 600
+
+# Server-Timing y una línea JSON por petición en el logger tienda.medicion con
+# consultas SQL, render y tiempo total; las vistas que pasan su presupuesto de
+# consultas se registran como advertencia (presupuestos por nombre de URL)
+TIENDA_MEDICION = False
+TIENDA_MEDICION_PRESUPUESTO_CONSULTAS = 20
+TIENDA_MEDICION_PRESUPUESTOS = {
+    'index': 6,
+    'detalle_libro': 6,
+    'ver_carrito': 5,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tienda.medicion': {'handlers': ['consola'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,104 @@
+"""
+Listados del admin de carritos, items y pedidos sobre tablas grandes.
+
+Genera datos con ``generar_datos`` y mide cada listado (primera página, una
+página profunda y una búsqueda) con ``PaginadorEstimado`` y con el Paginator
+de Django, que cuenta la tabla completa en cada petición. Sale con código 1 si
+algún listado con el paginador estimado ejecuta un COUNT sobre la tabla sin
+filtrar o más consultas que en ``presupuesto_consultas``, o si el total
+estimado se aleja más de un 10 % del real.
+
+Uso:
+    python -m benchmarks.bench_admin --libros 5000 --pedidos 100000 --carritos 20000
+"""
+
+import argparse
+import io
+import sys
+from datetime import date
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir
+
+MAXIMO_CONSULTAS = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=5000)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--pedidos', type=int, default=100000)
+    parser.add_argument('--carritos', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.conf import settings
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.core.paginator import Paginator
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.urls import reverse
+    from tienda.models import Carrito, ItemCarrito, ItemPedido, Pedido
+    from tienda.paginacion import conteo_estimado
+
+    setup_test_environment()
+    # Estimar desde tablas chicas, para que los volúmenes por defecto ya lo usen
+    settings.TIENDA_CONTEO_ESTIMADO_DESDE = 1000
+    fallos = []
+    with base_de_datos_temporal(en_archivo=True):
+        call_command(
+            'generar_datos', libros=args.libros, usuarios=args.usuarios, pedidos=args.pedidos,
+            carritos=args.carritos, procesos=1, hasta=date(2025, 1, 1), stdout=io.StringIO(),
+        )
+        cliente = Client()
+        cliente.force_login(User.objects.create_superuser('admin_bench'))
+
+        listados = []
+        for modelo in (Carrito, ItemCarrito, ItemPedido, Pedido):
+            url = reverse(f'admin:tienda_{modelo._meta.model_name}_changelist')
+            filas = modelo.objects.count()
+            estimado = conteo_estimado(modelo)
+            if estimado is None or abs(estimado - filas) > filas * 0.1:
+                fallos.append(f'{modelo._meta.model_name}: {filas} filas, total estimado {estimado}')
+            listados += [
+                (modelo, f'{modelo._meta.model_name} ({filas})', url, True),
+                (modelo, '  página profunda', f'{url}?p={filas // 100 // 2}', True),
+                (modelo, '  búsqueda', f'{url}?q=ana', False),
+            ]
+
+        print(f'{"listado":<28} {"consultas":>10} {"estimado p50":>14} {"COUNT p50":>11}')
+        for modelo, nombre, url, sin_filtro in listados:
+            modelo_admin = admin.site._registry[modelo]
+            cache.clear()
+            cliente.get(url)
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = cliente.get(url)
+            consultas = [consulta['sql'] for consulta in capturadas.captured_queries][2:]
+            if respuesta.status_code != 200:
+                fallos.append(f'{url} respondió {respuesta.status_code}')
+                continue
+            estimado = medir(lambda: cliente.get(url), args.repeticiones)
+
+            modelo_admin.paginator, modelo_admin.show_full_result_count = Paginator, True
+            try:
+                exacto = medir(lambda: cliente.get(url), args.repeticiones)
+            finally:
+                modelo_admin.paginator, modelo_admin.show_full_result_count = type(modelo_admin).paginator, False
+
+            print(f'{nombre:<28} {len(consultas):>10} {estimado["p50"]:>11.1f} ms {exacto["p50"]:>8.1f} ms')
+            if len(consultas) > MAXIMO_CONSULTAS:
+                fallos.append(f'{url} ejecuta {len(consultas)} consultas')
+            if sin_filtro and any(sql.startswith('SELECT COUNT(*)') and 'WHERE' not in sql for sql in consultas):
+                fallos.append(f'{url} cuenta la tabla completa')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Mide la API JSON v1 del catálogo.
+
+Compara la serialización con ``.values()`` frente a instanciar modelos, y el
+listado servido sin caché, desde el caché y como 304. Sale con código 1 si la
+segunda petición no sale del caché, si la condicional no recibe 304 o consulta
+la base de datos, si la respuesta con gzip no es más pequeña, o si ``?campos=``
+no limita los campos devueltos.
+
+Uso:
+    python -m benchmarks.bench_api --libros 2000 --limite 100
+"""
+
+import argparse
+import gzip
+import json
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--limite', type=int, default=100)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.urls import reverse
+    from tienda.api import CAMPOS_LIBRO, CAMPOS_LISTADO_LIBRO, _serializar
+    from tienda.models import Libro
+
+    setup_test_environment()
+    fallos = []
+    with base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        libros = Libro.objects.filter(activo=True, stock__gt=0).order_by('-fecha_creacion', '-id')[:args.limite]
+
+        def con_modelos():
+            return [
+                {
+                    'id': libro.id, 'titulo': libro.titulo, 'autor': libro.autor, 'precio': libro.precio,
+                    'isbn': libro.isbn, 'fecha_publicacion': libro.fecha_publicacion,
+                    'categoria_id': libro.categoria_id, 'categoria': libro.categoria.nombre,
+                    'imagen': libro.imagen.url if libro.imagen else None,
+                    'fecha_actualizacion': libro.fecha_actualizacion,
+                }
+                for libro in libros.select_related('categoria')
+            ]
+
+        def con_values():
+            origenes = {CAMPOS_LIBRO[campo] for campo in CAMPOS_LISTADO_LIBRO}
+            return _serializar(libros.values(*origenes), CAMPOS_LISTADO_LIBRO, CAMPOS_LIBRO)
+
+        print(f'{"variante":<22} {"p50":>10} {"p95":>10}')
+        for nombre, funcion in (('modelos', con_modelos), ('values()', con_values)):
+            tiempos = medir(funcion, args.repeticiones)
+            print(f'{nombre:<22} {tiempos["p50"]:>7.2f} ms {tiempos["p95"]:>7.2f} ms')
+
+        cliente = Client()
+        url = f'{reverse("api_v1_libros")}?limite={args.limite}'
+        cliente.get(url)
+        respuesta = cliente.get(url)
+        if respuesta.get('X-Cache') != 'HIT':
+            fallos.append('la segunda petición no salió del caché')
+        etag = respuesta['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            condicional = cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+        if condicional.status_code != 304:
+            fallos.append(f'la petición condicional recibió {condicional.status_code} en vez de 304')
+        elif len(consultas):
+            fallos.append(f'la respuesta 304 hizo {len(consultas)} consultas')
+
+        def sin_cache():
+            cache.clear()
+            cliente.get(url)
+
+        tiempos = {'sin caché': medir(sin_cache, args.repeticiones)}
+        etag = cliente.get(url)['ETag']
+        tiempos['caché'] = medir(lambda: cliente.get(url), args.repeticiones)
+        tiempos['caché + gzip'] = medir(lambda: cliente.get(url, HTTP_ACCEPT_ENCODING='gzip'), args.repeticiones)
+        tiempos['304'] = medir(lambda: cliente.get(url, HTTP_IF_NONE_MATCH=etag), args.repeticiones)
+        for variante, valores in tiempos.items():
+            print(f'{variante:<22} {valores["p50"]:>7.2f} ms {valores["p95"]:>7.2f} ms')
+
+        plano = cliente.get(url).content
+        comprimida = cliente.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        print(f'\nTamaño: {len(plano) / 1024:.1f} KB sin comprimir, '
+              f'{len(comprimida.content) / 1024:.1f} KB con {comprimida.get("Content-Encoding")}')
+        if comprimida.get('Content-Encoding') != 'gzip' or len(comprimida.content) >= len(plano):
+            fallos.append('la respuesta con Accept-Encoding: gzip no se comprimió')
+        elif gzip.decompress(comprimida.content) != plano:
+            fallos.append('la respuesta comprimida no coincide con la original')
+
+        parcial = cliente.get(f'{url}&campos=id,titulo').content
+        print(f'Tamaño con ?campos=id,titulo: {len(parcial) / 1024:.1f} KB')
+        if any(set(libro) != {'id', 'titulo'} for libro in json.loads(parcial)['resultados']):
+            fallos.append('?campos=id,titulo devolvió otros campos')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
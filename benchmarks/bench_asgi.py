@@ -0,0 +1,150 @@
+"""
+Rendimiento de los endpoints AJAX del carrito y del catálogo con WSGI y ASGI.
+
+Cada usuario virtual tiene su propia sesión y repite la secuencia de la página
+del catálogo: pide el contador del carrito, lee una página de ``/api/v1/libros/`` y
+agrega un libro al carrito. Con WSGI los usuarios se reparten en hilos (un hilo
+por petición en curso, como gunicorn con ``--threads``); con ASGI todos corren
+en un solo bucle de eventos. Se informa el rendimiento en peticiones por
+segundo y la latencia por nivel de concurrencia. Sale con código 1 si alguna
+petición falla o si el contador de algún carrito no termina con las unidades
+agregadas.
+
+Ambos servidores se simulan en el proceso con los manejadores de Django
+(``Client`` usa el de WSGI y ``AsyncClient`` el de ASGI), sin red. Para medir
+un despliegue real con uvicorn, usa una herramienta de carga externa.
+
+Uso:
+    python -m benchmarks.bench_asgi --concurrencia 1 16 64 --peticiones 20
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_libros
+
+
+def _resumen(latencias, duracion):
+    latencias.sort()
+    return {
+        'rps': len(latencias) / duracion,
+        'p50': statistics.median(latencias),
+        'p95': latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))],
+    }
+
+
+def _rutas(libro_ids, peticiones, semilla):
+    """Secuencia de (método, url) de un usuario virtual"""
+    aleatorio = random.Random(semilla)
+    rutas = []
+    while len(rutas) < peticiones:
+        rutas += [
+            ('get', '/carrito/contador/'),
+            ('get', '/api/v1/libros/?limite=12'),
+            ('post', f'/agregar-carrito/{aleatorio.choice(libro_ids)}/'),
+        ]
+    return rutas[:peticiones]
+
+
+def con_wsgi(libro_ids, usuarios, peticiones):
+    from django.db import connection
+    from django.test import Client
+
+    def usuario(numero):
+        cliente = Client()
+        latencias, errores = [], 0
+        try:
+            for metodo, url in _rutas(libro_ids, peticiones, numero):
+                inicio = time.perf_counter()
+                respuesta = getattr(cliente, metodo)(url)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                errores += respuesta.status_code != 200
+            unidades = cliente.get('/carrito/contador/').json()['cantidad_carrito']
+        finally:
+            connection.close()
+        return latencias, errores, unidades
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=usuarios) as ejecutor:
+        resultados = list(ejecutor.map(usuario, range(usuarios)))
+    duracion = time.perf_counter() - inicio
+    return resultados, duracion
+
+
+def con_asgi(libro_ids, usuarios, peticiones):
+    from django.test import AsyncClient
+
+    async def usuario(numero):
+        cliente = AsyncClient()
+        latencias, errores = [], 0
+        for metodo, url in _rutas(libro_ids, peticiones, numero):
+            inicio = time.perf_counter()
+            respuesta = await getattr(cliente, metodo)(url)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            errores += respuesta.status_code != 200
+        unidades = (await cliente.get('/carrito/contador/')).json()['cantidad_carrito']
+        return latencias, errores, unidades
+
+    async def todos():
+        return await asyncio.gather(*(usuario(numero) for numero in range(usuarios)))
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(todos())
+    duracion = time.perf_counter() - inicio
+    return resultados, duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--peticiones', type=int, default=20, help='peticiones por usuario virtual')
+    parser.add_argument('--libros', type=int, default=500)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.test.utils import setup_test_environment
+    from tienda.models import Carrito, Libro
+
+    setup_test_environment()
+    fallos = []
+    with base_de_datos_temporal(en_archivo=True):
+        sembrar_libros(args.libros)
+        # Stock de sobra para que ninguna reserva falle por falta de unidades
+        Libro.objects.update(stock=100000, activo=True)
+        libro_ids = list(Libro.objects.values_list('pk', flat=True))
+        agregados_por_usuario = len([r for r in _rutas(libro_ids, args.peticiones, 0) if r[0] == 'post'])
+
+        print(f'{"servidor":<8} {"concurrencia":>12} {"peticiones/s":>13} {"p50":>10} {"p95":>10}')
+        for usuarios in args.concurrencia:
+            for nombre, ejecutar in (('WSGI', con_wsgi), ('ASGI', con_asgi)):
+                Carrito.objects.all().delete()
+                cache.clear()
+                resultados, duracion = ejecutar(libro_ids, usuarios, args.peticiones)
+                latencias = [latencia for valores, _, _ in resultados for latencia in valores]
+                errores = sum(errores for _, errores, _ in resultados)
+                resumen = _resumen(latencias, duracion)
+                print(f'{nombre:<8} {usuarios:>12} {resumen["rps"]:>13.1f} '
+                      f'{resumen["p50"]:>7.2f} ms {resumen["p95"]:>7.2f} ms')
+
+                if errores:
+                    fallos.append(f'{nombre} con {usuarios} usuarios: {errores} peticiones fallidas')
+                unidades = sum(unidades for _, _, unidades in resultados)
+                if unidades != usuarios * agregados_por_usuario:
+                    fallos.append(
+                        f'{nombre} con {usuarios} usuarios: los carritos suman {unidades} unidades, '
+                        f'se agregaron {usuarios * agregados_por_usuario}'
+                    )
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compara la búsqueda del catálogo con icontains frente al índice de texto completo.
+
+Uso:
+    python -m benchmarks.bench_busqueda
+    python -m benchmarks.bench_busqueda --tamanos 1000 100000 1000000
+"""
+
+import argparse
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+TERMINOS = ['memoria', 'garcia marquez', 'progra', 'historia del mar']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.paginator import Paginator
+    from django.db.models import Q
+    from tienda.busqueda import buscar_libros, motor_busqueda, reconstruir_indice
+    from tienda.models import Libro
+
+    def primera_pagina(queryset):
+        # Igual que index(): COUNT(*) del paginador y la primera página
+        pagina = Paginator(queryset, 12).get_page(1)
+        list(pagina.object_list)
+
+    with base_de_datos_temporal():
+        print(f'Motor de búsqueda: {motor_busqueda()}')
+        print(f'{"libros":>10} {"término":<18} {"icontains p50":>14} {"índice p50":>11} {"mejora":>7}')
+        for tamano in sorted(args.tamanos):
+            sembrar_libros(tamano - Libro.objects.count())
+            reconstruir_indice()
+            base = Libro.objects.filter(activo=True, stock__gt=0)
+            for termino in TERMINOS:
+                antes = medir(lambda: primera_pagina(base.filter(
+                    Q(titulo__icontains=termino) | Q(autor__icontains=termino)
+                )), args.repeticiones)
+                despues = medir(lambda: primera_pagina(buscar_libros(base, termino)), args.repeticiones)
+                mejora = antes['p50'] / despues['p50'] if despues['p50'] else 0
+                print(f'{tamano:>10} {termino:<18} {antes["p50"]:>11.2f} ms {despues["p50"]:>8.2f} ms {mejora:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Mide el caché de páginas para anónimos en el catálogo y el detalle de un libro.
+
+Compara el render completo, la página servida desde el caché y la respuesta
+304 a una petición condicional. Sale con código 1 si la segunda visita no sale
+del caché, si la petición condicional no recibe 304, si la respuesta abre
+sesión, o si cambiar el precio o agotar el stock de un libro no renueva las
+páginas guardadas.
+
+Uso:
+    python -m benchmarks.bench_cache_paginas --libros 2000
+"""
+
+import argparse
+import sys
+from decimal import Decimal
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from tienda.models import Carrito, ItemCarrito, Libro, Pedido
+    from tienda.pedidos import confirmar_pedido
+
+    setup_test_environment()
+    fallos = []
+    with base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        libro = Libro.objects.filter(activo=True, stock__gt=0).order_by('-fecha_creacion', '-id').first()
+        cliente = Client()
+        urls = {'index': reverse('index'), 'detalle_libro': reverse('detalle_libro', args=[libro.pk])}
+
+        print(f'{"página":<15} {"variante":<12} {"p50":>10} {"p95":>10}')
+        for nombre, url in urls.items():
+            cliente.get(url)
+            respuesta = cliente.get(url)
+            if respuesta.get('X-Cache') != 'HIT':
+                fallos.append(f'{nombre}: la segunda visita no salió del caché')
+            if respuesta.cookies:
+                fallos.append(f'{nombre}: la respuesta anónima crea cookies {list(respuesta.cookies)}')
+            etag = respuesta['ETag']
+            if cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code != 304:
+                fallos.append(f'{nombre}: la petición condicional no recibió 304')
+
+            def sin_cache():
+                cache.clear()
+                cliente.get(url)
+
+            tiempos = {'render': medir(sin_cache, args.repeticiones)}
+            # cache.clear() renovó las marcas: se toma el ETag nuevo antes de medir
+            etag = cliente.get(url)['ETag']
+            tiempos['caché'] = medir(lambda: cliente.get(url), args.repeticiones)
+            tiempos['304'] = medir(lambda: cliente.get(url, HTTP_IF_NONE_MATCH=etag), args.repeticiones)
+            for variante, valores in tiempos.items():
+                print(f'{nombre:<15} {variante:<12} {valores["p50"]:>7.2f} ms {valores["p95"]:>7.2f} ms')
+
+        # Cambio de precio desde el admin: save() dispara la purga
+        cliente.get(urls['detalle_libro'])
+        libro.precio = Decimal('123457')
+        libro.save()
+        if b'123457' not in cliente.get(urls['detalle_libro']).content:
+            fallos.append('el detalle en caché no mostró el precio nuevo')
+
+        # Un pedido que agota el stock: el UPDATE no dispara señales
+        cliente.get(urls['index'])
+        Libro.objects.filter(pk=libro.pk).update(stock=1)
+        carrito = Carrito.objects.create()
+        ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=1)
+        confirmar_pedido(Pedido(
+            email='cliente@ejemplo.com', nombre_completo='Cliente', telefono='123',
+            direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+        ), carrito)
+        if f'data-libro-id="{libro.pk}"'.encode() in cliente.get(urls['index']).content:
+            fallos.append('el catálogo en caché sigue mostrando un libro agotado')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""
+Prueba de carga HTTP de la tienda con sesiones de compra realistas.
+
+Cada usuario virtual es un hilo con su propia conexión HTTP y sus cookies, y
+repite sesiones de visitante: abre el catálogo, pide el contador del carrito
+(que entrega la cookie CSRF), busca, mira el detalle de algunos libros, agrega
+uno o varios al carrito, cambia cantidades en lote y, con probabilidad
+``--compras``, pasa por el checkout y confirma el pedido. Entre pasos espera
+``--pausa`` segundos como haría una persona.
+
+Se informa por endpoint el número de peticiones, errores, peticiones por
+segundo y latencia p50/p95/p99, y se guarda en JSON en ``benchmarks/resultados``
+junto con la configuración y el commit, para comparar corridas con
+``--comparar``. Sale con código 1 si alguna petición falla (error de conexión,
+5xx o un estado inesperado para el paso).
+
+El servidor puede estar ya corriendo en ``--url`` o lanzarse con ``--iniciar``
+sobre una base de datos desechable (ver ``benchmarks.servidor_carga``). No
+apuntes la prueba a una tienda real: crea pedidos.
+
+Uso:
+    python -m benchmarks.bench_carga --iniciar wsgi --usuarios 8 --duracion 30
+    python -m benchmarks.bench_carga --url http://127.0.0.1:8000 --comparar benchmarks/resultados/anterior.json
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.comun import RAIZ
+
+CARPETA_RESULTADOS = RAIZ / 'benchmarks' / 'resultados'
+
+DATOS_PEDIDO = {
+    'nombre_completo': 'Cliente de Prueba',
+    'email': 'carga@ejemplo.com',
+    'telefono': '3000000000',
+    'direccion': 'Calle 1 # 2-3',
+    'ciudad': 'Bogotá',
+    'metodo_pago': 'pse',
+}
+
+
+class Navegador:
+    """Cliente HTTP de un usuario virtual: una conexión persistente y sus cookies"""
+
+    def __init__(self, url, tiempo_limite=30):
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.tiempo_limite = tiempo_limite
+        self.cookies = {}
+        self.conexion = None
+
+    def _conectar(self):
+        if self.conexion is None:
+            self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.tiempo_limite)
+        return self.conexion
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            self.conexion = None
+
+    def pedir(self, metodo, ruta, formulario=None, json_datos=None):
+        """Devuelve (estado, cuerpo); reintenta una vez si el servidor cerró la conexión"""
+        cabeceras = {'Host': f'{self.host}:{self.puerto}'}
+        cuerpo = None
+        if formulario is not None:
+            cuerpo = urlencode(formulario)
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_datos is not None:
+            cuerpo = json.dumps(json_datos)
+            cabeceras['Content-Type'] = 'application/json'
+        if metodo == 'POST':
+            cabeceras['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        if self.cookies:
+            cabeceras['Cookie'] = '; '.join(f'{nombre}={valor}' for nombre, valor in self.cookies.items())
+
+        for intento in range(2):
+            try:
+                conexion = self._conectar()
+                conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+                respuesta = conexion.getresponse()
+                contenido = respuesta.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.cerrar()
+                if intento:
+                    raise
+        for valor in respuesta.headers.get_all('Set-Cookie') or []:
+            galleta = SimpleCookie()
+            galleta.load(valor)
+            for nombre, morsel in galleta.items():
+                self.cookies[nombre] = morsel.value
+        if respuesta.getheader('Connection', '').lower() == 'close':
+            self.cerrar()
+        return respuesta.status, contenido
+
+
+class Registro:
+    """Latencias y errores por endpoint, compartido entre hilos"""
+
+    def __init__(self):
+        self.bloqueo = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.detalle_errores = []
+
+    def anotar(self, endpoint, milisegundos, error=None):
+        with self.bloqueo:
+            self.latencias[endpoint].append(milisegundos)
+            if error:
+                self.errores[endpoint] += 1
+                if len(self.detalle_errores) < 20:
+                    self.detalle_errores.append(f'{endpoint}: {error}')
+
+
+def _percentil(ordenadas, fraccion):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * fraccion))]
+
+
+def _estadisticas(latencias, errores, duracion):
+    ordenadas = sorted(latencias)
+    return {
+        'peticiones': len(ordenadas),
+        'errores': errores,
+        'rps': round(len(ordenadas) / duracion, 2),
+        'p50': round(statistics.median(ordenadas), 2),
+        'p95': round(_percentil(ordenadas, 0.95), 2),
+        'p99': round(_percentil(ordenadas, 0.99), 2),
+    }
+
+
+class UsuarioVirtual:
+    """Recorre sesiones de compra y anota cada petición en el registro"""
+
+    def __init__(self, url, registro, catalogo, args, semilla):
+        self.navegador = Navegador(url)
+        self.registro = registro
+        self.libro_ids, self.palabras = catalogo
+        self.args = args
+        self.aleatorio = random.Random(semilla)
+
+    def paso(self, endpoint, metodo, ruta, esperados=(200,), **datos):
+        inicio = time.perf_counter()
+        error = None
+        estado, contenido = None, b''
+        try:
+            estado, contenido = self.navegador.pedir(metodo, ruta, **datos)
+            if estado not in esperados:
+                error = f'{metodo} {ruta} respondió {estado}'
+        except (OSError, http.client.HTTPException) as excepcion:
+            error = f'{metodo} {ruta}: {excepcion!r}'
+        self.registro.anotar(endpoint, (time.perf_counter() - inicio) * 1000, error)
+        if self.args.pausa:
+            time.sleep(self.aleatorio.uniform(0, 2 * self.args.pausa))
+        return estado, contenido
+
+    def sesion(self):
+        aleatorio = self.aleatorio
+        # Cada sesión empieza como un visitante nuevo
+        self.navegador.cookies.clear()
+        _, contenido = self.paso('catalogo', 'GET', '/')
+        self.paso('contador_carrito', 'GET', '/carrito/contador/')
+        siguiente = re.search(rb'despues=([\w-]+)', contenido)
+        if siguiente:
+            self.paso('catalogo_siguiente', 'GET', '/?despues=' + siguiente.group(1).decode())
+        self.paso('busqueda', 'GET', '/?' + urlencode({'busqueda': aleatorio.choice(self.palabras)}))
+
+        elegidos = aleatorio.sample(self.libro_ids, k=min(len(self.libro_ids), aleatorio.randint(1, 3)))
+        for libro_id in elegidos:
+            self.paso('detalle_libro', 'GET', f'/libro/{libro_id}/')
+            # 400 es stock insuficiente: una respuesta válida de la tienda
+            self.paso('agregar_al_carrito', 'POST', f'/agregar-carrito/{libro_id}/',
+                      esperados=(200, 400), formulario={'cantidad': 1})
+
+        _, contenido = self.paso('ver_carrito', 'GET', '/carrito/')
+        item_ids = sorted({int(pk) for pk in re.findall(rb'id="cantidad-(\d+)"', contenido)})
+        if item_ids:
+            cambios = [{'item_id': pk, 'cantidad': aleatorio.randint(1, 3)} for pk in item_ids]
+            self.paso('actualizar_carrito_lote', 'POST', '/carrito/actualizar/',
+                      esperados=(200, 400), json_datos={'cambios': cambios})
+
+        if item_ids and aleatorio.random() < self.args.compras:
+            self.paso('checkout', 'GET', '/checkout/')
+            # La confirmación redirige a la página del pedido, o al carrito si falta stock
+            self.paso('confirmar_pedido', 'POST', '/checkout/', esperados=(302,), formulario=DATOS_PEDIDO)
+
+    def ejecutar(self, fin):
+        sesiones = 0
+        try:
+            while time.perf_counter() < fin and (not self.args.sesiones or sesiones < self.args.sesiones):
+                self.sesion()
+                sesiones += 1
+        finally:
+            self.navegador.cerrar()
+
+
+def _catalogo(url):
+    """Ids y palabras de títulos del catálogo, leídos de la API v1"""
+    navegador = Navegador(url)
+    estado, contenido = navegador.pedir('GET', '/api/v1/libros/?campos=id,titulo&limite=100')
+    navegador.cerrar()
+    if estado != 200:
+        sys.exit(f'No se pudo leer el catálogo de {url} (estado {estado})')
+    libros = json.loads(contenido)['resultados']
+    if not libros:
+        sys.exit(f'El catálogo de {url} está vacío')
+    palabras = sorted({palabra for libro in libros for palabra in libro['titulo'].lower().split() if len(palabra) > 3})
+    return [libro['id'] for libro in libros], palabras or ['libro']
+
+
+def _iniciar_servidor(args):
+    partes = urlsplit(args.url)
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.servidor_carga', '--servidor', args.iniciar,
+         '--host', partes.hostname, '--puerto', str(partes.port or 80), '--libros', str(args.libros)],
+        cwd=RAIZ,
+    )
+    limite = time.perf_counter() + 120
+    while time.perf_counter() < limite:
+        if proceso.poll() is not None:
+            sys.exit(f'El servidor terminó con código {proceso.returncode}')
+        try:
+            navegador = Navegador(args.url, tiempo_limite=2)
+            estado, _ = navegador.pedir('GET', '/carrito/contador/')
+            navegador.cerrar()
+            if estado == 200:
+                return proceso
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proceso.terminate()
+    sys.exit(f'El servidor no respondió en {args.url}')
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _imprimir(resultados, anterior=None):
+    encabezado = f'{"endpoint":<26} {"peticiones":>10} {"errores":>8} {"rps":>8} {"p50":>9} {"p95":>9} {"p99":>9}'
+    if anterior:
+        encabezado += f' {"Δp95":>8} {"Δrps":>8}'
+    print(encabezado)
+    filas = dict(resultados['endpoints'], total=resultados['total'])
+    previas = dict(anterior['endpoints'], total=anterior['total']) if anterior else {}
+    for endpoint, datos in filas.items():
+        linea = (f'{endpoint:<26} {datos["peticiones"]:>10} {datos["errores"]:>8} {datos["rps"]:>8.1f} '
+                 f'{datos["p50"]:>6.1f} ms {datos["p95"]:>6.1f} ms {datos["p99"]:>6.1f} ms')
+        if anterior:
+            previo = previas.get(endpoint)
+            if previo and previo['p95'] and previo['rps']:
+                linea += (f' {(datos["p95"] / previo["p95"] - 1) * 100:>+7.1f}%'
+                          f' {(datos["rps"] / previo["rps"] - 1) * 100:>+7.1f}%')
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--iniciar', choices=['wsgi', 'asgi'], help='lanza benchmarks.servidor_carga en --url')
+    parser.add_argument('--libros', type=int, default=2000, help='libros a sembrar con --iniciar')
+    parser.add_argument('--usuarios', type=int, default=8, help='usuarios virtuales concurrentes')
+    parser.add_argument('--duracion', type=float, default=30, help='segundos de prueba')
+    parser.add_argument('--sesiones', type=int, default=0, help='sesiones por usuario (0: hasta --duracion)')
+    parser.add_argument('--compras', type=float, default=0.3, help='fracción de sesiones que confirman pedido')
+    parser.add_argument('--pausa', type=float, default=0.0, help='pausa media entre pasos, en segundos')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', type=Path, help='archivo JSON de resultados')
+    parser.add_argument('--comparar', type=Path, help='JSON de una corrida anterior')
+    args = parser.parse_args()
+
+    servidor = _iniciar_servidor(args) if args.iniciar else None
+    try:
+        catalogo = _catalogo(args.url)
+        registro = Registro()
+        usuarios = [
+            UsuarioVirtual(args.url, registro, catalogo, args, args.semilla + numero)
+            for numero in range(args.usuarios)
+        ]
+        inicio = time.perf_counter()
+        hilos = [
+            threading.Thread(target=usuario.ejecutar, args=(inicio + args.duracion,))
+            for usuario in usuarios
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait(timeout=60)
+
+    todas = [latencia for latencias in registro.latencias.values() for latencia in latencias]
+    if not todas:
+        sys.exit('La prueba no hizo ninguna petición')
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'url': args.url,
+        'servidor': args.iniciar,
+        'configuracion': {
+            'usuarios': args.usuarios, 'duracion': args.duracion, 'sesiones': args.sesiones,
+            'compras': args.compras, 'pausa': args.pausa, 'semilla': args.semilla,
+            'libros': args.libros if args.iniciar else None,
+        },
+        'duracion': round(duracion, 2),
+        'endpoints': {
+            endpoint: _estadisticas(latencias, registro.errores[endpoint], duracion)
+            for endpoint, latencias in registro.latencias.items()
+        },
+        'total': _estadisticas(todas, sum(registro.errores.values()), duracion),
+    }
+
+    anterior = json.loads(args.comparar.read_text()) if args.comparar else None
+    _imprimir(resultados, anterior)
+
+    salida = args.salida or CARPETA_RESULTADOS / f'carga-{datetime.now():%Y%m%d-%H%M%S}.json'
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False))
+    print(f'\nResultados en {salida}')
+
+    for error in registro.detalle_errores:
+        print(f'FALLO: {error}', file=sys.stderr)
+    sys.exit(1 if resultados['total']['errores'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Cambios de cantidad del carrito: una petición por clic frente a un lote.
+
+Para cada tamaño de carrito compara N peticiones a ``actualizar_carrito`` con
+una sola a ``actualizar_carrito_lote``, en tiempo y en consultas SQL. Sale con
+código 1 si las consultas del lote crecen con el número de items, si el lote no
+deja las mismas cantidades que las peticiones individuales, o si un lote con un
+libro sin stock aplica alguno de sus cambios.
+
+Los clientes inician sesión para que el carrito viva en la base de datos, que
+es donde el lote ahorra consultas; el carrito de sesión de los visitantes no
+consulta ``ItemCarrito``.
+
+Uso:
+    python -m benchmarks.bench_carrito_lote --items 1 5 20 50
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_libros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, nargs='+', default=[1, 5, 20, 50])
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.urls import reverse
+    from django.contrib.auth.models import User
+    from tienda.models import ItemCarrito, Libro
+
+    setup_test_environment()
+    fallos = []
+    with base_de_datos_temporal():
+        sembrar_libros(max(args.items))
+        Libro.objects.update(stock=1000, activo=True)
+        libro_ids = list(Libro.objects.values_list('pk', flat=True)[:max(args.items)])
+
+        def preparar(cantidad_items):
+            cliente = Client()
+            usuario = User.objects.create_user(f'lote{User.objects.count()}')
+            cliente.force_login(usuario)
+            for libro_id in libro_ids[:cantidad_items]:
+                cliente.post(reverse('agregar_al_carrito', args=[libro_id]))
+            item_ids = list(
+                ItemCarrito.objects.filter(carrito__usuario=usuario).order_by('pk').values_list('pk', flat=True)
+            )
+            return cliente, item_ids
+
+        def lote(cliente, cantidades):
+            return cliente.post(
+                reverse('actualizar_carrito_lote'),
+                json.dumps({'cambios': [{'item_id': pk, 'cantidad': c} for pk, c in cantidades.items()]}),
+                content_type='application/json',
+            )
+
+        consultas_lote = {}
+        print(f'{"items":>6} {"individual":>12} {"consultas":>10} {"lote":>10} {"consultas":>10}')
+        for cantidad_items in args.items:
+            cliente, item_ids = preparar(cantidad_items)
+            cantidades = {pk: 2 + numero % 3 for numero, pk in enumerate(item_ids)}
+
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                for pk, cantidad in cantidades.items():
+                    cliente.post(reverse('actualizar_carrito', args=[pk]), {'cantidad': cantidad})
+                individual = (time.perf_counter() - inicio) * 1000
+            consultas_individual = len(consultas)
+            esperadas = dict(ItemCarrito.objects.filter(pk__in=item_ids).values_list('pk', 'cantidad'))
+
+            cliente, item_ids = preparar(cantidad_items)
+            cantidades = {pk: 2 + numero % 3 for numero, pk in enumerate(item_ids)}
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                respuesta = lote(cliente, cantidades)
+                en_lote = (time.perf_counter() - inicio) * 1000
+            consultas_lote[cantidad_items] = len(consultas)
+            print(f'{cantidad_items:>6} {individual:>9.1f} ms {consultas_individual:>10} '
+                  f'{en_lote:>7.1f} ms {len(consultas):>10}')
+
+            obtenidas = dict(ItemCarrito.objects.filter(pk__in=item_ids).values_list('pk', 'cantidad'))
+            if respuesta.status_code != 200:
+                fallos.append(f'{cantidad_items} items: el lote respondió {respuesta.status_code}')
+            elif sorted(obtenidas.values()) != sorted(esperadas.values()):
+                fallos.append(f'{cantidad_items} items: el lote dejó cantidades distintas a las individuales')
+
+        if len(set(consultas_lote.values())) > 1:
+            fallos.append(f'las consultas del lote crecen con los items: {consultas_lote}')
+
+        # Un libro sin stock suficiente anula todo el lote
+        cliente, item_ids = preparar(3)
+        antes = dict(ItemCarrito.objects.filter(pk__in=item_ids).values_list('pk', 'cantidad'))
+        respuesta = lote(cliente, {item_ids[0]: 5, item_ids[1]: 5, item_ids[2]: 5000})
+        despues = dict(ItemCarrito.objects.filter(pk__in=item_ids).values_list('pk', 'cantidad'))
+        if respuesta.status_code != 400 or antes != despues:
+            fallos.append('un lote con un libro sin stock aplicó parte de sus cambios')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Escrituras en la base de datos de un visitante anónimo según dónde vive su carrito.
+
+Simula un visitante que recorre el catálogo y la ficha de varios libros y
+luego agrega algunos al carrito y cambia cantidades, con el carrito en la sesión
+(``TIENDA_CARRITO_ANONIMO = 'sesion'``) y en las tablas Carrito/ItemCarrito
+(``'bd'``). Cuenta las sentencias INSERT/UPDATE/DELETE de cada fase y el tiempo
+de agregar un libro. Sale con código 1 si navegar escribe en la base de datos,
+si el carrito de sesión escribe alguna fila de Carrito, ItemCarrito o Reserva,
+o si al iniciar sesión el carrito del visitante no se suma al del usuario.
+
+Las sesiones se guardan con ``SESSION_ENGINE`` en caché, que es la
+configuración recomendada con el carrito en la sesión.
+
+Uso:
+    python -m benchmarks.bench_carrito_sesion --libros 200 --agregados 5
+"""
+
+import argparse
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+TABLAS_CARRITO = ('tienda_carrito', 'tienda_itemcarrito', 'tienda_reserva')
+
+
+def _escrituras(consultas):
+    return [
+        consulta['sql'] for consulta in consultas
+        if consulta['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=200)
+    parser.add_argument('--agregados', type=int, default=5)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection, reset_queries
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+    from django.urls import reverse
+    from tienda.models import ItemCarrito, Libro
+
+    setup_test_environment()
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+    fallos = []
+    with base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        Libro.objects.update(stock=1000, activo=True)
+        libro_ids = list(Libro.objects.values_list('pk', flat=True)[:args.agregados])
+
+        print(f'{"carrito":<8} {"navegar":>9} {"agregar":>9} {"cambiar":>9} {"agregar p50":>13}')
+        for almacen in ('sesion', 'bd'):
+            with override_settings(TIENDA_CARRITO_ANONIMO=almacen):
+                cache.clear()
+                # El registro de consultas tiene un máximo; se vacía para que no se desplace
+                reset_queries()
+                cliente = Client()
+                with CaptureQueriesContext(connection) as navegar:
+                    cliente.get(reverse('index'))
+                    for libro_id in libro_ids:
+                        cliente.get(reverse('detalle_libro', args=[libro_id]))
+                    cliente.get(reverse('contador_carrito'))
+                    cliente.get(reverse('ver_carrito'))
+                with CaptureQueriesContext(connection) as agregar:
+                    for libro_id in libro_ids:
+                        cliente.post(reverse('agregar_al_carrito', args=[libro_id]))
+                with CaptureQueriesContext(connection) as cambiar:
+                    item_ids = [item.id for item in cliente.get(reverse('ver_carrito')).context['items']]
+                    for item_id in item_ids:
+                        cliente.post(reverse('actualizar_carrito', args=[item_id]), {'cantidad': 2})
+
+                # captured_queries lee el registro de la conexión, que medir() sigue llenando
+                navegar, agregar, cambiar = _escrituras(navegar), _escrituras(agregar), _escrituras(cambiar)
+                tiempos = medir(
+                    lambda: cliente.post(reverse('agregar_al_carrito', args=[libro_ids[0]])), args.repeticiones
+                )
+                print(f'{almacen:<8} {len(navegar):>9} {len(agregar):>9} '
+                      f'{len(cambiar):>9} {tiempos["p50"]:>10.2f} ms')
+
+                if navegar:
+                    fallos.append(f'{almacen}: navegar escribió en la base de datos: {navegar}')
+                if almacen == 'sesion':
+                    tocadas = [
+                        sql for sql in agregar + cambiar
+                        if any(tabla in sql for tabla in TABLAS_CARRITO)
+                    ]
+                    if tocadas:
+                        fallos.append(f'el carrito de sesión escribió filas del carrito: {tocadas}')
+
+                # Al iniciar sesión, lo agregado como visitante se suma al carrito del usuario
+                usuario = User.objects.create_user(f'visitante_{almacen}', password='clave')
+                Client().force_login(usuario)
+                esperadas = {libro_id: 2 for libro_id in libro_ids}
+                esperadas[libro_ids[0]] += args.repeticiones
+                cliente.login(username=usuario.username, password='clave')
+                obtenidas = dict(
+                    ItemCarrito.objects.filter(carrito__usuario=usuario).values_list('libro_id', 'cantidad')
+                )
+                contador = cliente.get(reverse('contador_carrito')).json()['cantidad_carrito']
+                if obtenidas != esperadas or contador != sum(esperadas.values()):
+                    fallos.append(
+                        f'{almacen}: tras iniciar sesión el carrito tiene {obtenidas} '
+                        f'(contador {contador}), se esperaba {esperadas}'
+                    )
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Prueba de carga del checkout: muchos compradores compiten por el mismo libro.
+
+Cada comprador tiene un carrito con unidades del libro "caliente" y todos
+confirman su pedido en paralelo. Al final se verifica que el stock nunca quedó
+negativo y que las unidades vendidas coinciden exactamente con el stock
+descontado. Sale con código 1 si se rompe alguna de esas invariantes.
+
+Uso:
+    python -m benchmarks.bench_checkout --compradores 400 --hilos 1 4 16
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django
+
+
+def preparar(compradores, stock, unidades):
+    """Crea el libro caliente y un carrito por comprador"""
+    from tienda.models import Carrito, Categoria, ItemCarrito, Libro
+
+    categoria, _ = Categoria.objects.get_or_create(nombre='Promoción')
+    libro = Libro.objects.create(
+        titulo='Libro en promoción', autor='Autor', descripcion='Descripción',
+        precio=Decimal('25000'), categoria=categoria, stock=stock,
+    )
+    carritos = Carrito.objects.bulk_create([
+        Carrito(session_key=f'comprador-{libro.pk}-{i}') for i in range(compradores)
+    ])
+    ItemCarrito.objects.bulk_create([
+        ItemCarrito(carrito=carrito, libro=libro, cantidad=unidades) for carrito in carritos
+    ])
+    Carrito.objects.filter(pk__in=[c.pk for c in carritos]).recalcular_totales()
+    return libro, carritos
+
+
+def comprar(carrito):
+    """Confirma el pedido de un carrito; devuelve True si se vendió"""
+    from django.db import connection
+    from tienda.models import Pedido
+    from tienda.pedidos import StockInsuficiente, confirmar_pedido
+
+    pedido = Pedido(
+        email='comprador@ejemplo.com', nombre_completo='Comprador', telefono='123',
+        direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+    )
+    try:
+        confirmar_pedido(pedido, carrito)
+        return True
+    except StockInsuficiente:
+        return False
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--compradores', type=int, default=400)
+    parser.add_argument('--stock', type=int, default=250)
+    parser.add_argument('--unidades', type=int, default=2)
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.db.models import Sum
+    from tienda.models import ItemPedido
+
+    fallos = []
+    with base_de_datos_temporal(en_archivo=True):
+        print(f'{"hilos":>6} {"vendidos":>9} {"rechazados":>11} {"stock final":>12} {"pedidos/s":>10}')
+        for hilos in args.hilos:
+            libro, carritos = preparar(args.compradores, args.stock, args.unidades)
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+                resultados = list(ejecutor.map(comprar, carritos))
+            duracion = time.perf_counter() - inicio
+
+            libro.refresh_from_db()
+            vendidos = sum(resultados)
+            unidades_vendidas = ItemPedido.objects.filter(libro=libro).aggregate(
+                total=Sum('cantidad'))['total'] or 0
+            print(f'{hilos:>6} {vendidos:>9} {len(resultados) - vendidos:>11} '
+                  f'{libro.stock:>12} {len(resultados) / duracion:>10.1f}')
+
+            if libro.stock < 0:
+                fallos.append(f'stock negativo con {hilos} hilos: {libro.stock}')
+            if unidades_vendidas != args.stock - libro.stock:
+                fallos.append(f'con {hilos} hilos se vendieron {unidades_vendidas} unidades '
+                              f'pero el stock bajó {args.stock - libro.stock}')
+            if unidades_vendidas != vendidos * args.unidades:
+                fallos.append(f'con {hilos} hilos hay pedidos con items incompletos')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
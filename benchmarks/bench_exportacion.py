@@ -0,0 +1,110 @@
+"""
+Mide la memoria y el tiempo de las exportaciones por streaming del vendedor.
+
+Siembra pedidos, descarga cada exportación consumiendo la respuesta por partes
+y mide el pico de memoria de Python con tracemalloc. Sale con código 1 si el
+pico crece más de ``--tolerancia`` veces entre el tamaño menor y el mayor, o si
+el CSV o el XLSX generados no tienen todas las filas.
+
+Uso:
+    python -m benchmarks.bench_exportacion --tamanos 10000 100000
+"""
+
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+import zipfile
+from xml.etree import ElementTree
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_pedidos
+
+
+def descargar(cliente, url):
+    """Consume la respuesta por partes; devuelve la respuesta, el pico de memoria y los segundos"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    respuesta = cliente.get(url)
+    contenido = io.BytesIO()
+    for parte in respuesta.streaming_content:
+        contenido.write(parte)
+        # Solo se conserva el final para no medir el archivo completo en memoria
+        if contenido.tell() > 1 << 20:
+            contenido = io.BytesIO(contenido.getvalue()[-(1 << 16):])
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return respuesta, pico, segundos
+
+
+def contar_filas(cliente, url, formato):
+    """Número de filas de datos del archivo exportado, sin contar encabezados"""
+    datos = b''.join(cliente.get(url).streaming_content)
+    if formato == 'csv':
+        return datos.decode('utf-8-sig').count('\r\n') - 1
+    with zipfile.ZipFile(io.BytesIO(datos)) as libro:
+        hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+    espacio = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    return len(hoja.findall(f'{espacio}sheetData/{espacio}row')) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--tolerancia', type=float, default=2.0)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from tienda.models import ItemPedido, Pedido
+
+    setup_test_environment()
+    fallos = []
+    picos = {}
+
+    with base_de_datos_temporal():
+        usuario = User.objects.create_user('vendedor', is_staff=True)
+        cliente = Client()
+        cliente.force_login(usuario)
+        filtros = '?desde=2000-01-01&hasta=2100-01-01'
+
+        print(f'{"pedidos":>10} {"exportación":<16} {"pico KB":>10} {"segundos":>9}')
+        for tamano in sorted(args.tamanos):
+            sembrar_pedidos(tamano - Pedido.objects.count())
+            esperadas = {'pedidos': Pedido.objects.count(), 'items': ItemPedido.objects.count()}
+            for datos in ('pedidos', 'items'):
+                for formato in ('csv', 'xlsx'):
+                    url = reverse('exportar', args=[datos, formato]) + filtros
+                    respuesta, pico, segundos = descargar(cliente, url)
+                    if respuesta.status_code != 200:
+                        fallos.append(f'{url} respondió {respuesta.status_code}')
+                        continue
+                    picos.setdefault((datos, formato), []).append(pico)
+                    print(f'{tamano:>10} {datos + "." + formato:<16} {pico / 1024:>10.0f} {segundos:>9.2f}')
+
+            if tamano == min(args.tamanos):
+                for datos in ('pedidos', 'items'):
+                    for formato in ('csv', 'xlsx'):
+                        url = reverse('exportar', args=[datos, formato]) + filtros
+                        filas = contar_filas(cliente, url, formato)
+                        if filas != esperadas[datos]:
+                            fallos.append(f'{datos}.{formato}: {filas} filas, se esperaban {esperadas[datos]}')
+
+    for (datos, formato), valores in picos.items():
+        if valores[-1] > valores[0] * args.tolerancia:
+            fallos.append(
+                f'{datos}.{formato}: el pico de memoria crece de {valores[0] // 1024} KB '
+                f'a {valores[-1] // 1024} KB'
+            )
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compara el render de la página principal con la caché de fragmentos fría y
+caliente, y muestra la tasa de aciertos resultante.
+
+Sale con código 1 si el HTML servido desde la caché difiere del recién
+renderizado, si renombrar una categoría o editar un libro no cambia la página,
+o si con la caché caliente no se ahorra la consulta de categorías.
+
+Uso:
+    python -m benchmarks.bench_fragmentos --libros 2000 --categorias 40
+"""
+
+import argparse
+import re
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+
+def sin_token(html):
+    # El token CSRF cambia en cada respuesta y no forma parte de los fragmentos
+    return re.sub(rb'csrfmiddlewaretoken" value="[^"]+"', b'', html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--categorias', type=int, default=40)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from tienda.fragmentos import estadisticas_fragmentos, reiniciar_metricas
+    from tienda.models import Categoria, Libro
+
+    setup_test_environment()
+    fallos = []
+    with base_de_datos_temporal():
+        Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(args.categorias)])
+        sembrar_libros(args.libros)
+        # Con sesión iniciada la página no sale del caché de páginas y se mide solo el de fragmentos
+        cliente = Client()
+        cliente.force_login(User.objects.create_user('lector'))
+        cliente.get('/')
+
+        cache.clear()
+        fria = sin_token(cliente.get('/').content)
+        caliente = sin_token(cliente.get('/').content)
+        if fria != caliente:
+            fallos.append('el HTML servido desde la caché difiere del renderizado')
+
+        with CaptureQueriesContext(connection) as consultas:
+            cliente.get('/')
+        if any(c['sql'].startswith('SELECT "tienda_categoria"') for c in consultas.captured_queries):
+            fallos.append('con la caché caliente se sigue consultando la lista de categorías')
+
+        def fria_():
+            cache.clear()
+            cliente.get('/')
+
+        reiniciar_metricas()
+        tiempos = {
+            'caché fría': medir(fria_, args.repeticiones),
+            'caché caliente': medir(lambda: cliente.get('/'), args.repeticiones),
+        }
+        print(f'{"variante":<16} {"p50":>10} {"p95":>10}')
+        for nombre, valores in tiempos.items():
+            print(f'{nombre:<16} {valores["p50"]:>7.2f} ms {valores["p95"]:>7.2f} ms')
+
+        print(f'\n{"fragmento":<16} {"aciertos":>9} {"fallos":>7} {"tasa":>7}')
+        for fila in estadisticas_fragmentos():
+            print(f'{fila["fragmento"]:<16} {fila["aciertos"]:>9} {fila["fallos"]:>7} {fila["tasa"] or 0:>6.1f}%')
+
+        categoria = Categoria.objects.order_by('nombre').first()
+        categoria.nombre = 'Categoría renombrada'
+        categoria.save()
+        if b'Categor\xc3\xada renombrada' not in cliente.get('/').content:
+            fallos.append('renombrar una categoría no invalidó la barra de categorías')
+
+        libro = Libro.objects.filter(activo=True, stock__gt=0).order_by('-fecha_creacion', '-id').first()
+        libro.titulo = 'Título editado en el admin'
+        libro.save()
+        if 'Título editado en el admin'.encode() not in cliente.get('/').content:
+            fallos.append('editar un libro no renovó su tarjeta')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Velocidad, reproducibilidad y distribuciones de ``manage.py generar_datos``.
+
+Genera el mismo conjunto con cada número de procesos de ``--procesos`` sobre
+una base desechable y compara una huella de todas las filas creadas. Sale con
+código 1 si la misma semilla da datos distintos (por ejemplo, con otro número
+de procesos), si otra semilla da los mismos, o si las distribuciones no tienen
+la forma esperada: el 1 % de libros más vendidos reúne al menos un cuarto de
+las líneas de pedido, diciembre supera en pedidos al promedio mensual y la
+categoría más grande tiene al menos diez veces los libros de la más pequeña.
+
+Uso:
+    python -m benchmarks.bench_generar_datos --libros 20000 --pedidos 50000 --procesos 1 4
+"""
+
+import argparse
+import hashlib
+import io
+import sys
+import time
+from datetime import date
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django
+
+
+def _huella():
+    """Hash de las filas de todas las tablas generadas, en orden de id"""
+    from django.contrib.auth.models import User
+    from tienda.models import Carrito, ItemCarrito, ItemPedido, Libro, Pedido
+
+    huella = hashlib.sha256()
+    for modelo in (User, Libro, Pedido, ItemPedido, Carrito, ItemCarrito):
+        campos = [campo.attname for campo in modelo._meta.concrete_fields]
+        for fila in modelo.objects.order_by('pk').values_list(*campos).iterator(chunk_size=5000):
+            huella.update(repr(fila).encode())
+    return huella.hexdigest()
+
+
+def _distribuciones():
+    from django.db.models import Count
+    from django.db.models.functions import ExtractMonth
+    from tienda.models import ItemPedido, Libro, Pedido
+
+    lineas = sorted(
+        ItemPedido.objects.values('libro').annotate(n=Count('id')).values_list('n', flat=True), reverse=True
+    )
+    libros = Libro.objects.count()
+    por_mes = dict(
+        Pedido.objects.annotate(mes=ExtractMonth('fecha_creacion')).values('mes')
+        .annotate(n=Count('id')).values_list('mes', 'n')
+    )
+    por_categoria = sorted(Libro.objects.values('categoria').annotate(n=Count('id')).values_list('n', flat=True))
+    return {
+        'top_1%': sum(lineas[:max(libros // 100, 1)]) / sum(lineas),
+        'diciembre/promedio': por_mes.get(12, 0) / (sum(por_mes.values()) / 12),
+        'categoria_mayor/menor': por_categoria[-1] / por_categoria[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=20000)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--pedidos', type=int, default=50000)
+    parser.add_argument('--carritos', type=int, default=5000)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.management import call_command
+
+    def generar(semilla, procesos):
+        with base_de_datos_temporal(en_archivo=True):
+            inicio = time.perf_counter()
+            call_command(
+                'generar_datos', libros=args.libros, usuarios=args.usuarios, pedidos=args.pedidos,
+                carritos=args.carritos, semilla=semilla, procesos=procesos, hasta=date(2025, 1, 1), stdout=io.StringIO(),
+            )
+            duracion = time.perf_counter() - inicio
+            return duracion, _huella(), _distribuciones()
+
+    fallos = []
+    filas = args.libros + args.usuarios + args.pedidos + args.carritos
+    print(f'{"procesos":>8} {"tiempo":>10} {"filas/s":>10}  huella')
+    huellas = set()
+    for procesos in args.procesos:
+        duracion, huella, distribuciones = generar(42, procesos)
+        huellas.add(huella)
+        print(f'{procesos:>8} {duracion:>8.1f} s {filas / duracion:>10.0f}  {huella[:16]}')
+    if len(huellas) > 1:
+        fallos.append('la misma semilla produjo datos distintos según el número de procesos')
+
+    _, otra, _ = generar(7, args.procesos[-1])
+    if otra in huellas:
+        fallos.append('otra semilla produjo los mismos datos')
+
+    print()
+    for nombre, valor in distribuciones.items():
+        print(f'{nombre:<24} {valor:.2f}')
+    if distribuciones['top_1%'] < 0.25:
+        fallos.append(f'el 1 % de libros más vendidos solo reúne {distribuciones["top_1%"]:.0%} de las líneas')
+    if distribuciones['diciembre/promedio'] <= 1:
+        fallos.append('diciembre no tiene más pedidos que el promedio mensual')
+    if distribuciones['categoria_mayor/menor'] < 10:
+        fallos.append('las categorías no tienen cola larga')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Limpieza por lotes de carritos abandonados y sesiones vencidas (``limpiar_carritos``).
+
+Siembra sesiones vigentes y vencidas y carritos de todos los casos (recientes,
+inactivos, sin sesión, de usuarios) con sus items y reservas, y los limpia de
+dos formas mientras un hilo escribe en el carrito de un cliente cada pocos
+milisegundos: por lotes con ``limpiar_carritos`` y con un único DELETE por
+tabla, como ``clearsessions``. Informa las filas eliminadas, el tiempo y la
+espera más larga del hilo que escribe. Sale con código 1 si se elimina un
+carrito o una sesión que debía conservarse, si queda alguno que debía
+eliminarse o si quedan items de carritos eliminados. Los tiempos y esperas solo
+se informan: en una sola corrida varían demasiado para decidir si falla. En CI
+esos casos los comprueban las pruebas de ``tienda/tests/test_limpieza.py``
+(``python manage.py test``).
+
+Uso:
+    python -m benchmarks.bench_limpiar_carritos --sesiones 100000 --carritos 50000 --lote 1000
+"""
+
+import argparse
+import io
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_libros
+
+# (caso, usuario, días sin cambios, sesión vigente, se elimina)
+CASOS = [
+    ('anonimo_reciente', False, 2, True, False),
+    ('anonimo_inactivo', False, 40, True, True),
+    ('sin_sesion', False, 2, False, True),
+    ('sin_sesion_recien_creado', False, 0.005, False, False),
+    ('usuario_reciente', True, 40, None, False),
+    ('usuario_inactivo', True, 200, None, True),
+]
+
+
+def _sembrar(sesiones, carritos, lote=5000):
+    """Crea las sesiones y los carritos de CASOS
+
+    Devuelve las claves de las sesiones vigentes y el caso de cada carrito por id.
+    """
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.contrib.sessions.models import Session
+    from django.utils import timezone
+    from tienda.datos_sinteticos import fechas_manuales
+    from tienda.models import Carrito, ItemCarrito, Libro, Reserva
+
+    ahora = timezone.now()
+    datos = SessionStore().encode({})
+    vigentes = set()
+    casos = {}
+    for inicio in range(0, sesiones, lote):
+        nuevas = []
+        for numero in range(inicio, min(inicio + lote, sesiones)):
+            # Seis de cada diez vencidas
+            vencida = numero % 10 < 6
+            clave = f's{numero:039d}'
+            if not vencida:
+                vigentes.add(clave)
+            expira = ahora + timedelta(days=-1 if vencida else 7)
+            nuevas.append(Session(session_key=clave, session_data=datos, expire_date=expira))
+        Session.objects.bulk_create(nuevas)
+
+    usuarios = list(User.objects.bulk_create([User(username=f'limpieza{numero}') for numero in range(1000)]))
+    libros = list(Libro.objects.values_list('pk', flat=True)[:20])
+    claves_vigentes = sorted(vigentes)
+    with fechas_manuales((Carrito, 'fecha_creacion'), (Carrito, 'fecha_actualizacion')):
+        for inicio in range(0, carritos, lote):
+            nuevos = []
+            for numero in range(inicio, min(inicio + lote, carritos)):
+                caso, de_usuario, dias, con_sesion, _ = CASOS[numero % len(CASOS)]
+                fecha = ahora - timedelta(days=dias)
+                carrito = Carrito(fecha_creacion=fecha, fecha_actualizacion=fecha)
+                carrito.caso = caso
+                if de_usuario:
+                    carrito.usuario = usuarios[numero % len(usuarios)]
+                elif con_sesion:
+                    carrito.session_key = claves_vigentes[numero % len(claves_vigentes)]
+                else:
+                    carrito.session_key = f'x{numero:039d}'
+                nuevos.append(carrito)
+            # Los carritos de usuario son uno por usuario en la práctica; aquí da igual
+            creados = Carrito.objects.bulk_create(nuevos)
+            casos.update((carrito.pk, carrito.caso) for carrito in creados)
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, libro_id=libros[(carrito.pk + desfase) % len(libros)], cantidad=1)
+                for carrito in creados for desfase in (0, 7)
+            ])
+            # Reservas vencidas: con una vigente el carrito no se elimina
+            Reserva.objects.bulk_create([
+                Reserva(carrito=carrito, libro_id=libros[carrito.pk % len(libros)], cantidad=1,
+                        fecha_expiracion=ahora - timedelta(minutes=15))
+                for carrito in creados[::10]
+            ])
+    return vigentes, casos
+
+
+class Escritor(threading.Thread):
+    """Actualiza un carrito en bucle y registra la espera más larga de cada escritura"""
+
+    def __init__(self, carrito_id):
+        super().__init__(daemon=True)
+        self.carrito_id = carrito_id
+        self.detener = threading.Event()
+        self.espera_maxima = 0.0
+        self.escrituras = 0
+
+    def run(self):
+        from django.db import connection
+        from tienda.models import Carrito
+
+        try:
+            while not self.detener.is_set():
+                inicio = time.perf_counter()
+                Carrito.objects.filter(pk=self.carrito_id).update(cantidad_total=self.escrituras)
+                self.espera_maxima = max(self.espera_maxima, time.perf_counter() - inicio)
+                self.escrituras += 1
+                time.sleep(0.005)
+        finally:
+            connection.close()
+
+
+def _limpiar_sin_lotes():
+    """Un único DELETE por tabla, como clearsessions"""
+    from django.contrib.sessions.models import Session
+    from django.utils import timezone
+    from tienda.limpieza import carritos_abandonados
+
+    Session.objects.filter(expire_date__lt=timezone.now()).delete()
+    carritos_abandonados().delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sesiones', type=int, default=100000)
+    parser.add_argument('--carritos', type=int, default=50000)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.contrib.sessions.models import Session
+    from django.core.management import call_command
+    from tienda.models import Carrito, ItemCarrito
+
+    fallos = []
+    print(f'{"limpieza":<10} {"sesiones":>10} {"carritos":>10} {"items":>10} {"tiempo":>10} {"espera máx.":>12}')
+    for modo in ('lotes', 'sin_lotes'):
+        with base_de_datos_temporal(en_archivo=True):
+            sembrar_libros(50)
+            vigentes, casos = _sembrar(args.sesiones, args.carritos)
+            antes = (Session.objects.count(), Carrito.objects.count(), ItemCarrito.objects.count())
+
+            cliente = next(pk for pk, caso in casos.items() if caso == 'anonimo_reciente')
+            escritor = Escritor(cliente)
+            escritor.start()
+            time.sleep(0.1)
+            inicio = time.perf_counter()
+            if modo == 'lotes':
+                call_command('limpiar_carritos', lote=args.lote, stdout=io.StringIO())
+            else:
+                _limpiar_sin_lotes()
+            duracion = time.perf_counter() - inicio
+            escritor.detener.set()
+            escritor.join()
+
+            despues = (Session.objects.count(), Carrito.objects.count(), ItemCarrito.objects.count())
+            eliminadas = [a - d for a, d in zip(antes, despues)]
+            print(
+                f'{modo:<10} {eliminadas[0]:>10} {eliminadas[1]:>10} {eliminadas[2]:>10} '
+                f'{duracion:>8.2f} s {escritor.espera_maxima * 1000:>9.0f} ms'
+            )
+            if modo == 'lotes':
+                quedan = {casos[pk] for pk in Carrito.objects.values_list('pk', flat=True)}
+                for caso, _, _, _, se_elimina in CASOS:
+                    if se_elimina and caso in quedan:
+                        fallos.append(f'quedaron carritos {caso}')
+                    if not se_elimina and caso not in quedan:
+                        fallos.append(f'se eliminaron los carritos {caso}')
+                if set(Session.objects.values_list('session_key', flat=True)) != vigentes:
+                    fallos.append('las sesiones que quedan no son exactamente las vigentes')
+                if ItemCarrito.objects.exclude(carrito__in=Carrito.objects.all()).exists():
+                    fallos.append('quedaron items de carritos eliminados')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Costo y exactitud de ``MedicionMiddleware`` (Server-Timing por petición).
+
+Mide la latencia del catálogo, del detalle de un libro y del contador del
+carrito con la medición apagada y encendida, y compara las consultas que
+informa la cabecera ``Server-Timing`` con las que captura Django, también en
+una vista asíncrona. Sale con código 1 si la cabecera falta o no coincide, si
+una vista sobre su presupuesto no queda marcada, o si la medición apagada deja
+alguna cabecera.
+
+Uso:
+    python -m benchmarks.bench_medicion --libros 2000 --repeticiones 30
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+
+def _consultas(respuesta):
+    coincidencia = re.search(r'desc="consultas=(\d+)"', respuesta.get('Server-Timing', ''))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.db import connection, reset_queries
+    from django.test import AsyncClient, Client
+    from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+    from django.urls import reverse
+    from tienda.models import Libro
+
+    setup_test_environment()
+    # Sin el log por consola, para no mezclarlo con la tabla
+    logging.getLogger('tienda.medicion').disabled = True
+    fallos = []
+    with base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        libro_id = Libro.objects.values_list('pk', flat=True).first()
+        urls = {
+            'index': reverse('index'),
+            'detalle_libro': reverse('detalle_libro', args=[libro_id]),
+            'contador_carrito': reverse('contador_carrito'),
+        }
+
+        print(f'{"vista":<18} {"sin medir":>12} {"midiendo":>12}')
+        for vista, url in urls.items():
+            tiempos = {}
+            for medir_peticion in (False, True):
+                with override_settings(TIENDA_MEDICION=medir_peticion):
+                    # El middleware se elige al crear el manejador del cliente
+                    cliente = Client()
+
+                    def pedir():
+                        cache.clear()
+                        return cliente.get(url)
+
+                    tiempos[medir_peticion] = medir(pedir, args.repeticiones)
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as capturadas:
+                        respuesta = pedir()
+                    capturadas = len(capturadas)
+
+                if not medir_peticion and 'Server-Timing' in respuesta:
+                    fallos.append(f'{vista}: la medición apagada agregó Server-Timing')
+                elif medir_peticion and _consultas(respuesta) != capturadas:
+                    fallos.append(
+                        f'{vista}: Server-Timing informa {_consultas(respuesta)} consultas, Django capturó {capturadas}'
+                    )
+            print(f'{vista:<18} {tiempos[False]["p50"]:>9.2f} ms {tiempos[True]["p50"]:>9.2f} ms')
+
+        with override_settings(TIENDA_MEDICION=True, TIENDA_MEDICION_PRESUPUESTOS={'index': 0}):
+            cache.clear()
+            respuesta = Client().get(urls['index'])
+            if not respuesta.get('X-Presupuesto-Consultas'):
+                fallos.append('el catálogo con presupuesto 0 no quedó marcado')
+
+            # Las vistas asíncronas consultan desde hilos de sync_to_async
+            async def agregar():
+                return await AsyncClient().post(reverse('agregar_al_carrito', args=[libro_id]))
+
+            Libro.objects.filter(pk=libro_id).update(stock=10, activo=True)
+            respuesta = asyncio.run(agregar())
+            if not _consultas(respuesta):
+                fallos.append(f'la vista asíncrona informó {_consultas(respuesta)} consultas')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Genera miniaturas de portadas sintéticas con uno y varios procesos.
+
+Crea libros con portadas JPEG grandes en un MEDIA_ROOT temporal, ejecuta
+``manage.py generar_miniaturas`` con cada número de procesos y compara el peso
+de la portada original con el de la miniatura que elegiría el navegador para
+las tarjetas del carrito (60 px a densidad 2x). Sale con código 1 si falta
+alguna miniatura, si una miniatura pesa más que el original o si la subida de
+una imagen nueva no genera sus miniaturas.
+
+Uso:
+    python -m benchmarks.bench_miniaturas --libros 200 --procesos 1 4
+"""
+
+import argparse
+import io
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_libros
+
+
+def portada(aleatorio, ancho=1600, alto=2400):
+    """JPEG con degradado y ruido, parecido en peso a una portada escaneada"""
+    from PIL import Image, ImageDraw
+
+    imagen = Image.new('RGB', (ancho, alto), tuple(aleatorio.randrange(256) for _ in range(3)))
+    dibujo = ImageDraw.Draw(imagen)
+    for _ in range(60):
+        x, y = aleatorio.randrange(ancho), aleatorio.randrange(alto)
+        dibujo.ellipse(
+            (x, y, x + aleatorio.randrange(50, 600), y + aleatorio.randrange(50, 600)),
+            fill=tuple(aleatorio.randrange(256) for _ in range(3)),
+        )
+    imagen = Image.blend(imagen, Image.effect_noise((ancho, alto), 40).convert('RGB'), 0.15)
+    contenido = io.BytesIO()
+    imagen.save(contenido, format='JPEG', quality=90)
+    return contenido.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=200)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.core.management import call_command
+    from django.template import Context, Template
+    from django.test.utils import override_settings
+    from tienda.models import Libro
+
+    fallos = []
+    aleatorio = random.Random(42)
+    with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        portadas = [portada(aleatorio) for _ in range(10)]
+        libros = list(Libro.objects.order_by('pk'))
+        for numero, libro in enumerate(libros):
+            libro.imagen = default_storage.save(f'libros/portada_{numero}.jpg', ContentFile(portadas[numero % 10]))
+        Libro.objects.bulk_update(libros, ['imagen'])
+
+        print(f'{"procesos":>9} {"segundos":>9} {"libros/s":>9}')
+        for procesos in args.procesos:
+            inicio = time.perf_counter()
+            call_command('generar_miniaturas', procesos=procesos, forzar=True, stdout=io.StringIO())
+            segundos = time.perf_counter() - inicio
+            print(f'{procesos:>9} {segundos:>9.2f} {len(libros) / segundos:>9.1f}')
+
+        sin_miniaturas = Libro.objects.exclude(imagen='').filter(miniaturas={}).count()
+        if sin_miniaturas:
+            fallos.append(f'{sin_miniaturas} libros quedaron sin miniaturas')
+
+        libro = Libro.objects.order_by('pk').first()
+        original = default_storage.size(libro.imagen.name)
+        print(f'\nportada original: {original / 1024:.0f} KB')
+        for formato, variantes in libro.miniaturas['formatos'].items():
+            for ancho, nombre in variantes:
+                if not default_storage.exists(nombre):
+                    fallos.append(f'no existe {nombre}')
+                    continue
+                peso = default_storage.size(nombre)
+                marca = '  <- carrito (60 px, 2x)' if ancho == 160 else ''
+                print(f'  {formato:<5} {ancho:>4} px {peso / 1024:>7.1f} KB{marca}')
+                if peso >= original:
+                    fallos.append(f'{nombre} pesa más que la portada original')
+
+        html = Template('{% load imagenes %}{% imagen_libro libro "60px" %}').render(Context({'libro': libro}))
+        if 'srcset=' not in html or '160w' not in html:
+            fallos.append(f'la etiqueta no produjo un srcset: {html}')
+
+        # Subir una portada nueva genera las miniaturas sin pasar por el comando
+        libro.imagen.save('nueva.jpg', ContentFile(portadas[1]))
+        libro.refresh_from_db()
+        if libro.miniaturas.get('origen') != libro.imagen.name:
+            fallos.append('al guardar una imagen nueva no se generaron sus miniaturas')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
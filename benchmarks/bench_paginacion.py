@@ -0,0 +1,79 @@
+"""
+Compara la paginación anterior (Paginator: COUNT + OFFSET) con la paginación
+por cursor del catálogo, en la primera página y en una página profunda.
+
+Uso:
+    python -m benchmarks.bench_paginacion --libros 125000 --pagina 10000
+"""
+
+import argparse
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_libros
+
+POR_PAGINA = 12
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--libros', type=int, default=125000)
+    parser.add_argument('--pagina', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.core.paginator import Paginator
+    from django.db import connection
+    from tienda.models import Libro
+    from tienda.paginacion import codificar_cursor, contar_en_cache, paginar_por_cursor
+
+    with base_de_datos_temporal():
+        sembrar_libros(args.libros)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        catalogo = Libro.objects.filter(activo=True, stock__gt=0).select_related('categoria')
+        paginas = (catalogo.count() + POR_PAGINA - 1) // POR_PAGINA
+        if paginas < args.pagina:
+            print(f'El catálogo solo tiene {paginas} páginas; usa más --libros', file=sys.stderr)
+            sys.exit(1)
+
+        # Cursor que lleva a la página profunda: el último libro de la página anterior
+        anterior = catalogo.order_by('-fecha_creacion', '-id')[(args.pagina - 1) * POR_PAGINA - 1]
+        cursor_profundo = codificar_cursor(anterior)
+
+        def paginator(numero):
+            def pedir():
+                pagina = Paginator(catalogo, POR_PAGINA).get_page(numero)
+                pagina.paginator.count
+                list(pagina)
+            return pedir
+
+        def por_cursor(despues):
+            def pedir():
+                list(paginar_por_cursor(catalogo, POR_PAGINA, despues=despues))
+                contar_en_cache(catalogo)
+            return pedir
+
+        esperado = list(Paginator(catalogo.order_by('-fecha_creacion', '-id'), POR_PAGINA).page(args.pagina))
+        obtenido = list(paginar_por_cursor(catalogo, POR_PAGINA, despues=cursor_profundo))
+        if [l.pk for l in esperado] != [l.pk for l in obtenido]:
+            print('La página por cursor no coincide con la del Paginator', file=sys.stderr)
+            sys.exit(1)
+
+        cache.clear()
+        variantes = [
+            ('Paginator página 1', paginator(1)),
+            (f'Paginator página {args.pagina}', paginator(args.pagina)),
+            ('cursor página 1', por_cursor(None)),
+            (f'cursor página {args.pagina}', por_cursor(cursor_profundo)),
+        ]
+        print(f'{"variante":<26} {"p50":>10} {"p95":>10}')
+        for nombre, funcion in variantes:
+            tiempos = medir(funcion, args.repeticiones)
+            print(f'{nombre:<26} {tiempos["p50"]:>7.2f} ms {tiempos["p95"]:>7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
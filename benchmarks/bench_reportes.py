@@ -0,0 +1,116 @@
+"""
+Compara el reporte de ventas anterior (una consulta por mes), la agrupación
+directa sobre los pedidos y la lectura del resumen diario (VentaDiaria), en
+número de consultas y latencia. También mide la reconstrucción completa del
+resumen y la actualización incremental tras cambiar el estado de un pedido, y
+sale con código 1 si el resumen no coincide con los pedidos.
+
+Uso:
+    python -m benchmarks.bench_reportes --tamanos 10000 100000 1000000
+"""
+
+import argparse
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, medir, sembrar_pedidos
+
+
+def reporte_anterior():
+    """Implementación original de reportes_ventas, conservada como referencia"""
+    from django.db.models import Count, Sum
+    from django.utils import timezone
+    from tienda.models import ItemPedido, Pedido
+
+    ventas_por_mes = []
+    for i in range(12):
+        fecha = timezone.now() - timedelta(days=30 * i)
+        ventas = Pedido.objects.filter(
+            fecha_creacion__month=fecha.month,
+            fecha_creacion__year=fecha.year,
+            estado__in=['procesando', 'enviado', 'entregado']
+        ).aggregate(total=Sum('total'), cantidad=Count('id'))
+        ventas_por_mes.append(ventas)
+    list(ItemPedido.objects.values('libro__titulo').annotate(
+        cantidad_vendida=Sum('cantidad'),
+        ingresos=Sum('precio_unitario')
+    ).order_by('-cantidad_vendida')[:10])
+
+
+def reporte_agrupado_pedidos(desde, hasta, periodo):
+    """Serie agrupada directamente sobre Pedido, sin el resumen diario"""
+    from django.db.models import Count, Sum
+    from tienda.reportes import PERIODOS, pedidos_vendidos
+
+    funcion, _ = PERIODOS[periodo]
+    return list(
+        pedidos_vendidos(desde, hasta)
+        .annotate(periodo=funcion('fecha_creacion'))
+        .values('periodo')
+        .annotate(total=Sum('total'), cantidad=Count('id'))
+        .order_by()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    configurar_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.db.models import Count, Sum
+    from tienda.models import Pedido
+    from tienda.reportes import pedidos_vendidos, rango_ultimos_meses, reporte_ventas
+    from tienda.ventas_diarias import actualizar_pendientes, reconstruir
+
+    def reporte_nuevo(periodo):
+        desde, hasta = rango_ultimos_meses()
+        return lambda: reporte_ventas(desde, hasta, periodo)
+
+    desde, hasta = rango_ultimos_meses()
+    variantes = [
+        ('anterior (12 meses)', reporte_anterior),
+        ('pedidos por mes', lambda: reporte_agrupado_pedidos(desde, hasta, 'mes')),
+        ('resumen por mes', reporte_nuevo('mes')),
+        ('resumen por semana', reporte_nuevo('semana')),
+        ('resumen por día', reporte_nuevo('dia')),
+    ]
+
+    fallos = []
+    with base_de_datos_temporal():
+        print(f'{"pedidos":>10} {"variante":<22} {"consultas":>9} {"p50":>10}')
+        for tamano in sorted(args.tamanos):
+            sembrar_pedidos(tamano - Pedido.objects.count())
+            inicio = time.perf_counter()
+            reconstruir()
+            print(f'{tamano:>10} {"reconstruir resumen":<22} {"":>9} {(time.perf_counter() - inicio) * 1000:>7.1f} ms')
+
+            pedido = Pedido.objects.filter(estado='pendiente').first()
+            pedido.estado = 'entregado'
+            pedido.save(update_fields=['estado', 'fecha_actualizacion'])
+            inicio = time.perf_counter()
+            actualizar_pendientes()
+            print(f'{tamano:>10} {"actualizar 1 día":<22} {"":>9} {(time.perf_counter() - inicio) * 1000:>7.1f} ms')
+
+            for nombre, funcion in variantes:
+                with CaptureQueriesContext(connection) as consultas:
+                    funcion()
+                tiempos = medir(funcion, args.repeticiones)
+                print(f'{tamano:>10} {nombre:<22} {len(consultas):>9} {tiempos["p50"]:>7.1f} ms')
+
+            esperado = pedidos_vendidos(desde, hasta).aggregate(total=Sum('total'), cantidad=Count('id'))
+            reporte = reporte_ventas(desde, hasta)
+            if (reporte['total'], reporte['cantidad']) != (esperado['total'] or 0, esperado['cantidad']):
+                fallos.append(f'{tamano}: resumen {reporte["total"]}/{reporte["cantidad"]} != pedidos {esperado}')
+
+    for fallo in fallos:
+        print(f'FALLO {fallo}')
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
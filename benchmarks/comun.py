@@ -0,0 +1,145 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks se ejecutan desde la raíz del proyecto como módulos, por ejemplo
+``python -m benchmarks.bench_busqueda``, y trabajan siempre sobre una base de
+datos de pruebas desechable para no tocar ``db.sqlite3``.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+PALABRAS = [
+    'amor', 'guerra', 'historia', 'ciudad', 'noche', 'mar', 'sombra', 'tiempo',
+    'jardín', 'río', 'memoria', 'camino', 'corazón', 'silencio', 'fuego',
+    'invierno', 'montaña', 'secreto', 'destino', 'luz', 'programación', 'cocina',
+    'economía', 'filosofía', 'ciencia', 'arte', 'música', 'viaje', 'sueño',
+]
+NOMBRES = ['Gabriel', 'Isabel', 'Jorge', 'Laura', 'Miguel', 'Ana', 'Julio', 'Rosa']
+APELLIDOS = ['García', 'Márquez', 'Allende', 'Borges', 'Cortázar', 'Neruda', 'Paz']
+SILABAS = ['ca', 'lo', 'mi', 'ra', 'te', 'su', 'no', 've', 'da', 'pi', 'go', 'ma']
+
+# Vocabulario amplio para las descripciones, así los términos son selectivos
+VOCABULARIO = [a + b + c for a in SILABAS for b in SILABAS for c in SILABAS]
+
+
+def configurar_django():
+    """Prepara Django usando la configuración del proyecto"""
+    if str(RAIZ) not in sys.path:
+        sys.path.insert(0, str(RAIZ))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'VentaLibros.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def base_de_datos_temporal(en_archivo=False):
+    """Crea una base de datos de pruebas y la destruye al terminar
+
+    Con ``en_archivo`` la base de SQLite se crea en disco, necesario cuando
+    varios hilos deben compartirla con bloqueos reales entre conexiones.
+    """
+    from django.db import connection
+
+    nombre_original = connection.settings_dict['NAME']
+    if en_archivo and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = str(RAIZ / 'benchmarks' / 'bench.sqlite3')
+        connection.settings_dict['OPTIONS'].setdefault('timeout', 30)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+def sembrar_libros(cantidad, semilla=42, lote=10000):
+    """Crea ``cantidad`` libros sintéticos adicionales con bulk_create"""
+    from tienda.models import Categoria, Libro
+
+    existentes = Libro.objects.count()
+    aleatorio = random.Random(semilla + existentes)
+    categorias = list(Categoria.objects.all())
+    if not categorias:
+        categorias = Categoria.objects.bulk_create([
+            Categoria(nombre=f'Categoría {i}') for i in range(20)
+        ])
+
+    pendientes = []
+    for numero in range(existentes, existentes + cantidad):
+        titulo = ' '.join(aleatorio.sample(PALABRAS, 3)).capitalize()
+        autor = f'{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)}'
+        pendientes.append(Libro(
+            titulo=titulo,
+            autor=autor,
+            descripcion=' '.join(aleatorio.choices(VOCABULARIO, k=25)),
+            precio=Decimal(aleatorio.randrange(10000, 120000, 500)),
+            categoria=aleatorio.choice(categorias),
+            stock=aleatorio.randint(0, 50),
+            isbn=f'978-{numero:09d}',
+        ))
+        if len(pendientes) >= lote:
+            Libro.objects.bulk_create(pendientes)
+            pendientes = []
+    if pendientes:
+        Libro.objects.bulk_create(pendientes)
+
+
+def sembrar_pedidos(cantidad, dias=730, semilla=42, lote=10000):
+    """Crea ``cantidad`` pedidos con una línea cada uno, repartidos en los últimos ``dias``"""
+    from datetime import timedelta
+    from django.utils import timezone
+    from tienda.datos_sinteticos import fechas_manuales
+    from tienda.models import ItemPedido, Libro, Pedido
+
+    aleatorio = random.Random(semilla + Pedido.objects.count())
+    libros = list(Libro.objects.values_list('pk', 'precio')[:500])
+    if not libros:
+        sembrar_libros(500, semilla=semilla)
+        libros = list(Libro.objects.values_list('pk', 'precio')[:500])
+    estados = ['pendiente', 'procesando', 'enviado', 'entregado', 'entregado', 'cancelado']
+    ahora = timezone.now()
+
+    with fechas_manuales((Pedido, 'fecha_creacion'), (Pedido, 'fecha_actualizacion')):
+        restantes = cantidad
+        while restantes > 0:
+            tamano = min(lote, restantes)
+            lineas = [(aleatorio.choice(libros), aleatorio.randint(1, 3)) for _ in range(tamano)]
+            fechas = [ahora - timedelta(seconds=aleatorio.randrange(dias * 86400)) for _ in range(tamano)]
+            pedidos = Pedido.objects.bulk_create([
+                Pedido(
+                    email='cliente@ejemplo.com', nombre_completo='Cliente', telefono='123',
+                    direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+                    estado=aleatorio.choice(estados),
+                    subtotal=precio * unidades, impuestos=0, total=precio * unidades,
+                    fecha_creacion=fecha, fecha_actualizacion=fecha,
+                )
+                for ((_, precio), unidades), fecha in zip(lineas, fechas)
+            ])
+            ItemPedido.objects.bulk_create([
+                ItemPedido(pedido=pedido, libro_id=libro_id, cantidad=unidades, precio_unitario=precio)
+                for pedido, ((libro_id, precio), unidades) in zip(pedidos, lineas)
+            ])
+            restantes -= tamano
+
+
+def medir(funcion, repeticiones=20):
+    """Ejecuta la función varias veces y devuelve estadísticas en milisegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'p50': statistics.median(tiempos),
+        'p95': tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))],
+        'min': tiempos[0],
+    }
@@ -0,0 +1,158 @@
+"""
+Verifica que cada vista ejecute un número fijo de consultas SQL.
+
+Siembra carritos, catálogos e historiales de 1, 10 y 100 elementos y falla
+(código de salida 1) si alguna vista supera su presupuesto o si su número de
+consultas crece con el tamaño de los datos. En CI la comprobación la hacen las
+pruebas de ``tienda/tests/test_consultas.py`` (``python manage.py test``); este
+script imprime la tabla de consultas por vista y tamaño:
+
+    python -m benchmarks.presupuesto_consultas
+"""
+
+import argparse
+import sys
+from decimal import Decimal
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django
+
+TAMANOS = [1, 10, 100]
+
+# Consultas máximas por vista, sin contar sesión ni autenticación
+PRESUPUESTO = {
+    'index': 4,
+    'index_busqueda': 4,
+    'detalle_libro': 3,
+    'ver_carrito': 2,
+    'checkout': 2,
+    'mis_pedidos': 2,
+    'detalle_pedido': 2,
+    'confirmacion_pedido': 2,
+    'panel_vendedor': 5,
+    'panel_vendedor_en_cache': 0,
+    'reportes_ventas': 2,
+    # Segunda visita anónima, servida desde el caché de páginas
+    'index_anonimo': 0,
+    'detalle_anonimo': 0,
+    # Listados del admin: tamaño estimado de la tabla, conteo (exacto si es chica) y página
+    'admin_carritos': 3,
+    'admin_items_carrito': 3,
+    'admin_items_pedido': 3,
+    'admin_pedidos': 3,
+}
+
+# Consultas de sesión y usuario que hace cualquier petición autenticada
+CONSULTAS_BASE = 2
+
+
+def sembrar(tamano):
+    """Crea un usuario con un carrito y un historial de ``tamano`` elementos"""
+    from django.contrib.auth.models import User
+    from tienda.models import Carrito, Categoria, ItemCarrito, ItemPedido, Libro, Pedido
+
+    usuario = User.objects.create_user(f'cliente{tamano}', is_staff=True, is_superuser=True)
+    categorias = [Categoria.objects.create(nombre=f'Categoría {tamano}-{i}') for i in range(3)]
+    libros = Libro.objects.bulk_create([
+        Libro(
+            titulo=f'Libro de memoria {i}', autor='Autor', descripcion='Descripción',
+            precio=Decimal('10000'), categoria=categorias[i % 3], stock=500,
+        )
+        for i in range(tamano)
+    ])
+    carrito = Carrito.objects.create(usuario=usuario)
+    ItemCarrito.objects.bulk_create([
+        ItemCarrito(carrito=carrito, libro=libro, cantidad=1) for libro in libros
+    ])
+    carrito.recalcular_totales()
+    pedidos = Pedido.objects.bulk_create([
+        Pedido(
+            usuario=usuario, email='cliente@ejemplo.com', nombre_completo='Cliente',
+            telefono='123', direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+            subtotal=Decimal('10000'), total=Decimal('11900'),
+        )
+        for _ in range(tamano)
+    ])
+    ItemPedido.objects.bulk_create([
+        ItemPedido(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+        for pedido in pedidos for libro in libros[:3]
+    ])
+    return usuario, libros[0], pedidos[0]
+
+
+def contar_consultas(cliente, url):
+    """Número de consultas que ejecuta una petición GET"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as consultas:
+        respuesta = cliente.get(url)
+    if respuesta.status_code != 200:
+        raise RuntimeError(f'{url} respondió {respuesta.status_code}')
+    return len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+
+    configurar_django()
+    from django.core.cache import cache
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from tienda.busqueda import reconstruir_indice
+
+    setup_test_environment()
+    resultados = {vista: [] for vista in PRESUPUESTO}
+
+    with base_de_datos_temporal():
+        for tamano in TAMANOS:
+            cache.clear()
+            usuario, libro, pedido = sembrar(tamano)
+            reconstruir_indice()
+            cliente = Client()
+            cliente.force_login(usuario)
+            # Primera lectura del contador del carrito, que luego queda en la sesión
+            cliente.get(reverse('contador_carrito'))
+            urls = {
+                'index': reverse('index'),
+                'index_busqueda': reverse('index') + '?busqueda=memoria',
+                'detalle_libro': reverse('detalle_libro', args=[libro.id]),
+                'ver_carrito': reverse('ver_carrito'),
+                'checkout': reverse('checkout'),
+                'mis_pedidos': reverse('mis_pedidos'),
+                'detalle_pedido': reverse('detalle_pedido', args=[pedido.id]),
+                'confirmacion_pedido': reverse('confirmacion_pedido', args=[pedido.id]),
+                'panel_vendedor': reverse('panel_vendedor'),
+                'panel_vendedor_en_cache': reverse('panel_vendedor'),
+                'reportes_ventas': reverse('reportes_ventas') + '?periodo=dia',
+                'admin_carritos': reverse('admin:tienda_carrito_changelist'),
+                'admin_items_carrito': reverse('admin:tienda_itemcarrito_changelist') + '?o=-5',
+                'admin_items_pedido': reverse('admin:tienda_itempedido_changelist') + '?o=-6',
+                'admin_pedidos': reverse('admin:tienda_pedido_changelist'),
+            }
+            for vista, url in urls.items():
+                resultados[vista].append(contar_consultas(cliente, url) - CONSULTAS_BASE)
+
+            # Sin sesión no hay consultas base que descontar
+            anonimo = Client()
+            for vista, url in (('index_anonimo', urls['index']), ('detalle_anonimo', urls['detalle_libro'])):
+                anonimo.get(url)
+                resultados[vista].append(contar_consultas(anonimo, url))
+
+    fallos = []
+    print(f'{"vista":<22}' + ''.join(f'{t:>8}' for t in TAMANOS) + f'{"máximo":>8}')
+    for vista, conteos in resultados.items():
+        print(f'{vista:<22}' + ''.join(f'{c:>8}' for c in conteos) + f'{PRESUPUESTO[vista]:>8}')
+        if max(conteos) > PRESUPUESTO[vista]:
+            fallos.append(f'{vista} supera el presupuesto de {PRESUPUESTO[vista]} consultas')
+        if len(set(conteos)) > 1:
+            fallos.append(f'{vista} crece con el tamaño de los datos: {conteos}')
+
+    for fallo in fallos:
+        print(f'FALLO: {fallo}', file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Servidor de la tienda sobre una base de datos desechable, para las pruebas de carga.
+
+Crea la base de pruebas en disco, siembra libros con stock y sirve la tienda
+con el servidor de desarrollo de Django en hilos (``wsgi``, lo mismo que
+``runserver``) o con uvicorn (``asgi``). La base se destruye al terminar con
+Ctrl+C o SIGTERM, así que los pedidos de la prueba nunca llegan a ``db.sqlite3``.
+``bench_carga --iniciar`` lo lanza y lo detiene solo.
+
+Uso:
+    python -m benchmarks.servidor_carga --servidor asgi --puerto 8765 --libros 2000
+"""
+
+import argparse
+import logging
+import signal
+import sys
+
+from benchmarks.comun import base_de_datos_temporal, configurar_django, sembrar_libros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--servidor', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--medir', action='store_true', help='activa TIENDA_MEDICION (Server-Timing)')
+    args = parser.parse_args()
+
+    if args.servidor == 'asgi':
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit('El servidor asgi necesita uvicorn: pip install uvicorn')
+
+    configurar_django()
+    from django.conf import settings
+
+    # Como en producción: sin registro de consultas ni páginas de error detalladas
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = [args.host, 'localhost', '127.0.0.1']
+    settings.TIENDA_MEDICION = args.medir
+
+    # SIGTERM termina como Ctrl+C, para que la base de pruebas se destruya
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with base_de_datos_temporal(en_archivo=True):
+        from tienda.models import Libro
+
+        sembrar_libros(args.libros)
+        Libro.objects.update(stock=100000, activo=True)
+        print(f'Tienda en http://{args.host}:{args.puerto}/ ({args.servidor}, {args.libros} libros)', flush=True)
+        try:
+            if args.servidor == 'asgi':
+                from django.core.asgi import get_asgi_application
+                uvicorn.run(get_asgi_application(), host=args.host, port=args.puerto, log_level='warning')
+            else:
+                from django.core.servers.basehttp import get_internal_wsgi_application, run
+                aplicacion = get_internal_wsgi_application()
+                # Después de cargar la aplicación, que vuelve a configurar el logging:
+                # una línea por petición del servidor de desarrollo tapa los mensajes útiles
+                logging.getLogger('django.server').setLevel(logging.WARNING)
+                run(args.host, args.puerto, aplicacion, threading=True)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'VentaLibros.settings')
 django.setup()
 
 from tienda.models import Categoria, Libro
+from tienda.busqueda import reconstruir_indice
+from tienda.importacion import importar_libros
 from django.core.files import File
 from decimal import Decimal
 
@@ -28,17 +30,16 @@ def crear_categorias():
         {'nombre': 'Salud y Bienestar', 'descripcion': 'Libros sobre salud, fitness y bienestar personal'},
     ]
     
-    categorias_creadas = []
-    for cat_data in categorias_data:
-        categoria, created = Categoria.objects.get_or_create(
-            nombre=cat_data['nombre'],
-            defaults={'descripcion': cat_data['descripcion']}
-        )
-        categorias_creadas.append(categoria)
-        if created:
-            print(f"✓ Categoría creada: {categoria.nombre}")
-        else:
-            print(f"- Categoría ya existe: {categoria.nombre}")
+    # Una sola sentencia; las categorías que ya existen se ignoran
+    Categoria.objects.bulk_create(
+        [Categoria(**cat_data) for cat_data in categorias_data],
+        ignore_conflicts=True,
+    )
+    categorias_creadas = list(
+        Categoria.objects.filter(nombre__in=[cat_data['nombre'] for cat_data in categorias_data])
+    )
+    for categoria in categorias_creadas:
+        print(f"✓ Categoría disponible: {categoria.nombre}")
     
     return categorias_creadas
 
@@ -182,29 +183,14 @@ def crear_libros():
         }
     ]
     
-    libros_creados = []
-    for libro_data in libros_data:
-        try:
-            categoria = Categoria.objects.get(nombre=libro_data['categoria'])
-            libro, created = Libro.objects.get_or_create(
-                titulo=libro_data['titulo'],
-                autor=libro_data['autor'],
-                defaults={
-                    'descripcion': libro_data['descripcion'],
-                    'precio': libro_data['precio'],
-                    'categoria': categoria,
-                    'stock': libro_data['stock'],
-                    'isbn': libro_data['isbn'],
-                    'activo': True
-                }
-            )
-            libros_creados.append(libro)
-            if created:
-                print(f"✓ Libro creado: {libro.titulo} - {libro.autor}")
-            else:
-                print(f"- Libro ya existe: {libro.titulo} - {libro.autor}")
-        except Categoria.DoesNotExist:
-            print(f"✗ Error: Categoría '{libro_data['categoria']}' no encontrada para {libro_data['titulo']}")
+    # Inserta o actualiza por ISBN en lote, igual que manage.py importar_catalogo
+    resumen = importar_libros(libros_data)
+    for error in resumen['errores']:
+        print(f"✗ Error: {error}")
+    reconstruir_indice()
+    libros_creados = list(Libro.objects.filter(isbn__in=[libro_data['isbn'] for libro_data in libros_data]))
+    for libro in libros_creados:
+        print(f"✓ Libro cargado: {libro.titulo} - {libro.autor}")
     
     return libros_creados
 
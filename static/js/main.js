@@ -81,15 +81,10 @@ function updateCarritoBadge(cantidad = null) {
             badge.textContent = cantidad;
         } else {
             // Obtener cantidad actual del carrito
-            fetch('/carrito/')
-            .then(response => response.text())
-            .then(html => {
-                const parser = new DOMParser();
-                const doc = parser.parseFromString(html, 'text/html');
-                const cantidadElement = doc.querySelector('#carrito-badge');
-                if (cantidadElement) {
-                    badge.textContent = cantidadElement.textContent;
-                }
+            fetch('/carrito/contador/')
+            .then(response => response.json())
+            .then(data => {
+                badge.textContent = data.cantidad_carrito;
             })
             .catch(error => console.error('Error al actualizar badge:', error));
         }
@@ -295,7 +290,12 @@ function mostrarNotificacion(tipo, mensaje, duracion = 5000) {
 // Utilidades
 function getCSRFToken() {
     const token = document.querySelector('[name=csrfmiddlewaretoken]');
-    return token ? token.value : '';
+    if (token) {
+        return token.value;
+    }
+    // Las páginas en caché no traen token; la cookie la entrega /carrito/contador/
+    const cookie = document.cookie.split('; ').find(valor => valor.startsWith('csrftoken='));
+    return cookie ? decodeURIComponent(cookie.split('=')[1]) : '';
 }
 
 function formatCurrency(amount) {
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Categoria, Libro, Carrito, ItemCarrito, Pedido, ItemPedido
+from django.db.models import F
+
+from .models import Categoria, Libro, Carrito, ItemCarrito, Pedido, ItemPedido, Reserva, VentaDiaria
+from .paginacion import PaginadorEstimado
 
 
 @admin.register(Categoria)
@@ -39,6 +42,7 @@ class ItemPedidoInline(admin.TabularInline):
     model = ItemPedido
     extra = 0
     readonly_fields = ['subtotal']
+    raw_id_fields = ['libro']
 
 
 @admin.register(Pedido)
@@ -48,7 +52,10 @@ class PedidoAdmin(admin.ModelAdmin):
     search_fields = ['nombre_completo', 'email', 'telefono']
     list_editable = ['estado']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+    raw_id_fields = ['usuario']
     inlines = [ItemPedidoInline]
+    paginator = PaginadorEstimado
+    show_full_result_count = False
     
     fieldsets = (
         ('Información del Cliente', {
@@ -69,23 +76,72 @@ class PedidoAdmin(admin.ModelAdmin):
 
 @admin.register(Carrito)
 class CarritoAdmin(admin.ModelAdmin):
+    # cantidad_total y total son columnas desnormalizadas: se ordenan sin calcular nada
     list_display = ['id', 'usuario', 'session_key', 'cantidad_total', 'total', 'fecha_creacion']
     list_filter = ['fecha_creacion']
     search_fields = ['usuario__username', 'session_key']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+    raw_id_fields = ['usuario']
+    list_select_related = ['usuario']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
 
 
 @admin.register(ItemCarrito)
 class ItemCarritoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'carrito', 'libro', 'cantidad', 'subtotal', 'fecha_agregado']
+    list_display = ['id', 'carrito', 'libro', 'cantidad', 'subtotal_linea', 'fecha_agregado']
     list_filter = ['fecha_agregado']
     search_fields = ['libro__titulo', 'carrito__usuario__username']
     readonly_fields = ['fecha_agregado']
+    raw_id_fields = ['carrito', 'libro']
+    list_select_related = ['carrito__usuario', 'libro']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(importe=F('cantidad') * F('libro__precio'))
+
+    @admin.display(description='Subtotal', ordering='importe')
+    def subtotal_linea(self, obj):
+        return obj.importe
 
 
 @admin.register(ItemPedido)
 class ItemPedidoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'pedido', 'libro', 'cantidad', 'precio_unitario', 'subtotal']
+    list_display = ['id', 'pedido', 'libro', 'cantidad', 'precio_unitario', 'subtotal_linea']
     list_filter = ['pedido__fecha_creacion']
     search_fields = ['libro__titulo', 'pedido__nombre_completo']
+    raw_id_fields = ['pedido', 'libro']
+    list_select_related = ['pedido', 'libro']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(importe=F('cantidad') * F('precio_unitario'))
+
+    @admin.display(description='Subtotal', ordering='importe')
+    def subtotal_linea(self, obj):
+        return obj.importe
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'carrito', 'libro', 'cantidad', 'fecha_expiracion']
+    list_filter = ['fecha_expiracion']
+    search_fields = ['libro__titulo', 'carrito__session_key', 'carrito__usuario__username']
+    list_select_related = ['libro', 'carrito__usuario']
+
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'libro', 'categoria', 'pedidos', 'unidades', 'ingresos', 'total']
+    list_filter = ['fecha', 'categoria']
+    search_fields = ['libro__titulo']
+    list_select_related = ['libro', 'categoria']
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,246 @@
+"""
+API JSON de solo lectura del catálogo, versión 1 (``/api/v1/``).
+
+Las filas se leen con ``.values()`` sin instanciar modelos y ``?campos=``
+elige qué campos devolver (``?campos=id,titulo,precio``); el JOIN con la
+categoría solo se hace si se pide su nombre. El listado de libros se pagina por
+cursor como el catálogo, o por número de página cuando hay búsqueda.
+
+Las respuestas usan las marcas del caché de páginas (ver cache_paginas.py):
+mientras el catálogo no cambie se sirven desde el caché y una petición con
+If-None-Match recibe 304 sin consultar la base de datos. Se comprimen con gzip,
+o con Brotli si el paquete ``brotli`` está instalado y el cliente lo acepta.
+"""
+
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from django.views.decorators.http import require_GET
+
+from .busqueda import buscar_libros
+from .cache_paginas import cache_versionado, marcas_catalogo, marcas_libro
+from .models import Categoria, Libro
+from .paginacion import contar_en_cache, paginar_por_cursor, paginar_por_desplazamiento
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Campo de la API: campo de values() del que se lee
+CAMPOS_LIBRO = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'autor': 'autor',
+    'descripcion': 'descripcion',
+    'precio': 'precio',
+    'isbn': 'isbn',
+    'fecha_publicacion': 'fecha_publicacion',
+    'categoria_id': 'categoria_id',
+    'categoria': 'categoria__nombre',
+    'imagen': 'imagen',
+    'fecha_actualizacion': 'fecha_actualizacion',
+}
+# La descripción es el campo más pesado; en los listados solo se envía si se pide
+CAMPOS_LISTADO_LIBRO = [campo for campo in CAMPOS_LIBRO if campo != 'descripcion']
+
+CAMPOS_CATEGORIA = {
+    'id': 'id',
+    'nombre': 'nombre',
+    'descripcion': 'descripcion',
+}
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+TAMANO_MINIMO_COMPRESION = 200
+
+_acepta_gzip = re.compile(r'\bgzip\b')
+_acepta_brotli = re.compile(r'\bbr\b')
+
+
+class CamposInvalidos(ValueError):
+    """El parámetro campos nombra campos que la API no ofrece"""
+
+
+def comprimir(vista):
+    """Comprime la respuesta con Brotli o gzip según Accept-Encoding"""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        respuesta = vista(request, *args, **kwargs)
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+        if (
+            respuesta.status_code != 200 or respuesta.streaming
+            or respuesta.has_header('Content-Encoding')
+            or len(respuesta.content) < TAMANO_MINIMO_COMPRESION
+        ):
+            return respuesta
+
+        aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and _acepta_brotli.search(aceptadas):
+            contenido, codificacion = brotli.compress(respuesta.content, quality=5), 'br'
+        elif _acepta_gzip.search(aceptadas):
+            contenido, codificacion = compress_string(respuesta.content), 'gzip'
+        else:
+            return respuesta
+
+        respuesta.content = contenido
+        respuesta['Content-Length'] = str(len(contenido))
+        respuesta['Content-Encoding'] = codificacion
+        # El cuerpo comprimido no es idéntico byte a byte: el ETag pasa a ser débil
+        etag = respuesta.get('ETag')
+        if etag and not etag.startswith('W/'):
+            respuesta['ETag'] = 'W/' + etag
+        return respuesta
+    return envoltura
+
+
+def _error(mensaje, estado=400):
+    return JsonResponse({'error': mensaje}, status=estado)
+
+
+def _campos(request, disponibles, por_defecto):
+    """Campos pedidos en ?campos=, en el orden pedido; lanza CamposInvalidos si hay desconocidos"""
+    pedidos = request.GET.get('campos')
+    if not pedidos:
+        return list(por_defecto)
+    campos = list(dict.fromkeys(campo.strip() for campo in pedidos.split(',') if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in disponibles]
+    if desconocidos or not campos:
+        raise CamposInvalidos(
+            f'Campos desconocidos: {", ".join(desconocidos) or "(ninguno)"}. '
+            f'Disponibles: {", ".join(disponibles)}'
+        )
+    return campos
+
+
+def _serializar(filas, campos, origenes):
+    """Convierte filas de values() en diccionarios con los nombres de la API"""
+    pares = [(campo, origenes[campo]) for campo in campos]
+    resultado = [{campo: fila[origen] for campo, origen in pares} for fila in filas]
+    if 'imagen' in campos:
+        for libro in resultado:
+            libro['imagen'] = default_storage.url(libro['imagen']) if libro['imagen'] else None
+    return resultado
+
+
+def _respuesta(datos):
+    return JsonResponse(datos, json_dumps_params={'ensure_ascii': False})
+
+
+def _enlace(request, parametros):
+    if not parametros:
+        return None
+    consulta = request.GET.copy()
+    for nombre in ('despues', 'antes', 'page'):
+        consulta.pop(nombre, None)
+    consulta.update(parametros)
+    return request.build_absolute_uri(f'{request.path}?{consulta.urlencode()}')
+
+
+def _limite(request):
+    try:
+        return min(max(int(request.GET.get('limite', LIMITE_POR_DEFECTO)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        return LIMITE_POR_DEFECTO
+
+
+@require_GET
+@comprimir
+@cache_versionado(marcas_catalogo)
+def libros(request):
+    """Libros visibles del catálogo, filtrables por categoria y busqueda"""
+    try:
+        campos = _campos(request, CAMPOS_LIBRO, CAMPOS_LISTADO_LIBRO)
+    except CamposInvalidos as error:
+        return _error(str(error))
+
+    libros = Libro.objects.filter(activo=True, stock__gt=0)
+    categoria = request.GET.get('categoria')
+    if categoria:
+        if not categoria.isdigit():
+            return _error('categoria debe ser un id numérico')
+        libros = libros.filter(categoria_id=categoria)
+    busqueda = request.GET.get('busqueda')
+    if busqueda:
+        libros = buscar_libros(libros, busqueda)
+
+    # id y fecha_creacion siempre se leen porque forman el cursor
+    origenes = {CAMPOS_LIBRO[campo] for campo in campos} | {'id', 'fecha_creacion'}
+    filas = libros.values(*origenes)
+    limite = _limite(request)
+    if busqueda:
+        pagina = paginar_por_desplazamiento(filas, limite, request.GET.get('page'))
+    else:
+        pagina = paginar_por_cursor(
+            filas, limite, despues=request.GET.get('despues'), antes=request.GET.get('antes'),
+        )
+    return _respuesta({
+        'resultados': _serializar(pagina, campos, CAMPOS_LIBRO),
+        'siguiente': _enlace(request, pagina.siguiente),
+        'anterior': _enlace(request, pagina.anterior),
+        'total_aproximado': contar_en_cache(libros),
+    })
+
+
+@require_GET
+@comprimir
+@cache_versionado(marcas_libro)
+def libro(request, libro_id):
+    """Un libro visible del catálogo con todos sus campos, o los pedidos en ?campos="""
+    try:
+        campos = _campos(request, CAMPOS_LIBRO, CAMPOS_LIBRO)
+    except CamposInvalidos as error:
+        return _error(str(error))
+
+    fila = Libro.objects.filter(pk=libro_id, activo=True).values(
+        *{CAMPOS_LIBRO[campo] for campo in campos}
+    ).first()
+    if fila is None:
+        return _error('Libro no encontrado', estado=404)
+    return _respuesta(_serializar([fila], campos, CAMPOS_LIBRO)[0])
+
+
+@require_GET
+@comprimir
+@cache_versionado(marcas_catalogo)
+def categorias(request):
+    """Todas las categorías, con el enlace a sus libros"""
+    try:
+        campos = _campos(request, CAMPOS_CATEGORIA, CAMPOS_CATEGORIA)
+    except CamposInvalidos as error:
+        return _error(str(error))
+
+    filas = Categoria.objects.order_by('nombre').values(*{CAMPOS_CATEGORIA[campo] for campo in campos} | {'id'})
+    url_libros = request.build_absolute_uri(reverse('api_v1_libros'))
+    resultados = _serializar(filas, campos, CAMPOS_CATEGORIA)
+    for resultado, fila in zip(resultados, filas):
+        resultado['libros'] = f'{url_libros}?{urlencode({"categoria": fila["id"]})}'
+    return _respuesta({'resultados': resultados})
+
+
+@require_GET
+@comprimir
+@cache_versionado(lambda categoria_id: marcas_catalogo())
+def categoria(request, categoria_id):
+    """Una categoría"""
+    try:
+        campos = _campos(request, CAMPOS_CATEGORIA, CAMPOS_CATEGORIA)
+    except CamposInvalidos as error:
+        return _error(str(error))
+
+    fila = Categoria.objects.filter(pk=categoria_id).values(*{CAMPOS_CATEGORIA[campo] for campo in campos}).first()
+    if fila is None:
+        return _error('Categoría no encontrada', estado=404)
+    resultado = _serializar([fila], campos, CAMPOS_CATEGORIA)[0]
+    resultado['libros'] = request.build_absolute_uri(
+        f'{reverse("api_v1_libros")}?{urlencode({"categoria": categoria_id})}'
+    )
+    return _respuesta(resultado)
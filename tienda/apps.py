@@ -5,3 +5,5 @@ class TiendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tienda'
 
+    def ready(self):
+        from . import signals  # noqa: F401
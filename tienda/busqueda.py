@@ -0,0 +1,118 @@
+"""
+Búsqueda de texto completo sobre el catálogo de libros.
+
+En SQLite se usa una tabla virtual FTS5 (``tienda_libro_fts``) que se mantiene
+sincronizada con ``Libro`` mediante señales. En PostgreSQL se usa una columna
+``tsvector`` generada por la migración, con una configuración de texto que
+ignora tildes. Con cualquier otro motor se recurre a ``icontains``.
+"""
+
+import re
+
+from django.db import connection, models
+
+
+TABLA_FTS = 'tienda_libro_fts'
+CONFIGURACION_PG = 'tienda_es'
+
+# Peso de cada columna en el ranking (titulo, autor, descripcion, isbn)
+PESOS_BM25 = (10.0, 5.0, 1.0, 3.0)
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def _palabras(texto):
+    """Extrae las palabras buscables del texto ingresado por el usuario"""
+    return _PALABRA.findall(texto or '')
+
+
+def _consulta_fts5(palabras):
+    """Arma una consulta MATCH de FTS5 con búsqueda por prefijo"""
+    return ' '.join('"%s"*' % palabra for palabra in palabras)
+
+
+def _consulta_tsquery(palabras):
+    """Arma una consulta to_tsquery de PostgreSQL con búsqueda por prefijo"""
+    return ' & '.join('%s:*' % palabra for palabra in palabras)
+
+
+def motor_busqueda():
+    """Devuelve el motor de búsqueda disponible para la base de datos actual"""
+    if connection.vendor in ('sqlite', 'postgresql'):
+        return connection.vendor
+    return 'basico'
+
+
+def buscar_libros(queryset, texto):
+    """Filtra un queryset de libros por el texto dado, ordenado por relevancia"""
+    palabras = _palabras(texto)
+    if not palabras:
+        return queryset.none()
+
+    motor = motor_busqueda()
+    tabla = queryset.model._meta.db_table
+
+    if motor == 'sqlite':
+        pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+        return queryset.extra(
+            select={'relevancia': f'bm25({TABLA_FTS}, {pesos})'},
+            tables=[TABLA_FTS],
+            where=[
+                f'{TABLA_FTS}.rowid = {tabla}.id',
+                f'{TABLA_FTS} MATCH %s',
+            ],
+            params=[_consulta_fts5(palabras)],
+            order_by=['relevancia'],
+        )
+
+    if motor == 'postgresql':
+        consulta = f"to_tsquery('{CONFIGURACION_PG}', %s)"
+        return queryset.extra(
+            select={'relevancia': f'ts_rank_cd({tabla}.busqueda, {consulta})'},
+            select_params=[_consulta_tsquery(palabras)],
+            where=[f'{tabla}.busqueda @@ {consulta}'],
+            params=[_consulta_tsquery(palabras)],
+            order_by=['-relevancia'],
+        )
+
+    filtro = models.Q()
+    for palabra in palabras:
+        filtro &= (
+            models.Q(titulo__icontains=palabra) |
+            models.Q(autor__icontains=palabra) |
+            models.Q(isbn__icontains=palabra)
+        )
+    return queryset.filter(filtro)
+
+
+def indexar_libro(libro):
+    """Actualiza la entrada de un libro en el índice FTS5"""
+    if motor_busqueda() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [libro.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLA_FTS} (rowid, titulo, autor, descripcion, isbn) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [libro.pk, libro.titulo, libro.autor, libro.descripcion, libro.isbn],
+        )
+
+
+def desindexar_libro(libro_id):
+    """Elimina un libro del índice FTS5"""
+    if motor_busqueda() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [libro_id])
+
+
+def reconstruir_indice():
+    """Reconstruye el índice completo; necesario tras cargas con bulk_create"""
+    if motor_busqueda() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(
+            f'INSERT INTO {TABLA_FTS} (rowid, titulo, autor, descripcion, isbn) '
+            'SELECT id, titulo, autor, descripcion, isbn FROM tienda_libro'
+        )
@@ -0,0 +1,139 @@
+"""
+Caché de páginas completas para visitantes anónimos.
+
+El catálogo y el detalle de un libro son iguales para todos los visitantes sin
+sesión iniciada salvo por el contador del carrito, que se rellena desde el
+navegador (``/carrito/contador/``). Cada página depende de marcas de tiempo
+guardadas en el caché: una del catálogo y una por libro. Las marcas forman la
+clave de la página, su ETag y su Last-Modified; al cambiar un libro (precio,
+stock, reservas) las señales y los puntos que modifican stock renuevan la marca
+correspondiente, de modo que la página vieja deja de usarse sin borrarla y las
+peticiones condicionales reciben 304 mientras nada cambie.
+"""
+
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+CLAVE_MARCA_CATALOGO = 'tienda:marca:catalogo'
+
+
+def _segundos_cache():
+    return getattr(settings, 'TIENDA_PAGINAS_CACHE_SEGUNDOS', 600)
+
+
+def _clave_marca_libro(libro_id):
+    return f'tienda:marca:libro:{libro_id}'
+
+
+def _marcas(claves):
+    """Marcas de tiempo de las claves; las que el caché perdió se crean con la hora actual"""
+    marcas = cache.get_many(claves)
+    faltantes = [clave for clave in claves if clave not in marcas]
+    if faltantes:
+        # Una marca nueva nunca coincide con páginas guardadas con la anterior
+        ahora = timezone.now()
+        for clave in faltantes:
+            cache.add(clave, ahora, None)
+        marcas.update(cache.get_many(faltantes))
+    return [marcas[clave] for clave in claves]
+
+
+def marcas_catalogo():
+    return _marcas([CLAVE_MARCA_CATALOGO])
+
+
+def marcas_libro(libro_id):
+    return _marcas([CLAVE_MARCA_CATALOGO, _clave_marca_libro(libro_id)])
+
+
+def purgar_catalogo(fecha=None):
+    """Invalida todas las páginas en caché (el catálogo y los detalles lo incluyen)"""
+    cache.set(CLAVE_MARCA_CATALOGO, fecha or timezone.now(), None)
+
+
+def purgar_libros(libro_ids, fecha=None):
+    """Invalida el detalle en caché de los libros indicados"""
+    fecha = fecha or timezone.now()
+    cache.set_many({_clave_marca_libro(libro_id): fecha for libro_id in libro_ids}, None)
+
+
+def es_compartida(request):
+    """Indica si la página se renderiza para guardarla y servirla a cualquier anónimo"""
+    return getattr(request, 'pagina_compartida', False)
+
+
+def _lectura(request):
+    return request.method in ('GET', 'HEAD')
+
+
+def _lectura_anonima(request):
+    if not _lectura(request) or request.user.is_authenticated:
+        return False
+    # Los mensajes pendientes son propios del visitante
+    return not len(get_messages(request))
+
+
+def cache_versionado(marcas, cacheable=_lectura):
+    """Sirve la vista desde el caché mientras no cambien sus marcas, con ETag y Last-Modified
+
+    ``marcas`` recibe los argumentos de la vista y devuelve las marcas de tiempo
+    de las que depende la respuesta; ``cacheable`` decide por petición si se
+    puede usar el caché.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not cacheable(request):
+                return vista(request, *args, **kwargs)
+
+            fechas = marcas(*args, **kwargs)
+            version = hashlib.md5('|'.join(fecha.isoformat() for fecha in fechas).encode()).hexdigest()
+            etag = f'"{version}"'
+            ultima_modificacion = timegm(max(fechas).utctimetuple())
+
+            respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+            if respuesta is None:
+                clave = 'tienda:pagina:' + hashlib.md5(
+                    f'{vista.__name__}:{request.get_full_path()}:{version}'.encode()
+                ).hexdigest()
+                guardada = cache.get(clave)
+                if guardada is not None:
+                    respuesta = HttpResponse(guardada['contenido'], content_type=guardada['tipo'])
+                    respuesta['X-Cache'] = 'HIT'
+                else:
+                    request.pagina_compartida = True
+                    respuesta = vista(request, *args, **kwargs)
+                    # Una página que abrió sesión o pidió token CSRF ya no es igual para todos
+                    if (
+                        respuesta.status_code != 200 or respuesta.streaming or respuesta.cookies
+                        or request.session.modified or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+                    ):
+                        return respuesta
+                    cache.set(clave, {
+                        'contenido': respuesta.content,
+                        'tipo': respuesta['Content-Type'],
+                    }, _segundos_cache())
+                    respuesta['X-Cache'] = 'MISS'
+
+            respuesta['ETag'] = etag
+            respuesta['Last-Modified'] = http_date(ultima_modificacion)
+            # El navegador guarda la página pero la revalida en cada visita
+            patch_cache_control(respuesta, max_age=0, must_revalidate=True)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def cache_anonimo(marcas):
+    """cache_versionado para páginas HTML: solo visitantes sin sesión iniciada ni mensajes"""
+    return cache_versionado(marcas, cacheable=_lectura_anonima)
@@ -0,0 +1,409 @@
+"""
+Acceso al carrito de compras del usuario o de la sesión actual.
+
+El carrito se guarda en uno de dos almacenes con la misma interfaz:
+
+- ``CarritoBD``: filas de Carrito e ItemCarrito, con reservas de stock. Lo usan
+  los usuarios con sesión iniciada.
+- ``CarritoSesion``: un diccionario {libro_id: cantidad} en la sesión, sin filas
+  ni reservas; el stock se valida al agregar y de nuevo al confirmar el pedido.
+  Lo usan los visitantes anónimos salvo que ``TIENDA_CARRITO_ANONIMO`` sea
+  ``'bd'``.
+
+Navegar la tienda no escribe nada: los almacenes solo guardan algo cuando se
+agrega un libro. Al iniciar sesión el carrito anónimo se suma al del usuario
+(``fusionar_carrito_anonimo``). La cantidad de items se guarda en la sesión
+para que el contador del carrito no consulte la base de datos en cada página.
+
+Las variantes con prefijo ``a`` son para las vistas asíncronas: la sesión y
+``request.user`` se cargan con consultas síncronas, así que esas funciones se
+ejecutan en el hilo de sincronía de Django.
+"""
+
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import IVA, Carrito, ItemCarrito, Libro
+from .pedidos import StockInsuficiente, confirmar_pedido
+from .reservas import comprobar_stock, liberar, reservar, reservar_varios, unidades_disponibles
+
+
+# Clave de sesión con el id del Carrito anónimo en la base de datos, que
+# sobrevive al cambio de session_key al iniciar sesión
+CLAVE_CARRITO_BD = 'carrito_id'
+CLAVE_CANTIDAD_ANONIMA = 'cantidad_carrito'
+
+_SIN_CARGAR = object()
+
+
+class AlmacenCarrito:
+    """Interfaz común de los carritos; los ids de item los define cada almacén"""
+
+    def __init__(self, request):
+        self.request = request
+        self.usuario = None
+
+    def items(self):
+        """Líneas del carrito con ``id``, ``libro``, ``cantidad`` y ``subtotal``"""
+        raise NotImplementedError
+
+    def cantidades(self):
+        """{libro_id: cantidad} de todas las líneas"""
+        raise NotImplementedError
+
+    @property
+    def total(self):
+        raise NotImplementedError
+
+    @property
+    def cantidad_total(self):
+        raise NotImplementedError
+
+    @property
+    def impuestos(self):
+        return self.total * IVA
+
+    @property
+    def total_con_impuestos(self):
+        return self.total + self.impuestos
+
+    def agregar(self, libro, cantidad):
+        """Suma unidades de un libro; lanza StockInsuficiente si no alcanzan"""
+        raise NotImplementedError
+
+    def actualizar(self, cantidades):
+        """Aplica {item_id: cantidad} a la vez; devuelve los items cambiados y los ids eliminados
+
+        Una cantidad de cero o menos elimina el item; los ids que no están en el
+        carrito se cuentan como eliminados. Si algún libro no tiene stock lanza
+        StockInsuficiente y no aplica ningún cambio.
+        """
+        raise NotImplementedError
+
+    def confirmar(self, pedido):
+        """Guarda el pedido con las líneas del carrito y lo vacía"""
+        raise NotImplementedError
+
+    def descartar(self):
+        """Elimina el carrito y libera lo que tuviera apartado"""
+        raise NotImplementedError
+
+
+class CarritoBD(AlmacenCarrito):
+    """Carrito en las tablas Carrito e ItemCarrito, con reservas de stock"""
+
+    def __init__(self, request, usuario=None):
+        """Sin usuario es el carrito anónimo de la sesión"""
+        super().__init__(request)
+        self.usuario = usuario
+        self._modelo = _SIN_CARGAR
+
+    def _filtro(self):
+        """Filtro del Carrito de la petición, o None si no puede existir ninguno"""
+        if self.usuario is not None:
+            return {'usuario': self.usuario}
+        carrito_id = self.request.session.get(CLAVE_CARRITO_BD)
+        if carrito_id:
+            return {'pk': carrito_id, 'usuario__isnull': True}
+        if self.request.session.session_key:
+            return {'session_key': self.request.session.session_key}
+        return None
+
+    @property
+    def modelo(self):
+        """El Carrito guardado, o None si todavía no existe"""
+        if self._modelo is _SIN_CARGAR:
+            filtro = self._filtro()
+            self._modelo = Carrito.objects.filter(**filtro).first() if filtro else None
+        return self._modelo
+
+    def _obtener_o_crear(self):
+        if self.modelo is not None:
+            return self.modelo
+        if self.usuario is not None:
+            carrito, _ = Carrito.objects.get_or_create(usuario=self.usuario)
+        else:
+            if not self.request.session.session_key:
+                self.request.session.create()
+            carrito = Carrito.objects.create(session_key=self.request.session.session_key)
+            self.request.session[CLAVE_CARRITO_BD] = carrito.pk
+        self._modelo = carrito
+        return carrito
+
+    def items(self):
+        return list(self.modelo.items.select_related('libro')) if self.modelo else []
+
+    def cantidades(self):
+        if self.modelo is None:
+            return {}
+        return dict(self.modelo.items.values_list('libro_id', 'cantidad'))
+
+    @property
+    def total(self):
+        return self.modelo.total if self.modelo else Decimal('0')
+
+    @property
+    def cantidad_total(self):
+        return self.modelo.cantidad_total if self.modelo else 0
+
+    def _bloquear(self, carrito):
+        """Escritura sin efecto que bloquea el carrito hasta el fin de la transacción
+
+        Dos cambios simultáneos del mismo carrito se ejecutan en serie y el segundo
+        lee los items que dejó el primero. El carrito se bloquea antes que los
+        libros, en el mismo orden que confirmar_pedido.
+        """
+        Carrito.objects.filter(pk=carrito.pk).update(fecha_actualizacion=timezone.now())
+
+    def agregar(self, libro, cantidad):
+        carrito = self._obtener_o_crear()
+        with transaction.atomic():
+            self._bloquear(carrito)
+            item = ItemCarrito.objects.filter(carrito=carrito, libro=libro).first()
+            nueva_cantidad = cantidad + (item.cantidad if item else 0)
+            reservar(carrito, libro, nueva_cantidad)
+            if item:
+                item.cantidad = nueva_cantidad
+                item.save()
+            else:
+                ItemCarrito.objects.create(carrito=carrito, libro=libro, cantidad=nueva_cantidad)
+            carrito.recalcular_totales()
+
+    def actualizar(self, cantidades):
+        carrito = self.modelo
+        if carrito is None:
+            return [], list(cantidades)
+
+        with transaction.atomic():
+            self._bloquear(carrito)
+            items = {item.pk: item for item in carrito.items.select_related('libro').filter(pk__in=cantidades)}
+            cambiados = [item for pk, item in items.items() if cantidades[pk] > 0]
+            eliminados = [pk for pk, cantidad in cantidades.items() if cantidad <= 0 or pk not in items]
+
+            reservar_varios(carrito, {item.libro_id: cantidades[item.pk] for item in cambiados})
+            for item in cambiados:
+                item.cantidad = cantidades[item.pk]
+            ItemCarrito.objects.bulk_update(cambiados, ['cantidad'])
+
+            libros_eliminados = [items[pk].libro_id for pk in eliminados if pk in items]
+            if libros_eliminados:
+                carrito.items.filter(libro_id__in=libros_eliminados).delete()
+                liberar(carrito, libros_eliminados)
+            carrito.recalcular_totales()
+        return cambiados, eliminados
+
+    def sumar(self, cantidades):
+        """Suma {libro_id: cantidad} a las líneas actuales, hasta donde alcance el stock"""
+        carrito = self._obtener_o_crear()
+        with transaction.atomic():
+            self._bloquear(carrito)
+            actuales = {item.libro_id: item for item in carrito.items.all()}
+            reservadas = reservar_varios(carrito, {
+                libro_id: cantidad + (actuales[libro_id].cantidad if libro_id in actuales else 0)
+                for libro_id, cantidad in cantidades.items()
+            }, ajustar=True)
+
+            cambiados = []
+            for libro_id, cantidad in reservadas.items():
+                if libro_id in actuales:
+                    actuales[libro_id].cantidad = cantidad
+                    cambiados.append(actuales[libro_id])
+            ItemCarrito.objects.bulk_update([item for item in cambiados if item.cantidad > 0], ['cantidad'])
+            carrito.items.filter(pk__in=[item.pk for item in cambiados if item.cantidad == 0]).delete()
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, libro_id=libro_id, cantidad=cantidad)
+                for libro_id, cantidad in reservadas.items() if cantidad > 0 and libro_id not in actuales
+            ])
+            carrito.recalcular_totales()
+
+    def confirmar(self, pedido):
+        return confirmar_pedido(pedido, self.modelo)
+
+    def descartar(self):
+        if self.modelo is not None:
+            liberar(self.modelo)
+            self.modelo.delete()
+            self._modelo = None
+        self.request.session.pop(CLAVE_CARRITO_BD, None)
+
+
+class ItemSesion:
+    """Línea de un CarritoSesion; su id es el del libro"""
+
+    def __init__(self, libro, cantidad):
+        self.id = libro.pk
+        self.libro = libro
+        self.cantidad = cantidad
+
+    @property
+    def subtotal(self):
+        return self.cantidad * self.libro.precio
+
+
+class CarritoSesion(AlmacenCarrito):
+    """Carrito guardado en la sesión como {libro_id: cantidad}, sin filas ni reservas"""
+
+    CLAVE = 'carrito'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self._items = None
+
+    def cantidades(self):
+        # Las claves de un diccionario guardado en la sesión vuelven como texto
+        return {int(libro_id): cantidad for libro_id, cantidad in self.request.session.get(self.CLAVE, {}).items()}
+
+    def _guardar(self, cantidades):
+        self.request.session[self.CLAVE] = {
+            str(libro_id): cantidad for libro_id, cantidad in cantidades.items() if cantidad > 0
+        }
+        self._items = None
+
+    def items(self):
+        if self._items is None:
+            cantidades = self.cantidades()
+            libros = Libro.objects.in_bulk(list(cantidades)) if cantidades else {}
+            self._items = [
+                ItemSesion(libros[libro_id], cantidad)
+                for libro_id, cantidad in cantidades.items() if libro_id in libros
+            ]
+        return self._items
+
+    @property
+    def total(self):
+        return sum((item.subtotal for item in self.items()), Decimal('0'))
+
+    @property
+    def cantidad_total(self):
+        return sum(self.cantidades().values())
+
+    def agregar(self, libro, cantidad):
+        cantidades = self.cantidades()
+        nueva_cantidad = cantidades.get(libro.pk, 0) + cantidad
+        if not libro.activo or nueva_cantidad > unidades_disponibles(libro):
+            raise StockInsuficiente([libro])
+        cantidades[libro.pk] = nueva_cantidad
+        self._guardar(cantidades)
+
+    def actualizar(self, cantidades):
+        actuales = self.cantidades()
+        cambios = {libro_id: cantidad for libro_id, cantidad in cantidades.items() if cantidad > 0 and libro_id in actuales}
+        eliminados = [libro_id for libro_id in cantidades if libro_id not in cambios]
+
+        if cambios:
+            comprobar_stock(cambios)
+        actuales.update(cambios)
+        for libro_id in eliminados:
+            actuales.pop(libro_id, None)
+        self._guardar(actuales)
+        return [item for item in self.items() if item.id in cambios], eliminados
+
+    def confirmar(self, pedido):
+        # confirmar_pedido trabaja sobre un Carrito: se arma uno temporal que no
+        # sobrevive a la transacción, confirme o no
+        with transaction.atomic():
+            carrito = Carrito.objects.create()
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, libro_id=libro_id, cantidad=cantidad)
+                for libro_id, cantidad in self.cantidades().items()
+            ])
+            confirmar_pedido(pedido, carrito)
+            carrito.delete()
+        self._guardar({})
+        return pedido
+
+    def descartar(self):
+        self.request.session.pop(self.CLAVE, None)
+        self._items = None
+
+
+ALMACENES_ANONIMOS = {
+    'sesion': CarritoSesion,
+    'bd': CarritoBD,
+}
+
+
+def _almacen_anonimo(request):
+    return ALMACENES_ANONIMOS[getattr(settings, 'TIENDA_CARRITO_ANONIMO', 'sesion')](request)
+
+
+def obtener_carrito(request):
+    """Carrito de la petición; no crea carrito ni sesión hasta que se le agrega algo"""
+    if request.user.is_authenticated:
+        return CarritoBD(request, request.user)
+    return _almacen_anonimo(request)
+
+
+def _clave_cantidad(usuario):
+    """Clave de sesión del contador, distinta por usuario para sobrevivir al login"""
+    if usuario is not None:
+        return f'cantidad_carrito_{usuario.pk}'
+    return CLAVE_CANTIDAD_ANONIMA
+
+
+def cantidad_en_carrito(request):
+    """Cantidad de libros en el carrito, leída de la sesión si está disponible"""
+    carrito = obtener_carrito(request)
+    clave = _clave_cantidad(carrito.usuario)
+    cantidad = request.session.get(clave)
+    if cantidad is not None:
+        return cantidad
+
+    cantidad = carrito.cantidad_total
+    if request.session.session_key:
+        request.session[clave] = cantidad
+    return cantidad
+
+
+def recordar_cantidad(request, carrito):
+    """Guarda en la sesión la cantidad actual del carrito tras modificarlo"""
+    request.session[_clave_cantidad(carrito.usuario)] = carrito.cantidad_total
+
+
+def _resumen(carrito):
+    return {
+        'total': float(carrito.total),
+        'impuestos': float(carrito.impuestos),
+        'total_con_impuestos': float(carrito.total_con_impuestos),
+        'cantidad_carrito': carrito.cantidad_total,
+    }
+
+
+def agregar_libro(request, libro, cantidad):
+    """Agrega unidades de un libro al carrito y devuelve sus totales"""
+    carrito = obtener_carrito(request)
+    carrito.agregar(libro, cantidad)
+    recordar_cantidad(request, carrito)
+    return _resumen(carrito)
+
+
+def cambiar_cantidades(request, cantidades):
+    """Aplica {item_id: cantidad} al carrito; devuelve items cambiados, ids eliminados y totales"""
+    carrito = obtener_carrito(request)
+    cambiados, eliminados = carrito.actualizar(cantidades)
+    recordar_cantidad(request, carrito)
+    return cambiados, eliminados, _resumen(carrito)
+
+
+def fusionar_carrito_anonimo(request, usuario):
+    """Suma el carrito armado como visitante al del usuario que acaba de iniciar sesión"""
+    anonimo = _almacen_anonimo(request)
+    cantidades = anonimo.cantidades()
+    if not cantidades:
+        return
+
+    # Primero se liberan las reservas del carrito anónimo para que no cuenten como ajenas
+    anonimo.descartar()
+    carrito = CarritoBD(request, usuario)
+    carrito.sumar(cantidades)
+    request.session.pop(CLAVE_CANTIDAD_ANONIMA, None)
+    recordar_cantidad(request, carrito)
+
+
+acantidad_en_carrito = sync_to_async(cantidad_en_carrito)
+aagregar_libro = sync_to_async(agregar_libro)
+acambiar_cantidades = sync_to_async(cambiar_cantidades)
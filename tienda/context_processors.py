@@ -0,0 +1,24 @@
+from functools import partial
+
+from .cache_paginas import es_compartida
+from .carrito import cantidad_en_carrito
+from .fragmentos import version_categorias
+from .models import Categoria
+
+
+def carrito(request):
+    """Expone la cantidad del carrito a todos los templates"""
+    if es_compartida(request):
+        # La página se guarda para todos los anónimos; el navegador pide su cantidad
+        return {'cantidad_carrito': 0}
+    # Se pasa como callable para que solo se evalúe si el template la usa
+    return {'cantidad_carrito': partial(cantidad_en_carrito, request)}
+
+
+def categorias(request):
+    """Categorías del menú de base.html, que se guarda como fragmento en caché
+
+    El QuerySet solo se evalúa si el fragmento no está en caché y la versión se
+    pasa como callable, igual que la cantidad del carrito.
+    """
+    return {'categorias': Categoria.objects.all(), 'version_categorias': version_categorias}
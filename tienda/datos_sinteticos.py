@@ -0,0 +1,404 @@
+"""
+Datos sintéticos a escala para probar el rendimiento (``manage.py generar_datos``).
+
+Cada tabla se genera por bloques con claves primarias explícitas. El bloque
+``n`` de una tabla produce siempre las mismas filas para la misma semilla, lo
+genere el proceso que lo genere y en el orden que sea, así que la misma semilla
+sobre la misma base da el mismo conjunto de datos. Los items usan ranuras fijas
+por pedido o carrito (``MAXIMO_LINEAS_*``) y por eso sus ids tienen huecos.
+
+Distribuciones:
+
+- categorías de cola larga: la categoría ``k`` recibe libros con peso ~1/(k+1);
+- popularidad sesgada: el libro de cada línea sigue una ley de Zipf (s = 1)
+  sobre un orden de popularidad que no coincide con el id;
+- pedidos estacionales: más en noviembre y diciembre, los fines de semana y por
+  la tarde, y más pedidos cuanto más recientes; el estado depende de la edad;
+- clientes recurrentes: los pedidos con usuario también siguen una ley de Zipf.
+"""
+
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from math import gcd
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import IVA, Carrito, Categoria, ItemCarrito, ItemPedido, Libro, Pedido
+
+
+MAXIMO_LINEAS_PEDIDO = 5
+MAXIMO_LINEAS_CARRITO = 4
+
+GENEROS = [
+    'Ficción', 'No Ficción', 'Tecnología', 'Negocios', 'Autoayuda', 'Cocina',
+    'Arte y Diseño', 'Salud y Bienestar', 'Novela negra', 'Ciencia ficción',
+    'Fantasía', 'Romance', 'Historia', 'Biografías', 'Poesía', 'Teatro',
+    'Infantil', 'Juvenil', 'Cómic', 'Filosofía', 'Psicología', 'Economía',
+    'Política', 'Ciencia', 'Matemáticas', 'Medicina', 'Derecho', 'Educación',
+    'Viajes', 'Deportes', 'Música', 'Cine', 'Fotografía', 'Arquitectura',
+    'Religión', 'Idiomas', 'Jardinería', 'Manualidades', 'Mascotas', 'Humor',
+]
+PALABRAS = [
+    'amor', 'guerra', 'historia', 'ciudad', 'noche', 'mar', 'sombra', 'tiempo',
+    'jardín', 'río', 'memoria', 'camino', 'corazón', 'silencio', 'fuego',
+    'invierno', 'montaña', 'secreto', 'destino', 'luz', 'programación', 'cocina',
+    'economía', 'filosofía', 'ciencia', 'arte', 'música', 'viaje', 'sueño',
+    'verano', 'lluvia', 'casa', 'puerto', 'isla', 'desierto', 'bosque', 'reino',
+    'espejo', 'voz', 'puente', 'libro', 'mapa', 'viento', 'piedra', 'ceniza',
+]
+NOMBRES = [
+    'Gabriel', 'Isabel', 'Jorge', 'Laura', 'Miguel', 'Ana', 'Julio', 'Rosa',
+    'Carlos', 'María', 'Andrés', 'Lucía', 'Felipe', 'Camila', 'Santiago',
+    'Valentina', 'Diego', 'Paula', 'Javier', 'Sofía', 'Mateo', 'Daniela',
+]
+APELLIDOS = [
+    'García', 'Márquez', 'Allende', 'Borges', 'Cortázar', 'Neruda', 'Paz',
+    'Rodríguez', 'Gómez', 'López', 'Martínez', 'Pérez', 'Sánchez', 'Ramírez',
+    'Torres', 'Díaz', 'Vargas', 'Castro', 'Rojas', 'Moreno', 'Herrera',
+]
+# Ciudades con su peso relativo en los pedidos
+CIUDADES = {
+    'Bogotá': 35, 'Medellín': 18, 'Cali': 12, 'Barranquilla': 8, 'Cartagena': 5,
+    'Bucaramanga': 5, 'Pereira': 4, 'Manizales': 3, 'Santa Marta': 3,
+    'Ibagué': 2, 'Pasto': 2, 'Villavicencio': 2, 'Tunja': 1,
+}
+METODOS_PAGO = {'tarjeta': 55, 'pse': 35, 'efectivo': 10}
+
+# Peso de cada mes (enero primero), día de la semana (lunes primero) y hora local
+PESO_MES = [0.8, 0.7, 0.8, 0.9, 1.0, 0.9, 0.9, 0.9, 0.9, 1.0, 1.4, 2.0]
+PESO_DIA_SEMANA = [0.9, 0.9, 0.9, 1.0, 1.1, 1.3, 1.2]
+PESO_HORA = [
+    0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.4, 0.7, 1.0, 1.1, 1.2, 1.3,
+    1.4, 1.3, 1.2, 1.2, 1.3, 1.5, 1.8, 2.0, 2.0, 1.7, 1.1, 0.5,
+]
+PESO_LINEAS = [55, 25, 12, 5, 3]
+PESO_CANTIDAD = [80, 15, 5]
+
+FRACCION_PEDIDOS_CON_USUARIO = 0.65
+FRACCION_CARRITOS_CON_USUARIO = 0.3
+
+
+def _acumulados(pesos):
+    total, acumulados = 0, []
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+
+ACUMULADO_HORA = _acumulados(PESO_HORA)
+ACUMULADO_LINEAS = _acumulados(PESO_LINEAS)
+ACUMULADO_CANTIDAD = _acumulados(PESO_CANTIDAD)
+ACUMULADO_CIUDADES = _acumulados(CIUDADES.values())
+ACUMULADO_METODOS = _acumulados(METODOS_PAGO.values())
+PESO_FECHA_MAXIMO = max(PESO_MES) * max(PESO_DIA_SEMANA)
+
+
+@contextmanager
+def fechas_manuales(*campos):
+    """Desactiva auto_now/auto_now_add de los campos (modelo, nombre) para guardar fechas pasadas"""
+    originales = []
+    try:
+        for modelo, nombre in campos:
+            campo = modelo._meta.get_field(nombre)
+            originales.append((campo, campo.auto_now, campo.auto_now_add))
+            campo.auto_now = campo.auto_now_add = False
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _zipf(aleatorio, cantidad):
+    """Posición en [0, cantidad) con probabilidad ~1/(posición+1)"""
+    return min(int((cantidad + 1) ** aleatorio.random()) - 1, cantidad - 1)
+
+
+def _coprimo(cantidad):
+    """Multiplicador que permuta [0, cantidad) con (i * m) % cantidad"""
+    multiplicador = 2654435761
+    while gcd(multiplicador, cantidad) != 1:
+        multiplicador += 2
+    return multiplicador
+
+
+def _mezclar(numero, semilla):
+    """Entero pseudoaleatorio de 32 bits, estable para (numero, semilla)"""
+    x = (numero * 0x9E3779B1 + semilla * 0x85EBCA6B + 0x27D4EB2F) & 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x7FEB352D) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x846CA68B) & 0xFFFFFFFF
+    return x ^ (x >> 16)
+
+
+def precio_libro(indice, semilla):
+    """Precio del libro ``indice`` del plan; los pedidos lo calculan sin leer la base"""
+    return Decimal(10000 + (_mezclar(indice, semilla) % 221) * 500)
+
+
+class Plan:
+    """Tamaños, claves iniciales y parámetros compartidos por todos los bloques"""
+
+    def __init__(self, semilla, libros, usuarios, pedidos, carritos, categoria_ids, dias, lote, ahora, clave):
+        self.semilla = semilla
+        self.cantidades = {'usuarios': usuarios, 'libros': libros, 'pedidos': pedidos, 'carritos': carritos}
+        self.categoria_ids = categoria_ids
+        self.dias = dias
+        self.lote = lote
+        self.ahora = ahora
+        # Un solo hash con sal fija para todos: PBKDF2 por usuario tomaría horas
+        self.clave = make_password(clave, salt=f'sintetico{semilla}')
+        self.bases = {
+            'usuarios': _siguiente_id(User),
+            'libros': _siguiente_id(Libro),
+            'pedidos': _siguiente_id(Pedido),
+            'items_pedido': _siguiente_id(ItemPedido),
+            'carritos': _siguiente_id(Carrito),
+            'items_carrito': _siguiente_id(ItemCarrito),
+        }
+        self.popularidad = _coprimo(libros) if libros else 1
+        self.clientes = _coprimo(usuarios) if usuarios else 1
+
+    def bloques(self, tabla):
+        return range(-(-self.cantidades[tabla] // self.lote))
+
+    def aleatorio(self, tabla, bloque):
+        return random.Random(f'{self.semilla}:{tabla}:{bloque}')
+
+    def rango(self, tabla, bloque):
+        inicio = bloque * self.lote
+        return range(inicio, min(inicio + self.lote, self.cantidades[tabla]))
+
+    def libro_popular(self, aleatorio):
+        """Índice de libro sesgado hacia los más vendidos"""
+        return (_zipf(aleatorio, self.cantidades['libros']) * self.popularidad) % self.cantidades['libros']
+
+    def cliente_recurrente(self, aleatorio):
+        return (_zipf(aleatorio, self.cantidades['usuarios']) * self.clientes) % self.cantidades['usuarios']
+
+
+def _siguiente_id(modelo):
+    return (modelo.objects.aggregate(maximo=Max('pk'))['maximo'] or 0) + 1
+
+
+def _fecha_estacional(aleatorio, plan):
+    """Fecha de pedido con estacionalidad anual y semanal y tendencia creciente"""
+    hoy = timezone.localdate(plan.ahora)
+    while True:
+        # El plan termina a medianoche: el último día con pedidos es el anterior
+        dias_atras = 1 + int(aleatorio.random() * plan.dias)
+        dia = hoy - timedelta(days=dias_atras)
+        crecimiento = 1 - 0.5 * dias_atras / plan.dias
+        peso = PESO_MES[dia.month - 1] * PESO_DIA_SEMANA[dia.weekday()] * crecimiento
+        if aleatorio.random() * PESO_FECHA_MAXIMO < peso:
+            break
+    hora = aleatorio.choices(range(24), cum_weights=ACUMULADO_HORA)[0]
+    return timezone.make_aware(datetime.combine(dia, time(hora, aleatorio.randrange(60), aleatorio.randrange(60))))
+
+
+def _estado_por_edad(aleatorio, edad):
+    if edad < timedelta(days=1):
+        return aleatorio.choice(['pendiente', 'pendiente', 'procesando'])
+    if edad < timedelta(days=5):
+        return aleatorio.choice(['procesando', 'enviado', 'enviado', 'cancelado'])
+    return 'cancelado' if aleatorio.random() < 0.06 else 'entregado'
+
+
+def _nombre(aleatorio):
+    return aleatorio.choice(NOMBRES), aleatorio.choice(APELLIDOS)
+
+
+def _generar_usuarios(plan, aleatorio, indices):
+    usuarios = []
+    for indice in indices:
+        pk = plan.bases['usuarios'] + indice
+        nombre, apellido = _nombre(aleatorio)
+        usuarios.append(User(
+            pk=pk,
+            username=f'cliente{pk}',
+            email=f'cliente{pk}@ejemplo.com',
+            first_name=nombre,
+            last_name=apellido,
+            password=plan.clave,
+            date_joined=plan.ahora - timedelta(seconds=aleatorio.randrange(plan.dias * 86400)),
+        ))
+    User.objects.bulk_create(usuarios)
+    return len(usuarios)
+
+
+def _generar_libros(plan, aleatorio, indices):
+    categorias = plan.categoria_ids
+    hoy = timezone.localdate(plan.ahora)
+    libros = []
+    for indice in indices:
+        pk = plan.bases['libros'] + indice
+        nombre, apellido = _nombre(aleatorio)
+        creado = plan.ahora - timedelta(seconds=aleatorio.randrange(plan.dias * 86400))
+        agotado = aleatorio.random() < 0.08
+        libros.append(Libro(
+            pk=pk,
+            titulo=' '.join(aleatorio.sample(PALABRAS, aleatorio.randint(2, 5))).capitalize(),
+            autor=f'{nombre} {apellido}',
+            descripcion=' '.join(aleatorio.choices(PALABRAS, k=aleatorio.randint(15, 40))),
+            precio=precio_libro(indice, plan.semilla),
+            categoria_id=categorias[_zipf(aleatorio, len(categorias))],
+            stock=0 if agotado else min(int(aleatorio.expovariate(1 / 15)) + 1, 500),
+            fecha_publicacion=hoy - timedelta(days=int(aleatorio.expovariate(1 / 3000))),
+            isbn=f'979-{pk:010d}',
+            activo=aleatorio.random() < 0.97,
+            fecha_creacion=creado,
+            fecha_actualizacion=creado,
+        ))
+    with fechas_manuales((Libro, 'fecha_creacion'), (Libro, 'fecha_actualizacion')):
+        Libro.objects.bulk_create(libros)
+    return len(libros)
+
+
+def _lineas(plan, aleatorio, maximo):
+    """Pares (índice de libro, cantidad) sin libros repetidos, sesgados por popularidad"""
+    cantidad = min(aleatorio.choices(range(1, len(PESO_LINEAS) + 1), cum_weights=ACUMULADO_LINEAS)[0], maximo)
+    elegidos = {}
+    for _ in range(cantidad * 4):
+        if len(elegidos) == cantidad:
+            break
+        indice = plan.libro_popular(aleatorio)
+        if indice not in elegidos:
+            elegidos[indice] = aleatorio.choices((1, 2, 3), cum_weights=ACUMULADO_CANTIDAD)[0]
+    return elegidos.items()
+
+
+def _generar_pedidos(plan, aleatorio, indices):
+    pedidos, items = [], []
+    ciudades, metodos = list(CIUDADES), list(METODOS_PAGO)
+    for indice in indices:
+        pk = plan.bases['pedidos'] + indice
+        creado = _fecha_estacional(aleatorio, plan)
+        usuario_id = None
+        if plan.cantidades['usuarios'] and aleatorio.random() < FRACCION_PEDIDOS_CON_USUARIO:
+            usuario_id = plan.bases['usuarios'] + plan.cliente_recurrente(aleatorio)
+        nombre, apellido = _nombre(aleatorio)
+
+        subtotal = Decimal(0)
+        for ranura, (libro, cantidad) in enumerate(_lineas(plan, aleatorio, MAXIMO_LINEAS_PEDIDO)):
+            precio = precio_libro(libro, plan.semilla)
+            subtotal += precio * cantidad
+            items.append(ItemPedido(
+                pk=plan.bases['items_pedido'] + indice * MAXIMO_LINEAS_PEDIDO + ranura,
+                pedido_id=pk,
+                libro_id=plan.bases['libros'] + libro,
+                cantidad=cantidad,
+                precio_unitario=precio,
+            ))
+        impuestos = (subtotal * IVA).quantize(Decimal('0.01'))
+        pedidos.append(Pedido(
+            pk=pk,
+            usuario_id=usuario_id,
+            email=f'cliente{usuario_id}@ejemplo.com' if usuario_id else f'invitado{pk}@ejemplo.com',
+            nombre_completo=f'{nombre} {apellido}',
+            telefono=f'3{aleatorio.randrange(10 ** 9):09d}',
+            direccion=f'Calle {aleatorio.randint(1, 200)} # {aleatorio.randint(1, 99)}-{aleatorio.randint(1, 99)}',
+            ciudad=aleatorio.choices(ciudades, cum_weights=ACUMULADO_CIUDADES)[0],
+            metodo_pago=aleatorio.choices(metodos, cum_weights=ACUMULADO_METODOS)[0],
+            estado=_estado_por_edad(aleatorio, plan.ahora - creado),
+            subtotal=subtotal,
+            impuestos=impuestos,
+            total=subtotal + impuestos,
+            fecha_creacion=creado,
+            fecha_actualizacion=min(creado + timedelta(hours=aleatorio.randint(0, 72)), plan.ahora),
+        ))
+    with fechas_manuales((Pedido, 'fecha_creacion'), (Pedido, 'fecha_actualizacion')):
+        with transaction.atomic():
+            Pedido.objects.bulk_create(pedidos)
+            ItemPedido.objects.bulk_create(items)
+    return len(pedidos)
+
+
+def _generar_carritos(plan, aleatorio, indices):
+    """Carritos abandonados de los últimos 60 días; como máximo uno por usuario"""
+    carritos, items = [], []
+    con_usuario = int(min(plan.cantidades['usuarios'], plan.cantidades['carritos'] * FRACCION_CARRITOS_CON_USUARIO))
+    for indice in indices:
+        pk = plan.bases['carritos'] + indice
+        actualizado = plan.ahora - timedelta(seconds=int(aleatorio.expovariate(1 / (15 * 86400))) % (60 * 86400))
+        total, unidades = Decimal(0), 0
+        for ranura, (libro, cantidad) in enumerate(_lineas(plan, aleatorio, MAXIMO_LINEAS_CARRITO)):
+            total += precio_libro(libro, plan.semilla) * cantidad
+            unidades += cantidad
+            items.append(ItemCarrito(
+                pk=plan.bases['items_carrito'] + indice * MAXIMO_LINEAS_CARRITO + ranura,
+                carrito_id=pk,
+                libro_id=plan.bases['libros'] + libro,
+                cantidad=cantidad,
+                fecha_agregado=actualizado,
+            ))
+        carritos.append(Carrito(
+            pk=pk,
+            # Los primeros carritos son de usuarios distintos, en orden permutado
+            usuario_id=plan.bases['usuarios'] + (indice * plan.clientes) % plan.cantidades['usuarios']
+            if indice < con_usuario else None,
+            session_key=None if indice < con_usuario else f'{aleatorio.getrandbits(128):032x}',
+            total=total,
+            cantidad_total=unidades,
+            fecha_creacion=actualizado - timedelta(minutes=aleatorio.randint(0, 120)),
+            fecha_actualizacion=actualizado,
+        ))
+    with fechas_manuales(
+        (Carrito, 'fecha_creacion'), (Carrito, 'fecha_actualizacion'), (ItemCarrito, 'fecha_agregado')
+    ):
+        with transaction.atomic():
+            Carrito.objects.bulk_create(carritos)
+            ItemCarrito.objects.bulk_create(items)
+    return len(carritos)
+
+
+GENERADORES = {
+    'usuarios': _generar_usuarios,
+    'libros': _generar_libros,
+    'pedidos': _generar_pedidos,
+    'carritos': _generar_carritos,
+}
+
+# Los pedidos y carritos apuntan a libros y usuarios, que se insertan antes
+FASES = [('usuarios', 'libros'), ('pedidos', 'carritos')]
+
+
+def generar_bloque(plan, tabla, bloque):
+    """Genera e inserta un bloque de la tabla; devuelve (tabla, filas)"""
+    filas = GENERADORES[tabla](plan, plan.aleatorio(tabla, bloque), plan.rango(tabla, bloque))
+    return tabla, filas
+
+
+def crear_categorias(cantidad):
+    """Ids de ``cantidad`` categorías en orden de peso, creando las que falten"""
+    nombres = [
+        GENEROS[numero % len(GENEROS)] + (f' {numero // len(GENEROS) + 1}' if numero >= len(GENEROS) else '')
+        for numero in range(cantidad)
+    ]
+    Categoria.objects.bulk_create([Categoria(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+    ids = dict(Categoria.objects.filter(nombre__in=nombres).values_list('nombre', 'pk'))
+    return [ids[nombre] for nombre in nombres]
+
+
+def reiniciar_secuencias():
+    """Tras insertar con ids explícitos, las secuencias (PostgreSQL) siguen desde el máximo"""
+    sentencias = connection.ops.sequence_reset_sql(
+        no_style(), [User, Libro, Pedido, ItemPedido, Carrito, ItemCarrito]
+    )
+    if sentencias:
+        with connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+
+
+def fecha_referencia(dia):
+    """Medianoche local al empezar el día: el "ahora" del plan, fijo para que las corridas coincidan"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
@@ -0,0 +1,221 @@
+"""
+Exportación de pedidos y ventas en CSV y XLSX por streaming.
+
+Las filas se leen con ``.iterator(chunk_size=...)`` (cursor del lado del
+servidor en PostgreSQL) y se escriben a la respuesta a medida que llegan, así
+que la memoria no crece con el número de filas. El XLSX se arma con ``zipfile``
+sobre un búfer que se vacía tras cada bloque de filas; las celdas de texto van
+en línea (``inlineStr``) para no tener que acumular una tabla de cadenas.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import ItemPedido, Pedido
+from .reportes import como_datetime, serie_ventas
+
+
+FILAS_POR_BLOQUE = 2000
+
+# Con estos caracteres al inicio Excel toma la celda de un CSV como fórmula
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# Caracteres de control que XML no admite; uno solo deja el XLSX ilegible
+CONTROL_INVALIDO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class _Eco:
+    """Archivo falso que devuelve lo escrito, para csv.writer"""
+
+    def write(self, valor):
+        return valor
+
+
+class _BuferZip:
+    """Destino de zipfile que acumula los bytes escritos hasta que se vacían"""
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _como_texto(valor, zona):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(zona)
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _texto_csv(valor, zona):
+    """Texto de la celda; el que escribió un cliente no puede empezar una fórmula"""
+    texto = _como_texto(valor, zona)
+    if isinstance(valor, str) and texto.startswith(INICIO_FORMULA):
+        return "'" + texto
+    return texto
+
+
+def filas_csv(encabezados, filas):
+    """Genera las líneas CSV, con BOM para que Excel reconozca UTF-8"""
+    escritor = csv.writer(_Eco())
+    zona = timezone.get_current_timezone()
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow([_texto_csv(valor, zona) for valor in fila])
+
+
+def _celda(valor, zona):
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    texto = CONTROL_INVALIDO_XML.sub('', _como_texto(valor, zona))
+    return f'<c t="inlineStr"><is><t>{escape(texto)}</t></is></c>'
+
+
+def _fila_xml(valores, zona):
+    return '<row>' + ''.join(_celda(valor, zona) for valor in valores) + '</row>'
+
+
+ARCHIVOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def filas_xlsx(encabezados, filas, hoja='Datos'):
+    """Genera los bytes de un libro XLSX de una hoja, bloque por bloque"""
+    bufer = _BuferZip()
+    zona = timezone.get_current_timezone()
+    with zipfile.ZipFile(bufer, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in ARCHIVOS_XLSX.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(hoja)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield bufer.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            hoja_xml.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _fila_xml(encabezados, zona)
+            ).encode())
+            bloque = []
+            for fila in filas:
+                bloque.append(_fila_xml(fila, zona))
+                if len(bloque) >= FILAS_POR_BLOQUE:
+                    hoja_xml.write(''.join(bloque).encode())
+                    bloque = []
+                    yield bufer.vaciar()
+            hoja_xml.write((''.join(bloque) + '</sheetData></worksheet>').encode())
+    yield bufer.vaciar()
+
+
+def _filtrar_pedidos(pedidos, desde, hasta, estado, prefijo=''):
+    filtros = {
+        f'{prefijo}fecha_creacion__gte': como_datetime(desde),
+        f'{prefijo}fecha_creacion__lt': como_datetime(hasta),
+    }
+    if estado:
+        filtros[f'{prefijo}estado'] = estado
+    return pedidos.filter(**filtros)
+
+
+def datos_pedidos(desde, hasta, estado=None):
+    """Encabezados y filas de los pedidos del rango"""
+    campos = [
+        ('id', 'Pedido'), ('fecha_creacion', 'Fecha'), ('estado', 'Estado'),
+        ('nombre_completo', 'Cliente'), ('email', 'Email'), ('telefono', 'Teléfono'),
+        ('ciudad', 'Ciudad'), ('metodo_pago', 'Método de pago'),
+        ('subtotal', 'Subtotal'), ('impuestos', 'Impuestos'), ('total', 'Total'),
+    ]
+    filas = (
+        _filtrar_pedidos(Pedido.objects.all(), desde, hasta, estado)
+        .order_by('fecha_creacion', 'id')
+        .values_list(*[campo for campo, _ in campos])
+        .iterator(chunk_size=FILAS_POR_BLOQUE)
+    )
+    return [titulo for _, titulo in campos], filas
+
+
+def datos_items(desde, hasta, estado=None):
+    """Encabezados y filas de las líneas de los pedidos del rango"""
+    campos = [
+        ('pedido_id', 'Pedido'), ('pedido__fecha_creacion', 'Fecha'), ('pedido__estado', 'Estado'),
+        ('libro__isbn', 'ISBN'), ('libro__titulo', 'Libro'),
+        ('cantidad', 'Cantidad'), ('precio_unitario', 'Precio unitario'),
+    ]
+    filas = (
+        _filtrar_pedidos(ItemPedido.objects.all(), desde, hasta, estado, prefijo='pedido__')
+        .order_by('pedido_id', 'id')
+        .values_list(*[campo for campo, _ in campos])
+        .iterator(chunk_size=FILAS_POR_BLOQUE)
+    )
+    return [titulo for _, titulo in campos], filas
+
+
+def datos_ventas(desde, hasta, periodo='mes'):
+    """Encabezados y filas del reporte de ventas por periodo"""
+    filas = (
+        (fila['periodo'], fila['cantidad'], fila['total'], fila['promedio'])
+        for fila in serie_ventas(desde, hasta, periodo)
+    )
+    return ['Periodo', 'Pedidos', 'Total', 'Promedio'], filas
@@ -0,0 +1,111 @@
+"""
+Caché de fragmentos de plantilla con claves versionadas.
+
+Los fragmentos no se borran al cambiar los datos: la clave incluye la versión de
+lo que muestran (``fecha_actualizacion`` del libro, versión de las categorías),
+así que un cambio produce una clave nueva y la anterior caduca sola. La versión
+de las categorías es una marca de tiempo en el caché que las señales renuevan.
+
+Los aciertos y fallos de cada fragmento se acumulan en el proceso y se suman al
+caché cada ``LOTE_METRICAS`` lecturas, para estimar la tasa de aciertos sin una
+escritura extra por fragmento.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+FRAGMENTOS = ['tarjeta_libro', 'categorias', 'menu_categorias']
+
+CLAVE_VERSION_CATEGORIAS = 'tienda:version:categorias'
+
+LOTE_METRICAS = 50
+
+_pendientes = Counter()
+_bloqueo = threading.Lock()
+
+
+def segundos_cache():
+    return getattr(settings, 'TIENDA_FRAGMENTOS_CACHE_SEGUNDOS', 3600)
+
+
+def clave_fragmento(nombre, partes):
+    """Clave del fragmento para los valores que lo identifican"""
+    resumen = hashlib.md5(':'.join(str(parte) for parte in partes).encode()).hexdigest()
+    return f'tienda:fragmento:{nombre}:{resumen}'
+
+
+def version_categorias():
+    """Versión actual de las categorías; se crea si el caché la perdió"""
+    version = cache.get(CLAVE_VERSION_CATEGORIAS)
+    if version is None:
+        # Una marca de tiempo nueva nunca coincide con claves de versiones anteriores
+        cache.add(CLAVE_VERSION_CATEGORIAS, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION_CATEGORIAS)
+    return version
+
+
+def nueva_version_categorias():
+    """Invalida los fragmentos que muestran categorías"""
+    cache.set(CLAVE_VERSION_CATEGORIAS, time.time_ns(), None)
+
+
+def _clave_metrica(nombre, resultado):
+    return f'tienda:fragmentos:{resultado}:{nombre}'
+
+
+def _sumar(clave, cantidad):
+    cache.add(clave, 0, None)
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:
+        # La clave se desalojó entre add e incr
+        cache.set(clave, cantidad, None)
+
+
+def registrar_lectura(nombre, acierto):
+    """Cuenta un acierto o un fallo y publica los contadores cada LOTE_METRICAS lecturas"""
+    with _bloqueo:
+        _pendientes[_clave_metrica(nombre, 'aciertos' if acierto else 'fallos')] += 1
+        if sum(_pendientes.values()) < LOTE_METRICAS:
+            return
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+    for clave, cantidad in pendientes.items():
+        _sumar(clave, cantidad)
+
+
+def estadisticas_fragmentos():
+    """Aciertos, fallos y tasa de aciertos por fragmento desde el último reinicio"""
+    claves = [_clave_metrica(nombre, resultado) for nombre in FRAGMENTOS for resultado in ('aciertos', 'fallos')]
+    publicados = cache.get_many(claves)
+    with _bloqueo:
+        locales = dict(_pendientes)
+
+    estadisticas = []
+    for nombre in FRAGMENTOS:
+        aciertos, fallos = (
+            publicados.get(clave, 0) + locales.get(clave, 0)
+            for clave in (_clave_metrica(nombre, 'aciertos'), _clave_metrica(nombre, 'fallos'))
+        )
+        lecturas = aciertos + fallos
+        estadisticas.append({
+            'fragmento': nombre,
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa': aciertos / lecturas * 100 if lecturas else None,
+        })
+    return estadisticas
+
+
+def reiniciar_metricas():
+    with _bloqueo:
+        _pendientes.clear()
+    cache.delete_many([
+        _clave_metrica(nombre, resultado) for nombre in FRAGMENTOS for resultado in ('aciertos', 'fallos')
+    ])
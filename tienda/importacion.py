@@ -0,0 +1,270 @@
+"""
+Importación masiva del catálogo desde archivos de proveedores.
+
+Los lectores (CSV, JSONL y ONIX 3.0) recorren el archivo fila a fila sin
+cargarlo completo, e ``importar_libros`` inserta o actualiza por ISBN en lotes
+de ``bulk_create(update_conflicts=True)``. Las categorías se resuelven con un
+diccionario en memoria y las que no existen se crean una sola vez, así que cada
+lote cuesta un par de consultas sin importar cuántas filas tenga el archivo.
+
+Columnas de CSV y JSONL: isbn, titulo, autor, descripcion, precio, stock,
+categoria, fecha_publicacion (AAAA-MM-DD) y activo. Solo isbn, titulo y precio
+son obligatorias.
+"""
+
+import csv
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from xml.etree import ElementTree
+
+from django.db import reset_queries
+
+from .cache_paginas import purgar_catalogo
+from .models import Carrito, Categoria, ItemCarrito, Libro
+
+
+CAMPOS_ACTUALIZADOS = [
+    'titulo', 'autor', 'descripcion', 'precio', 'stock', 'categoria',
+    'fecha_publicacion', 'activo', 'fecha_actualizacion',
+]
+
+CATEGORIA_POR_DEFECTO = 'Sin categoría'
+
+# Tipos de identificador ONIX que corresponden a un ISBN (15 = ISBN-13, 02 = ISBN-10)
+TIPOS_ISBN_ONIX = ('15', '02')
+
+MAXIMO_ERRORES_GUARDADOS = 50
+
+
+class FilaInvalida(ValueError):
+    """La fila del archivo no tiene los datos mínimos para crear un libro"""
+
+
+def leer_csv(archivo):
+    """Recorre un CSV con encabezados, una fila por libro"""
+    yield from csv.DictReader(archivo)
+
+
+def leer_jsonl(archivo):
+    """Recorre un archivo con un objeto JSON por línea
+
+    Una línea que no es un objeto JSON se entrega como FilaInvalida en lugar de
+    cortar la lectura, para que ``importar_libros`` la rechace como a cualquier fila.
+    """
+    for numero, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = json.loads(linea)
+        except json.JSONDecodeError as error:
+            yield FilaInvalida(f'línea {numero}: JSON inválido ({error.msg})')
+            continue
+        if isinstance(fila, dict):
+            yield fila
+        else:
+            yield FilaInvalida(f'línea {numero}: se esperaba un objeto JSON')
+
+
+def _nombre_local(etiqueta):
+    return etiqueta.rsplit('}', 1)[-1]
+
+
+def _primer_texto(elemento, nombre):
+    for hijo in elemento.iter():
+        if _nombre_local(hijo.tag) == nombre and hijo.text and hijo.text.strip():
+            return hijo.text.strip()
+    return None
+
+
+def _isbn_onix(producto):
+    for identificador in producto.iter():
+        if _nombre_local(identificador.tag) != 'ProductIdentifier':
+            continue
+        if _primer_texto(identificador, 'ProductIDType') in TIPOS_ISBN_ONIX:
+            return _primer_texto(identificador, 'IDValue')
+    return None
+
+
+def _fecha_onix(producto):
+    fecha = _primer_texto(producto, 'Date') or _primer_texto(producto, 'PublicationDate')
+    if fecha and len(fecha) >= 8 and fecha[:8].isdigit():
+        return f'{fecha[:4]}-{fecha[4:6]}-{fecha[6:8]}'
+    return None
+
+
+def leer_onix(archivo):
+    """Recorre los <Product> de un archivo ONIX 3.0 con etiquetas de referencia
+
+    Cada producto se libera de memoria en cuanto se procesa, así que el consumo
+    no depende del tamaño del archivo.
+    """
+    raiz = None
+    for evento, elemento in ElementTree.iterparse(archivo, events=('start', 'end')):
+        if raiz is None:
+            raiz = elemento
+        if evento != 'end' or _nombre_local(elemento.tag) != 'Product':
+            continue
+        yield {
+            'isbn': _isbn_onix(elemento),
+            'titulo': _primer_texto(elemento, 'TitleText'),
+            'autor': _primer_texto(elemento, 'PersonName'),
+            'descripcion': _primer_texto(elemento, 'Text'),
+            'precio': _primer_texto(elemento, 'PriceAmount'),
+            'stock': _primer_texto(elemento, 'OnHand'),
+            'categoria': _primer_texto(elemento, 'SubjectHeadingText'),
+            'fecha_publicacion': _fecha_onix(elemento),
+        }
+        raiz.clear()
+
+
+LECTORES = {
+    'csv': leer_csv,
+    'jsonl': leer_jsonl,
+    'onix': leer_onix,
+}
+
+
+def formato_por_extension(ruta):
+    """Formato del archivo según su extensión, o None si no se reconoce"""
+    extension = ruta.lower().rsplit('.', 1)[-1]
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl', 'xml': 'onix', 'onix': 'onix'}.get(extension)
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+def _activo(valor):
+    if valor is None or valor == '':
+        return True
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() not in ('0', 'false', 'no', 'n', 'falso')
+
+
+def _precio(valor):
+    """Precio positivo con dos decimales que cabe en Libro.precio; lanza FilaInvalida si no"""
+    campo = Libro._meta.get_field('precio')
+    try:
+        precio = Decimal(str(valor if valor is not None else '').strip().replace(',', '.'))
+        if precio.is_finite():
+            precio = precio.quantize(Decimal(1).scaleb(-campo.decimal_places))
+    except InvalidOperation:
+        raise FilaInvalida(f'precio inválido: {valor!r}')
+    # NaN e Infinity se leen sin error; los que no caben en la columna fallarían en bulk_create
+    if not precio.is_finite() or precio <= 0 or len(precio.as_tuple().digits) > campo.max_digits:
+        raise FilaInvalida(f'precio inválido: {valor!r}')
+    return precio
+
+
+def construir_libro(fila, categorias):
+    """Libro sin guardar a partir de una fila; lanza FilaInvalida si faltan datos"""
+    if isinstance(fila, FilaInvalida):
+        # El lector ya la rechazó (ver leer_jsonl)
+        raise fila
+    isbn = _texto(fila, 'isbn').replace(' ', '')
+    titulo = _texto(fila, 'titulo')
+    if not isbn:
+        raise FilaInvalida('falta el ISBN')
+    if not titulo:
+        raise FilaInvalida('falta el título')
+    if len(isbn) > 20:
+        raise FilaInvalida(f'ISBN demasiado largo: {isbn}')
+    precio = _precio(fila.get('precio'))
+    try:
+        stock = int(_texto(fila, 'stock') or 0)
+        fecha = _texto(fila, 'fecha_publicacion')
+        fecha_publicacion = date.fromisoformat(fecha) if fecha else None
+    except ValueError as error:
+        raise FilaInvalida(str(error))
+
+    return Libro(
+        isbn=isbn,
+        titulo=titulo[:200],
+        autor=_texto(fila, 'autor')[:200],
+        descripcion=_texto(fila, 'descripcion'),
+        precio=precio,
+        stock=max(stock, 0),
+        categoria_id=categorias.resolver(_texto(fila, 'categoria') or CATEGORIA_POR_DEFECTO),
+        fecha_publicacion=fecha_publicacion,
+        activo=_activo(fila.get('activo')),
+    )
+
+
+class MapaCategorias:
+    """Nombres de categoría a id, cargados una vez y ampliados al encontrar nuevas"""
+
+    def __init__(self):
+        self.ids = {nombre.lower(): pk for pk, nombre in Categoria.objects.values_list('pk', 'nombre')}
+        self.creadas = 0
+
+    def resolver(self, nombre):
+        clave = nombre.lower()
+        if clave not in self.ids:
+            self.ids[clave] = Categoria.objects.create(nombre=nombre[:100]).pk
+            self.creadas += 1
+        return self.ids[clave]
+
+
+def _guardar_lote(lote):
+    """Inserta o actualiza por ISBN; el último libro de cada ISBN repetido gana"""
+    libros = list({libro.isbn: libro for libro in lote}.values())
+    Libro.objects.bulk_create(
+        libros,
+        update_conflicts=True,
+        unique_fields=['isbn'],
+        update_fields=CAMPOS_ACTUALIZADOS,
+    )
+    # bulk_create no dispara señales: los carritos con estos libros pueden tener otro precio
+    Carrito.objects.filter(
+        pk__in=ItemCarrito.objects.filter(libro__isbn__in=[libro.isbn for libro in libros]).values('carrito_id')
+    ).recalcular_totales()
+    return len(libros)
+
+
+def importar_libros(filas, tamano_lote=1000, al_progresar=None):
+    """Importa las filas por lotes y devuelve un resumen de la importación
+
+    ``al_progresar`` se llama tras cada lote con el resumen parcial.
+    """
+    categorias = MapaCategorias()
+    resumen = {'leidas': 0, 'guardadas': 0, 'rechazadas': 0, 'errores': [], 'segundos': 0.0}
+    inicio = time.monotonic()
+    lote = []
+
+    def vaciar():
+        resumen['guardadas'] += _guardar_lote(lote)
+        lote.clear()
+        # Con DEBUG=True Django guarda cada sentencia; se descartan para no crecer en memoria
+        reset_queries()
+        resumen['segundos'] = time.monotonic() - inicio
+        if al_progresar:
+            al_progresar(resumen)
+
+    try:
+        for numero, fila in enumerate(filas, start=1):
+            resumen['leidas'] += 1
+            try:
+                lote.append(construir_libro(fila, categorias))
+            except FilaInvalida as error:
+                resumen['rechazadas'] += 1
+                if len(resumen['errores']) < MAXIMO_ERRORES_GUARDADOS:
+                    resumen['errores'].append(f'fila {numero}: {error}')
+                continue
+            if len(lote) >= tamano_lote:
+                vaciar()
+        if lote:
+            vaciar()
+    finally:
+        # Una sola purga al terminar, también si la importación se interrumpe tras
+        # guardar algunos lotes: purgar en cada lote renderiza el catálogo otra vez por lote
+        if resumen['guardadas']:
+            purgar_catalogo()
+
+    resumen['categorias_creadas'] = categorias.creadas
+    resumen['segundos'] = time.monotonic() - inicio
+    return resumen
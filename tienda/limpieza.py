@@ -0,0 +1,182 @@
+"""
+Limpieza de carritos abandonados y sesiones vencidas.
+
+Los carritos que nadie modifica y las sesiones vencidas se acumulan en
+``tienda_carrito``, ``tienda_itemcarrito`` y ``django_session``. Estas funciones
+los eliminan por lotes: cada lote es una transacción corta con un DELETE por
+tabla, así nunca se bloquean las tablas durante toda la limpieza. El comando
+``limpiar_carritos`` las ejecuta y se programa junto a ``liberar_reservas``.
+
+La inactividad de un carrito se mide con ``fecha_actualizacion``, que cambia
+cada vez que se recalculan sus totales. Nunca se elimina un carrito que se
+modificó dentro de la vida de la sesión (``SESSION_COOKIE_AGE``): la sesión
+todavía podría guardar su id o el contador de items. Tampoco uno con reservas
+vigentes, que alguien está por comprar.
+"""
+
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as SessionStoreBD
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Carrito, Reserva
+from .reservas import olvidar_disponibles
+
+
+# Margen para los carritos sin sesión, que se crean un instante antes de guardarla
+MARGEN_HUERFANOS = timedelta(hours=1)
+
+
+class Resultado:
+    """Filas eliminadas por tabla, lotes y duración de una limpieza"""
+
+    def __init__(self):
+        self.filas = {}
+        self.lotes = 0
+        self.lote_mas_lento = 0.0
+        self.duracion = 0.0
+
+    def sumar(self, eliminadas, duracion):
+        for tabla, cantidad in eliminadas.items():
+            self.filas[tabla] = self.filas.get(tabla, 0) + cantidad
+        self.lotes += 1
+        self.lote_mas_lento = max(self.lote_mas_lento, duracion)
+
+    @property
+    def total(self):
+        return sum(self.filas.values())
+
+
+def dias_inactividad():
+    return getattr(settings, 'TIENDA_CARRITO_INACTIVO_DIAS', 30)
+
+
+def dias_inactividad_usuarios():
+    return getattr(settings, 'TIENDA_CARRITO_USUARIO_INACTIVO_DIAS', 180)
+
+
+def modelo_sesiones():
+    """Modelo de las sesiones guardadas en la base de datos, o None con otro SESSION_ENGINE"""
+    almacen = import_module(settings.SESSION_ENGINE).SessionStore
+    if issubclass(almacen, SessionStoreBD):
+        return almacen.get_model_class()
+    return None
+
+
+def _limite(dias, ahora):
+    """Fecha antes de la cual un carrito está abandonado, nunca dentro de la vida de la sesión"""
+    return ahora - max(timedelta(days=dias), timedelta(seconds=settings.SESSION_COOKIE_AGE))
+
+
+def carritos_abandonados(dias=None, dias_usuarios=None, ahora=None):
+    """Carritos inactivos: anónimos tras ``dias``, de usuarios tras ``dias_usuarios``
+
+    Los anónimos cuya sesión ya no existe en la base de datos se consideran
+    abandonados sin esperar. ``dias_usuarios=0`` conserva los carritos de usuarios.
+    Los carritos con reservas vigentes nunca están abandonados.
+    """
+    ahora = ahora or timezone.now()
+    dias = dias_inactividad() if dias is None else dias
+    dias_usuarios = dias_inactividad_usuarios() if dias_usuarios is None else dias_usuarios
+
+    condicion = Q(usuario__isnull=True, fecha_actualizacion__lt=_limite(dias, ahora))
+    if dias_usuarios:
+        condicion |= Q(usuario__isnull=False, fecha_actualizacion__lt=_limite(dias_usuarios, ahora))
+
+    sesiones = modelo_sesiones()
+    if sesiones is not None:
+        sin_sesion = Q(session_key__isnull=True) | ~Exists(
+            sesiones.objects.filter(session_key=OuterRef('session_key'))
+        )
+        condicion |= Q(usuario__isnull=True, fecha_actualizacion__lt=ahora - MARGEN_HUERFANOS) & sin_sesion
+    reservas_vigentes = Reserva.objects.filter(carrito=OuterRef('pk'), fecha_expiracion__gt=ahora)
+    return Carrito.objects.filter(condicion).exclude(Exists(reservas_vigentes))
+
+
+def sesiones_vencidas(ahora=None):
+    """Sesiones vencidas en la base de datos, o None si las sesiones no se guardan ahí"""
+    sesiones = modelo_sesiones()
+    if sesiones is None:
+        return None
+    return sesiones.objects.filter(expire_date__lt=ahora or timezone.now())
+
+
+def limpiar_carritos(dias=None, dias_usuarios=None, lote=1000, pausa=0, solo_contar=False):
+    """Elimina por lotes los carritos abandonados con sus items y reservas
+
+    Recorre los candidatos por id, de modo que cada lote continúa donde terminó
+    el anterior en vez de volver a revisar la tabla desde el principio.
+    ``pausa`` son segundos de espera entre lotes para dejar pasar otras escrituras.
+    """
+    resultado = Resultado()
+    inicio = time.monotonic()
+    ahora = timezone.now()
+    abandonados = carritos_abandonados(dias, dias_usuarios, ahora).order_by('pk')
+    ultimo = 0
+    while True:
+        ids = list(abandonados.filter(pk__gt=ultimo).values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        ultimo = ids[-1]
+        inicio_lote = time.monotonic()
+        if solo_contar:
+            eliminadas = {Carrito._meta.db_table: len(ids)}
+        else:
+            libros = set(Reserva.objects.filter(carrito_id__in=ids).values_list('libro_id', flat=True))
+            # Se vuelve a aplicar la condición por si alguno se modificó entretanto
+            _, por_modelo = carritos_abandonados(dias, dias_usuarios, ahora).filter(pk__in=ids).delete()
+            eliminadas = {_tabla(etiqueta): cantidad for etiqueta, cantidad in por_modelo.items()}
+            if libros:
+                olvidar_disponibles(libros)
+        resultado.sumar(eliminadas, time.monotonic() - inicio_lote)
+        if pausa:
+            time.sleep(pausa)
+    resultado.duracion = time.monotonic() - inicio
+    return resultado
+
+
+def limpiar_sesiones(lote=1000, pausa=0, solo_contar=False):
+    """Elimina por lotes las sesiones vencidas; None si las sesiones no están en la base de datos
+
+    ``clearsessions`` borra todas con un único DELETE, que con millones de filas
+    bloquea la tabla de sesiones y con ella cada petición.
+    """
+    ahora = timezone.now()
+    vencidas = sesiones_vencidas(ahora)
+    if vencidas is None:
+        # Los demás almacenes (archivos) limpian a su manera; caché y cookies vencen solos
+        if not solo_contar:
+            import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+        return None
+
+    resultado = Resultado()
+    inicio = time.monotonic()
+    tabla = vencidas.model._meta.db_table
+    ultima = ''
+    while True:
+        claves = list(
+            vencidas.filter(session_key__gt=ultima).order_by('session_key').values_list('session_key', flat=True)[:lote]
+        )
+        if not claves:
+            break
+        ultima = claves[-1]
+        inicio_lote = time.monotonic()
+        if solo_contar:
+            eliminadas = len(claves)
+        else:
+            eliminadas, _ = vencidas.filter(session_key__in=claves).delete()
+        resultado.sumar({tabla: eliminadas}, time.monotonic() - inicio_lote)
+        if pausa:
+            time.sleep(pausa)
+    resultado.duracion = time.monotonic() - inicio
+    return resultado
+
+
+def _tabla(etiqueta):
+    """Tabla del modelo 'app.Modelo' que devuelve QuerySet.delete()"""
+    return apps.get_model(etiqueta)._meta.db_table
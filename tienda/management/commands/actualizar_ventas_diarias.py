@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tienda.ventas_diarias import actualizar_pendientes, reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el resumen diario de ventas de los días con pedidos modificados '
+        '(programar cada pocos minutos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Reconstruye el resumen de todos los días en lugar de solo los pendientes',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options['completo']:
+            filas = reconstruir()
+            duracion = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'Resumen reconstruido: {filas} filas en {duracion:.2f} s'
+            ))
+            return
+
+        dias = actualizar_pendientes()
+        duracion = time.monotonic() - inicio
+        if options['verbosity'] >= 2:
+            for dia in dias:
+                self.stdout.write(f'  {dia}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Días recalculados: {len(dias)} en {duracion:.2f} s'
+        ))
@@ -0,0 +1,125 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from tienda.busqueda import reconstruir_indice
+from tienda.cache_paginas import purgar_catalogo
+from tienda.datos_sinteticos import (
+    FASES, Plan, crear_categorias, fecha_referencia, generar_bloque, reiniciar_secuencias,
+)
+from tienda.fragmentos import nueva_version_categorias
+from tienda.models import Carrito, ItemCarrito, ItemPedido, Libro, Pedido
+from tienda.paginacion import actualizar_estadisticas
+from tienda.panel import WIDGETS_LIBRO, WIDGETS_PEDIDO, WIDGETS_VENTAS, olvidar_widgets
+from tienda.procesos import preparar_proceso
+from tienda.ventas_diarias import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera libros, usuarios, pedidos y carritos sintéticos a escala, con distribuciones '
+        'realistas y reproducibles por semilla, insertándolos en bloques desde varios procesos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=10000, help='Libros a crear (por defecto 10000)')
+        parser.add_argument('--usuarios', type=int, default=1000, help='Usuarios a crear (por defecto 1000)')
+        parser.add_argument('--pedidos', type=int, default=20000, help='Pedidos a crear (por defecto 20000)')
+        parser.add_argument('--carritos', type=int, default=2000, help='Carritos abandonados (por defecto 2000)')
+        parser.add_argument(
+            '--categorias',
+            type=int,
+            default=40,
+            help='Categorías de la cola larga; se reutilizan las que ya existen (por defecto 40)',
+        )
+        parser.add_argument('--dias', type=int, default=730, help='Días de historial de pedidos (por defecto 730)')
+        parser.add_argument(
+            '--hasta',
+            type=date.fromisoformat,
+            help=(
+                'Día en que termina el historial, sin incluirlo (AAAA-MM-DD); por defecto hoy. '
+                'Fíjalo para repetir el mismo conjunto otro día'
+            ),
+        )
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla de los datos (por defecto 42)')
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos que generan e insertan bloques en paralelo (por defecto, uno por CPU)',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bloque (por defecto 5000)')
+        parser.add_argument(
+            '--clave',
+            default='clave-sintetica',
+            help='Contraseña de todos los usuarios creados (por defecto clave-sintetica)',
+        )
+
+    def handle(self, *args, **options):
+        if (options['pedidos'] or options['carritos']) and not options['libros']:
+            raise CommandError('Los pedidos y carritos se generan sobre los libros de la misma corrida: usa --libros')
+        if options['categorias'] < 1 or options['lote'] < 1:
+            raise CommandError('--categorias y --lote deben ser mayores que cero')
+
+        inicio = time.monotonic()
+        plan = Plan(
+            semilla=options['semilla'],
+            libros=options['libros'],
+            usuarios=options['usuarios'],
+            pedidos=options['pedidos'],
+            carritos=options['carritos'],
+            categoria_ids=crear_categorias(options['categorias']),
+            dias=options['dias'],
+            lote=options['lote'],
+            ahora=fecha_referencia(options['hasta'] or timezone.localdate()),
+            clave=options['clave'],
+        )
+
+        # Los procesos hijos no deben heredar la conexión abierta a la base de datos
+        connections.close_all()
+        filas = {tabla: 0 for tabla in plan.cantidades}
+        with ProcessPoolExecutor(
+            max_workers=max(options['procesos'], 1),
+            initializer=preparar_proceso,
+            initargs=(settings.SETTINGS_MODULE, connection.settings_dict['NAME']),
+        ) as pool:
+            for fase in FASES:
+                inicio_fase = time.monotonic()
+                futuros = [
+                    pool.submit(generar_bloque, plan, tabla, bloque)
+                    for tabla in fase for bloque in plan.bloques(tabla)
+                ]
+                for futuro in as_completed(futuros):
+                    tabla, creadas = futuro.result()
+                    filas[tabla] += creadas
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(f'  {tabla}: {filas[tabla]} de {plan.cantidades[tabla]}')
+                duracion = time.monotonic() - inicio_fase
+                creadas = sum(filas[tabla] for tabla in fase)
+                if creadas and options['verbosity'] >= 1:
+                    detalle = ', '.join(f'{filas[tabla]} {tabla}' for tabla in fase)
+                    self.stdout.write(f'  {detalle} en {duracion:.1f} s ({creadas / duracion:.0f} filas/s)')
+
+        reiniciar_secuencias()
+        # Estadísticas para el planificador y para el total estimado de los listados del admin
+        actualizar_estadisticas([User, Libro, Pedido, ItemPedido, Carrito, ItemCarrito])
+        if filas['libros']:
+            reconstruir_indice()
+        if filas['pedidos']:
+            reconstruir()
+        nueva_version_categorias()
+        purgar_catalogo()
+        olvidar_widgets(WIDGETS_LIBRO + WIDGETS_PEDIDO + WIDGETS_VENTAS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos generados con semilla {plan.semilla} hasta {plan.ahora.date()}: '
+            f'{filas["libros"]} libros, {filas["usuarios"]} usuarios, {filas["pedidos"]} pedidos, '
+            f'{filas["carritos"]} carritos en {time.monotonic() - inicio:.1f} s'
+        ))
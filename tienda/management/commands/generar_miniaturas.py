@@ -0,0 +1,113 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from tienda.cache_paginas import purgar_catalogo
+from tienda.miniaturas import CARPETA, generar_en_proceso, miniaturas_al_dia
+from tienda.models import Libro
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera las miniaturas de las portadas que aún no las tienen (o de todas con '
+        '--forzar) usando varios procesos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos que redimensionan imágenes en paralelo (por defecto, uno por CPU)',
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenera también las miniaturas que ya están al día',
+        )
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help=f'Borra de {CARPETA}/ los archivos que ya no usa ningún libro',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Libros actualizados por sentencia (por defecto 500)',
+        )
+
+    def _pendientes(self, forzar):
+        libros = (
+            Libro.objects.exclude(Q(imagen='') | Q(imagen__isnull=True))
+            .only('pk', 'imagen', 'miniaturas')
+            .order_by('pk')
+            .iterator(chunk_size=2000)
+        )
+        return [(libro.pk, libro.imagen.name) for libro in libros if forzar or not miniaturas_al_dia(libro)]
+
+    def _limpiar(self):
+        try:
+            archivos = default_storage.listdir(CARPETA)[1]
+        except FileNotFoundError:
+            return 0
+        en_uso = set()
+        for miniaturas in Libro.objects.exclude(miniaturas={}).values_list('miniaturas', flat=True).iterator():
+            for variantes in miniaturas.get('formatos', {}).values():
+                en_uso.update(nombre for _, nombre in variantes)
+        borrados = 0
+        for archivo in archivos:
+            nombre = f'{CARPETA}/{archivo}'
+            if nombre not in en_uso:
+                default_storage.delete(nombre)
+                borrados += 1
+        return borrados
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        sin_imagen = Libro.objects.filter(Q(imagen='') | Q(imagen__isnull=True)).exclude(miniaturas={}).update(
+            miniaturas={}, fecha_actualizacion=timezone.now()
+        )
+        pendientes = self._pendientes(options['forzar'])
+        self.stdout.write(f'Libros por procesar: {len(pendientes)}')
+
+        # Los procesos hijos no deben heredar la conexión abierta a la base de datos
+        connections.close_all()
+        generados = errores = 0
+        lote = []
+        with ProcessPoolExecutor(max_workers=max(options['procesos'], 1)) as pool:
+            resultados = pool.map(
+                generar_en_proceso,
+                [pk for pk, _ in pendientes],
+                [nombre for _, nombre in pendientes],
+                chunksize=8,
+            )
+            for pk, miniaturas, error in resultados:
+                if error:
+                    errores += 1
+                    self.stderr.write(f'  libro {pk}: {error}')
+                    continue
+                lote.append(Libro(pk=pk, miniaturas=miniaturas, fecha_actualizacion=timezone.now()))
+                generados += 1
+                if len(lote) >= options['lote']:
+                    Libro.objects.bulk_update(lote, ['miniaturas', 'fecha_actualizacion'])
+                    lote = []
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(f'  {generados} de {len(pendientes)}')
+        if lote:
+            Libro.objects.bulk_update(lote, ['miniaturas', 'fecha_actualizacion'])
+
+        purgar_catalogo()
+        borrados = self._limpiar() if options['limpiar'] else 0
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Miniaturas generadas para {generados} libros, {errores} con errores, '
+            f'{sin_imagen} sin imagen limpiados, {borrados} archivos huérfanos borrados, '
+            f'en {duracion:.1f} s'
+        ))
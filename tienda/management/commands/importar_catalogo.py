@@ -0,0 +1,85 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.busqueda import reconstruir_indice
+from tienda.importacion import LECTORES, formato_por_extension, importar_libros
+from tienda.panel import WIDGETS_LIBRO, olvidar_widgets
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa o actualiza libros por ISBN desde un archivo CSV, JSONL u ONIX 3.0 '
+        '(también comprimido con gzip), leyéndolo por partes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument(
+            '--formato',
+            choices=sorted(LECTORES),
+            help='Formato del archivo; por defecto se deduce de la extensión',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Libros por sentencia INSERT ... ON CONFLICT (por defecto 1000)',
+        )
+        parser.add_argument(
+            '--sin-indice',
+            action='store_true',
+            help='No reconstruye el índice de búsqueda al terminar',
+        )
+
+    def _abrir(self, ruta, formato):
+        abrir = gzip.open if ruta.endswith('.gz') else open
+        if formato == 'onix':
+            return abrir(ruta, 'rb')
+        return abrir(ruta, 'rt', encoding='utf-8-sig', newline='')
+
+    def _informar_progreso(self, resumen):
+        # Con verbosidad 1 se informa cada 10 lotes; con 2 o más, cada lote
+        self._lotes += 1
+        if self._verbosidad < 2 and self._lotes % 10:
+            return
+        velocidad = resumen['leidas'] / resumen['segundos'] if resumen['segundos'] else 0
+        self.stdout.write(
+            f'  {resumen["leidas"]} filas leídas, {resumen["guardadas"]} guardadas, '
+            f'{resumen["rechazadas"]} rechazadas ({velocidad:.0f} filas/s)'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or formato_por_extension(ruta.removesuffix('.gz'))
+        if formato is None:
+            raise CommandError('No se reconoce el formato del archivo; indícalo con --formato')
+
+        try:
+            archivo = self._abrir(ruta, formato)
+        except OSError as error:
+            raise CommandError(f'No se pudo abrir {ruta}: {error}')
+
+        self._lotes = 0
+        self._verbosidad = options['verbosity']
+        with archivo:
+            resumen = importar_libros(
+                LECTORES[formato](archivo),
+                tamano_lote=options['lote'],
+                al_progresar=self._informar_progreso if options['verbosity'] >= 1 else None,
+            )
+
+        for error in resumen['errores']:
+            self.stderr.write(f'  {error}')
+
+        if not options['sin_indice']:
+            reconstruir_indice()
+        olvidar_widgets(WIDGETS_LIBRO)
+
+        velocidad = resumen['leidas'] / resumen['segundos'] if resumen['segundos'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Importación terminada: {resumen["guardadas"]} libros guardados, '
+            f'{resumen["rechazadas"]} filas rechazadas, '
+            f'{resumen["categorias_creadas"]} categorías nuevas, '
+            f'en {resumen["segundos"]:.1f} s ({velocidad:.0f} filas/s)'
+        ))
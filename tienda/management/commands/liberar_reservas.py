@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tienda.reservas import liberar_expiradas
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes las reservas de stock vencidas (programar cada pocos minutos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de reservas eliminadas por sentencia DELETE (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        liberadas = liberar_expiradas(lote=options['lote'])
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Reservas liberadas: {liberadas} en {duracion:.2f} s'
+        ))
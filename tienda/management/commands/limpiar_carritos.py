@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.limpieza import dias_inactividad, dias_inactividad_usuarios, limpiar_carritos, limpiar_sesiones
+from tienda.models import Carrito, ItemCarrito, Reserva
+from tienda.paginacion import actualizar_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina por lotes las sesiones vencidas y los carritos abandonados con sus items '
+        'y reservas (programar a diario, fuera de las horas de más tráfico)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=dias_inactividad(),
+            help='Días sin cambios tras los que se elimina un carrito anónimo (TIENDA_CARRITO_INACTIVO_DIAS)',
+        )
+        parser.add_argument(
+            '--dias-usuarios',
+            type=int,
+            default=dias_inactividad_usuarios(),
+            help=(
+                'Días sin cambios tras los que se elimina el carrito de un usuario registrado; '
+                '0 los conserva (TIENDA_CARRITO_USUARIO_INACTIVO_DIAS)'
+            ),
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Filas eliminadas por transacción (por defecto 1000)',
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0,
+            help='Segundos de espera entre lotes, para ceder la base de datos a las peticiones',
+        )
+        parser.add_argument(
+            '--solo-contar',
+            action='store_true',
+            help='Solo informa cuántas sesiones y carritos se eliminarían, sin eliminarlos',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['dias'] < 0 or options['dias_usuarios'] < 0:
+            raise CommandError('--lote debe ser mayor que cero y los días no pueden ser negativos')
+
+        lotes = {'lote': options['lote'], 'pausa': options['pausa'], 'solo_contar': options['solo_contar']}
+        verbo = 'por eliminar' if options['solo_contar'] else 'eliminadas'
+
+        # Primero las sesiones: los carritos anónimos de las sesiones eliminadas quedan huérfanos
+        sesiones = limpiar_sesiones(**lotes)
+        if sesiones is None:
+            self.stdout.write('Sesiones: no se guardan en la base de datos (SESSION_ENGINE)')
+        else:
+            self._informar('Sesiones', sesiones, verbo)
+
+        carritos = limpiar_carritos(options['dias'], options['dias_usuarios'], **lotes)
+        self._informar('Carritos', carritos, verbo)
+
+        if carritos.total and not options['solo_contar']:
+            # El total estimado de los listados del admin sale de estas estadísticas
+            actualizar_estadisticas([Carrito, ItemCarrito, Reserva])
+
+    def _informar(self, nombre, resultado, verbo):
+        filas = ', '.join(f'{tabla} {cantidad}' for tabla, cantidad in resultado.filas.items()) or 'ninguna'
+        self.stdout.write(self.style.SUCCESS(
+            f'{nombre}: filas {verbo}: {filas} en {resultado.duracion:.2f} s '
+            f'({resultado.lotes} lotes, el más lento {resultado.lote_mas_lento * 1000:.0f} ms)'
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from tienda.models import Carrito
+
+
+class Command(BaseCommand):
+    help = 'Verifica los totales guardados de los carritos y repara los que estén desfasados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar',
+            action='store_true',
+            help='Solo informa los carritos desfasados, sin repararlos',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de carritos reparados por sentencia UPDATE (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        desfasados = list(Carrito.objects.con_desfase().values_list('pk', flat=True))
+
+        if not desfasados:
+            self.stdout.write(self.style.SUCCESS('Todos los carritos están consistentes'))
+            return
+
+        self.stdout.write(f'Carritos desfasados: {len(desfasados)}')
+        if options['verbosity'] > 1:
+            for carrito in Carrito.objects.con_totales_reales().filter(pk__in=desfasados[:50]):
+                self.stdout.write(
+                    f'  #{carrito.pk}: total {carrito.total} -> {carrito.total_real}, '
+                    f'cantidad {carrito.cantidad_total} -> {carrito.cantidad_real}'
+                )
+
+        if options['solo_verificar']:
+            return
+
+        lote = options['lote']
+        reparados = 0
+        for inicio in range(0, len(desfasados), lote):
+            reparados += Carrito.objects.filter(
+                pk__in=desfasados[inicio:inicio + lote]
+            ).recalcular_totales()
+
+        self.stdout.write(self.style.SUCCESS(f'Carritos reparados: {reparados}'))
@@ -0,0 +1,184 @@
+"""
+Medición por petición: consultas SQL, render de plantillas y tiempo total.
+
+Con ``TIENDA_MEDICION = True``, ``MedicionMiddleware`` cuenta las consultas y
+su duración con un ``execute_wrapper`` en cada conexión y mide el render de las
+plantillas. El resultado sale en la cabecera ``Server-Timing`` (pestaña de red
+del navegador) y en una línea JSON del logger ``tienda.medicion``. Las vistas
+que pasan su presupuesto de consultas (``TIENDA_MEDICION_PRESUPUESTOS`` por
+nombre de URL, o ``TIENDA_MEDICION_PRESUPUESTO_CONSULTAS``) se registran como
+advertencia y llevan la cabecera ``X-Presupuesto-Consultas``.
+
+El render se mide con el motor ``PlantillasMedidas`` de ``TEMPLATES``, cuyas
+plantillas suman su tiempo a la medición de la petición en curso; fuera de una
+petición medida no hacen nada más que renderizar. No se parchea ninguna clase
+de Django.
+
+La medición vive en una variable de contexto, que asgiref copia a los hilos de
+``sync_to_async``: las vistas asíncronas cuentan también las consultas que
+hacen en esos hilos.
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+
+logger = logging.getLogger('tienda.medicion')
+
+_medicion = ContextVar('tienda_medicion', default=None)
+
+
+class Medicion:
+    """Acumulado de una petición; los tiempos están en segundos"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.render = 0.0
+        self.en_render = False
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.sql += time.perf_counter() - inicio
+
+
+def _instalar_en_conexion(connection):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+def _conexion_creada(sender, connection, **kwargs):
+    _instalar_en_conexion(connection)
+
+
+class PlantillaMedida(Template):
+    """Plantilla que suma su render a la medición de la petición, si la hay"""
+
+    def render(self, context=None, request=None):
+        medicion = _medicion.get()
+        # Las plantillas que se renderizan dentro de otra (crispy, render_to_string) ya se cuentan
+        if medicion is None or medicion.en_render:
+            return super().render(context, request)
+        medicion.en_render = True
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.render += time.perf_counter() - inicio
+            medicion.en_render = False
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """Motor de plantillas de Django que devuelve plantillas medidas"""
+
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name).template, self)
+
+
+def _instalar():
+    """Engancha la medición a las conexiones; idempotente"""
+    connection_created.connect(_conexion_creada, dispatch_uid='tienda.medicion')
+    for connection in connections.all(initialized_only=True):
+        _instalar_en_conexion(connection)
+
+
+def presupuesto_consultas(vista):
+    presupuestos = getattr(settings, 'TIENDA_MEDICION_PRESUPUESTOS', {})
+    return presupuestos.get(vista, getattr(settings, 'TIENDA_MEDICION_PRESUPUESTO_CONSULTAS', 20))
+
+
+def server_timing(medicion, total):
+    """Valor de la cabecera Server-Timing con duraciones en milisegundos"""
+    return ', '.join([
+        f'sql;dur={medicion.sql * 1000:.1f};desc="consultas={medicion.consultas}"',
+        f'render;dur={medicion.render * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+class MedicionMiddleware:
+    """Server-Timing y log de consultas, render y tiempo total de cada vista"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TIENDA_MEDICION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _instalar()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._informar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._informar(request, response, medicion)
+
+    def _informar(self, request, response, medicion):
+        total = medicion.total
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else None
+        presupuesto = presupuesto_consultas(vista)
+        excedido = medicion.consultas > presupuesto
+
+        anterior = response.get('Server-Timing')
+        valor = server_timing(medicion, total)
+        response['Server-Timing'] = f'{anterior}, {valor}' if anterior else valor
+        if excedido:
+            response['X-Presupuesto-Consultas'] = f'{medicion.consultas}/{presupuesto}'
+
+        linea = json.dumps({
+            'vista': vista,
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'consultas': medicion.consultas,
+            'sql_ms': round(medicion.sql * 1000, 2),
+            'render_ms': round(medicion.render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'presupuesto': presupuesto,
+            'excedido': excedido,
+        })
+        logger.log(logging.WARNING if excedido else logging.INFO, linea)
+        return response
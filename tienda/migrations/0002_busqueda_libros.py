@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS tienda_libro_fts USING fts5("
+            "titulo, autor, descripcion, isbn, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO tienda_libro_fts (rowid, titulo, autor, descripcion, isbn) "
+            "SELECT id, titulo, autor, descripcion, isbn FROM tienda_libro"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        schema_editor.execute(
+            "CREATE TEXT SEARCH CONFIGURATION tienda_es (COPY = spanish)"
+        )
+        schema_editor.execute(
+            "ALTER TEXT SEARCH CONFIGURATION tienda_es "
+            "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem"
+        )
+        schema_editor.execute(
+            "ALTER TABLE tienda_libro ADD COLUMN busqueda tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('tienda_es'::regconfig, coalesce(titulo, '')), 'A') || "
+            "setweight(to_tsvector('tienda_es'::regconfig, coalesce(autor, '')), 'B') || "
+            "setweight(to_tsvector('tienda_es'::regconfig, coalesce(isbn, '')), 'B') || "
+            "setweight(to_tsvector('tienda_es'::regconfig, coalesce(descripcion, '')), 'C')"
+            ") STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX tienda_libro_busqueda_idx ON tienda_libro USING GIN (busqueda)"
+        )
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS tienda_libro_fts")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE tienda_libro DROP COLUMN IF EXISTS busqueda")
+        schema_editor.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS tienda_es")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:37
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    Carrito = apps.get_model('tienda', 'Carrito')
+    ItemCarrito = apps.get_model('tienda', 'ItemCarrito')
+    items = ItemCarrito.objects.filter(carrito=OuterRef('pk')).order_by().values('carrito')
+    Carrito.objects.update(
+        total=Coalesce(
+            Subquery(items.annotate(suma=Sum(F('cantidad') * F('libro__precio'))).values('suma')),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        cantidad_total=Coalesce(
+            Subquery(items.annotate(suma=Sum('cantidad')).values('suma')),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0002_busqueda_libros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='cantidad_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='carrito',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
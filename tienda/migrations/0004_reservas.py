@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0003_totales_carrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('fecha_expiracion', models.DateTimeField(db_index=True)),
+                ('carrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.carrito')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='tienda.libro')),
+            ],
+            options={
+                'verbose_name': 'Reserva',
+                'verbose_name_plural': 'Reservas',
+                'unique_together': {('carrito', 'libro')},
+            },
+        ),
+    ]
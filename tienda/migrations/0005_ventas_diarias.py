@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:47
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def marcar_dias_con_pedidos(apps, schema_editor):
+    # El resumen se llena con actualizar_ventas_diarias; aquí solo se marcan los días
+    Pedido = apps.get_model('tienda', 'Pedido')
+    VentaDiariaPendiente = apps.get_model('tienda', 'VentaDiariaPendiente')
+    dias = (
+        Pedido.objects.annotate(dia=TruncDate('fecha_creacion'))
+        .values_list('dia', flat=True)
+        .order_by()
+        .distinct()
+    )
+    VentaDiariaPendiente.objects.bulk_create(
+        [VentaDiariaPendiente(fecha=dia) for dia in dias], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0004_reservas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Día pendiente de resumen',
+                'verbose_name_plural': 'Días pendientes de resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tienda.categoria')),
+                ('libro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tienda.libro')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['categoria', 'fecha'], name='tienda_vent_categor_c64a07_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(fields=('fecha', 'libro'), name='venta_diaria_unica_por_libro'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(condition=models.Q(('libro__isnull', True)), fields=('fecha',), name='venta_diaria_unica_por_dia'),
+        ),
+        migrations.RunPython(marcar_dias_con_pedidos, migrations.RunPython.noop),
+    ]
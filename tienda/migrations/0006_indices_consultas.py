@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0005_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(condition=models.Q(('session_key__isnull', False)), fields=['session_key'], name='carrito_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__gt', 0)), fields=['-fecha_creacion', '-id'], name='libro_catalogo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__gt', 0)), fields=['categoria', '-fecha_creacion', '-id'], name='libro_catalogo_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='libro_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['activo', 'stock'], name='libro_activo_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', '-fecha_creacion'], name='pedido_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='pedido_fecha_idx'),
+        ),
+    ]
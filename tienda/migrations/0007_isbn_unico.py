@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def vaciar_isbn_en_blanco(apps, schema_editor):
+    # Los ISBN vacíos pasan a NULL para no chocar con la restricción única
+    Libro = apps.get_model('tienda', 'Libro')
+    Libro.objects.filter(isbn='').update(isbn=None)
+    repetidos = list(
+        Libro.objects.exclude(isbn=None)
+        .values('isbn')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('isbn', flat=True)[:20]
+    )
+    if repetidos:
+        raise RuntimeError(
+            'Hay libros con el mismo ISBN; corrígelos antes de migrar: ' + ', '.join(repetidos)
+        )
+
+
+def restaurar_isbn_en_blanco(apps, schema_editor):
+    Libro = apps.get_model('tienda', 'Libro')
+    Libro.objects.filter(isbn=None).update(isbn='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0006_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='libro',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(vaciar_isbn_en_blanco, restaurar_isbn_en_blanco),
+        migrations.AlterField(
+            model_name='libro',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+    ]
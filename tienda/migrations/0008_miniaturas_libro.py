@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0007_isbn_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='miniaturas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
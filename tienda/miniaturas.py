@@ -0,0 +1,186 @@
+"""
+Miniaturas de las portadas de los libros.
+
+Cada portada se reduce a los anchos de ``TIENDA_MINIATURAS_ANCHOS`` en JPEG y,
+si Pillow los soporta, también en WebP y AVIF. Los archivos llevan en el nombre
+un hash de su contenido, así que nunca cambian y se pueden servir con caché
+permanente. Los nombres generados se guardan en ``Libro.miniaturas`` para que
+las plantillas armen el ``srcset`` sin consultar el disco.
+
+Al guardar un libro con una portada nueva, ``encolar_miniaturas`` las genera en
+un pool de ``TIENDA_MINIATURAS_PROCESOS`` procesos, fuera de la petición que
+subió la imagen; el comando ``generar_miniaturas`` completa las que falten.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache_paginas import purgar_catalogo
+
+
+CARPETA = 'libros/miniaturas'
+
+logger = logging.getLogger('tienda.miniaturas')
+
+_pool = None
+_bloqueo_pool = threading.Lock()
+
+ANCHOS_POR_DEFECTO = [80, 160, 320, 640]
+
+# Formato: (tipo MIME, extensión, opciones de Pillow), del más liviano al de respaldo
+FORMATOS = {
+    'avif': ('image/avif', 'avif', {'quality': 60}),
+    'webp': ('image/webp', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+def anchos():
+    return sorted(set(getattr(settings, 'TIENDA_MINIATURAS_ANCHOS', ANCHOS_POR_DEFECTO)))
+
+
+def formatos_disponibles():
+    """Formatos que Pillow puede escribir en esta instalación; JPEG siempre está"""
+    Image.init()
+    return [formato for formato in FORMATOS if formato.upper() in Image.SAVE]
+
+
+def _como_rgb(imagen):
+    if imagen.mode == 'RGB':
+        return imagen
+    if imagen.mode in ('RGBA', 'LA') or 'transparency' in imagen.info:
+        # Las transparencias quedan sobre fondo blanco, como se ven en la tienda
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def _guardar(contenido, base, ancho, extension, almacenamiento):
+    resumen = hashlib.sha256(contenido).hexdigest()[:12]
+    nombre = f'{CARPETA}/{base}-{ancho}w.{resumen}.{extension}'
+    if almacenamiento.exists(nombre):
+        return nombre
+    return almacenamiento.save(nombre, ContentFile(contenido))
+
+
+def generar_miniaturas(nombre, almacenamiento=None):
+    """Genera las miniaturas de una imagen guardada y devuelve su descripción
+
+    No usa la base de datos, así que puede ejecutarse en otro proceso.
+    """
+    almacenamiento = almacenamiento or default_storage
+    with almacenamiento.open(nombre, 'rb') as archivo:
+        with Image.open(archivo) as original:
+            # Con JPEG, draft() decodifica directamente a una escala reducida
+            original.draft('RGB', (max(anchos()), max(anchos())))
+            imagen = _como_rgb(ImageOps.exif_transpose(original))
+
+    ancho, alto = imagen.size
+    base = PurePosixPath(nombre).stem
+    formatos = {formato: [] for formato in formatos_disponibles()}
+    for ancho_destino in sorted({min(valor, ancho) for valor in anchos()}):
+        if ancho_destino == ancho:
+            reducida = imagen
+        else:
+            alto_destino = max(1, round(alto * ancho_destino / ancho))
+            reducida = imagen.resize((ancho_destino, alto_destino), Image.LANCZOS, reducing_gap=3.0)
+        for formato, variantes in formatos.items():
+            _, extension, opciones = FORMATOS[formato]
+            contenido = io.BytesIO()
+            reducida.save(contenido, format=formato.upper(), **opciones)
+            variantes.append([
+                ancho_destino,
+                _guardar(contenido.getvalue(), base, ancho_destino, extension, almacenamiento),
+            ])
+
+    return {'origen': nombre, 'ancho': ancho, 'alto': alto, 'formatos': formatos}
+
+
+def generar_en_proceso(pk, nombre):
+    """Versión de generar_miniaturas para un pool de procesos: devuelve (pk, miniaturas, error)"""
+    try:
+        return pk, generar_miniaturas(nombre), None
+    except Exception as error:
+        # Una imagen dañada no debe detener el resto del lote
+        return pk, None, f'{type(error).__name__}: {error}'
+
+
+def miniaturas_al_dia(libro):
+    """Indica si las miniaturas guardadas corresponden a la imagen actual del libro"""
+    return libro.miniaturas.get('origen', '') == (libro.imagen.name or '')
+
+
+def actualizar_miniaturas(libro, forzar=False):
+    """Genera las miniaturas del libro si su imagen cambió; devuelve si hubo cambios"""
+    if miniaturas_al_dia(libro) and not forzar:
+        return False
+    # Importado aquí para que los procesos de generar_en_proceso no carguen los modelos
+    from .models import Libro
+
+    miniaturas = generar_miniaturas(libro.imagen.name) if libro.imagen else {}
+    # update() no dispara post_save; fecha_actualizacion cambia para renovar las tarjetas en caché
+    Libro.objects.filter(pk=libro.pk).update(miniaturas=miniaturas, fecha_actualizacion=timezone.now())
+    libro.miniaturas = miniaturas
+    purgar_catalogo()
+    return True
+
+
+def _obtener_pool():
+    """Pool de procesos compartido por las peticiones, creado con el primer uso"""
+    global _pool
+    with _bloqueo_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(getattr(settings, 'TIENDA_MINIATURAS_PROCESOS', 1), 1))
+        return _pool
+
+
+def _guardar_resultado(futuro):
+    """Guarda las miniaturas que devolvió el pool, si la portada no cambió entretanto"""
+    from django.db import connection
+    from .models import Libro
+
+    try:
+        pk, miniaturas, error = futuro.result()
+        if error:
+            # Imagen ilegible o demasiado grande: se muestra la original
+            logger.warning('miniaturas del libro %s: %s', pk, error)
+            return
+        actualizados = Libro.objects.filter(pk=pk, imagen=miniaturas['origen']).update(
+            miniaturas=miniaturas, fecha_actualizacion=timezone.now()
+        )
+        if actualizados:
+            purgar_catalogo()
+    except Exception:
+        logger.exception('no se pudieron guardar las miniaturas')
+    finally:
+        # El callback corre en un hilo del pool, con su propia conexión
+        connection.close()
+
+
+def encolar_miniaturas(libro):
+    """Genera en segundo plano las miniaturas de la imagen actual del libro"""
+    global _pool
+    try:
+        futuro = _obtener_pool().submit(generar_en_proceso, libro.pk, libro.imagen.name)
+    except BrokenProcessPool:
+        # Un proceso murió; el próximo guardado crea otro pool y generar_miniaturas
+        # completa las que falten
+        with _bloqueo_pool:
+            _pool = None
+        logger.warning('pool de miniaturas caído; el libro %s queda pendiente', libro.pk)
+        return None
+    futuro.add_done_callback(_guardar_resultado)
+    return futuro
@@ -1,9 +1,15 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 
+IVA = Decimal('0.19')
+
+
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True)
@@ -28,10 +34,12 @@ class Libro(models.Model):
         validators=[MinValueValidator(Decimal('0.01'))]
     )
     imagen = models.ImageField(upload_to='libros/', blank=True, null=True)
+    # Nombres de las miniaturas de la imagen por formato y ancho (ver tienda/miniaturas.py)
+    miniaturas = models.JSONField(default=dict, blank=True, editable=False)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
     stock = models.PositiveIntegerField(default=0)
     fecha_publicacion = models.DateField(blank=True, null=True)
-    isbn = models.CharField(max_length=20, blank=True)
+    isbn = models.CharField(max_length=20, unique=True, null=True, blank=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     activo = models.BooleanField(default=True)
@@ -40,6 +48,22 @@ class Libro(models.Model):
         verbose_name = "Libro"
         verbose_name_plural = "Libros"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Catálogo: activo=True, stock__gt=0 ordenado por -fecha_creacion
+            models.Index(
+                fields=['-fecha_creacion', '-id'],
+                condition=models.Q(activo=True, stock__gt=0),
+                name='libro_catalogo_idx',
+            ),
+            models.Index(
+                fields=['categoria', '-fecha_creacion', '-id'],
+                condition=models.Q(activo=True, stock__gt=0),
+                name='libro_catalogo_categoria_idx',
+            ),
+            # Changelist del admin y conteos del panel
+            models.Index(fields=['-fecha_creacion', '-id'], name='libro_fecha_idx'),
+            models.Index(fields=['activo', 'stock'], name='libro_activo_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
@@ -49,15 +73,61 @@ class Libro(models.Model):
         return self.stock > 0 and self.activo
 
 
+class CarritoQuerySet(models.QuerySet):
+    def con_totales_reales(self):
+        """Anota los totales calculados a partir de los items del carrito"""
+        return self.annotate(
+            total_real=Coalesce(
+                Sum(F('items__cantidad') * F('items__libro__precio')),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            cantidad_real=Coalesce(Sum('items__cantidad'), Value(0)),
+        )
+
+    def con_desfase(self):
+        """Carritos cuyos totales guardados no coinciden con sus items"""
+        return self.con_totales_reales().exclude(
+            total=F('total_real'), cantidad_total=F('cantidad_real')
+        )
+
+    def recalcular_totales(self):
+        """Recalcula los totales guardados con una sola sentencia UPDATE"""
+        items = ItemCarrito.objects.filter(carrito=OuterRef('pk')).order_by().values('carrito')
+        return self.update(
+            total=Coalesce(
+                Subquery(items.annotate(suma=Sum(F('cantidad') * F('libro__precio'))).values('suma')),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            cantidad_total=Coalesce(
+                Subquery(items.annotate(suma=Sum('cantidad')).values('suma')),
+                Value(0),
+            ),
+        )
+
+
 class Carrito(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True)
+    # Totales desnormalizados; se mantienen con recalcular_totales()
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cantidad_total = models.PositiveIntegerField(default=0)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    objects = CarritoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Carrito"
         verbose_name_plural = "Carritos"
+        indexes = [
+            models.Index(
+                fields=['session_key'],
+                condition=models.Q(session_key__isnull=False),
+                name='carrito_session_idx',
+            ),
+        ]
 
     def __str__(self):
         if self.usuario:
@@ -65,12 +135,32 @@ class Carrito(models.Model):
         return f"Carrito de sesión {self.session_key}"
 
     @property
-    def total(self):
-        return sum(item.subtotal for item in self.items.all())
+    def impuestos(self):
+        return self.total * IVA
 
     @property
-    def cantidad_total(self):
-        return sum(item.cantidad for item in self.items.all())
+    def total_con_impuestos(self):
+        return self.total + self.impuestos
+
+    def recalcular_totales(self):
+        """Actualiza total y cantidad_total con un único aggregate en SQL"""
+        totales = self.items.aggregate(
+            total=Sum(F('cantidad') * F('libro__precio')),
+            cantidad=Sum('cantidad'),
+        )
+        self.total = totales['total'] or Decimal('0')
+        self.cantidad_total = totales['cantidad'] or 0
+        self.save(update_fields=['total', 'cantidad_total', 'fecha_actualizacion'])
+
+    async def arecalcular_totales(self):
+        """recalcular_totales para vistas asíncronas"""
+        totales = await self.items.aaggregate(
+            total=Sum(F('cantidad') * F('libro__precio')),
+            cantidad=Sum('cantidad'),
+        )
+        self.total = totales['total'] or Decimal('0')
+        self.cantidad_total = totales['cantidad'] or 0
+        await self.asave(update_fields=['total', 'cantidad_total', 'fecha_actualizacion'])
 
 
 class ItemCarrito(models.Model):
@@ -92,6 +182,42 @@ class ItemCarrito(models.Model):
         return self.cantidad * self.libro.precio
 
 
+class ReservaQuerySet(models.QuerySet):
+    def activas(self):
+        """Reservas que todavía no han expirado"""
+        return self.filter(fecha_expiracion__gt=timezone.now())
+
+    def expiradas(self):
+        """Reservas vencidas pendientes de liberar"""
+        return self.filter(fecha_expiracion__lte=timezone.now())
+
+
+class Reserva(models.Model):
+    """Unidades de un libro apartadas para un carrito durante un tiempo limitado"""
+    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='reservas')
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    fecha_expiracion = models.DateTimeField(db_index=True)
+
+    objects = ReservaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Reserva"
+        verbose_name_plural = "Reservas"
+        unique_together = ['carrito', 'libro']
+
+    def __str__(self):
+        return f"{self.cantidad}x {self.libro.titulo} hasta {self.fecha_expiracion:%H:%M}"
+
+
+class PedidoQuerySet(models.QuerySet):
+    def con_items(self):
+        """Precarga los items de cada pedido junto con su libro"""
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=ItemPedido.objects.select_related('libro'))
+        )
+
+
 class Pedido(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -126,10 +252,18 @@ class Pedido(models.Model):
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     notas = models.TextField(blank=True)
 
+    objects = PedidoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Historial del cliente, pedidos por estado y rango, últimos pedidos
+            models.Index(fields=['usuario', '-fecha_creacion'], name='pedido_usuario_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_creacion'], name='pedido_estado_fecha_idx'),
+            models.Index(fields=['-fecha_creacion', '-id'], name='pedido_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.nombre_completo}"
@@ -152,3 +286,65 @@ class ItemPedido(models.Model):
     def subtotal(self):
         return self.cantidad * self.precio_unitario
 
+
+
+class VentaDiariaQuerySet(models.QuerySet):
+    def totales_por_dia(self):
+        """Filas con el total del día, sin desglose por libro"""
+        return self.filter(libro__isnull=True)
+
+    def por_libro(self):
+        """Filas con el desglose por libro y categoría"""
+        return self.filter(libro__isnull=False)
+
+
+class VentaDiaria(models.Model):
+    """Resumen de ventas por día, categoría y libro
+
+    Las filas sin libro guardan el total del día: pedidos distintos y suma de
+    Pedido.total (con impuestos). Las filas con libro guardan las unidades e
+    ingresos (cantidad * precio_unitario) de ese libro en el día. Se recalcula
+    con el comando actualizar_ventas_diarias.
+    """
+    fecha = models.DateField()
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, null=True, blank=True)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = VentaDiariaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro'], name='venta_diaria_unica_por_libro'),
+            models.UniqueConstraint(
+                fields=['fecha'],
+                condition=models.Q(libro__isnull=True),
+                name='venta_diaria_unica_por_dia',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['categoria', 'fecha']),
+        ]
+
+    def __str__(self):
+        if self.libro_id:
+            return f"{self.fecha} - {self.libro.titulo}"
+        return f"{self.fecha} - Total del día"
+
+
+class VentaDiariaPendiente(models.Model):
+    """Día con pedidos modificados cuyo resumen de ventas debe recalcularse"""
+    fecha = models.DateField(unique=True)
+
+    class Meta:
+        verbose_name = "Día pendiente de resumen"
+        verbose_name_plural = "Días pendientes de resumen"
+
+    def __str__(self):
+        return str(self.fecha)
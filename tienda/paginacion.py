@@ -0,0 +1,233 @@
+"""
+Paginación del catálogo sin OFFSET ni COUNT por petición.
+
+El listado normal se pagina por cursor sobre ``(fecha_creacion, id)``: cada
+página pide las filas siguientes a la última vista, así que la página 10.000
+cuesta lo mismo que la primera y aprovecha los índices del catálogo. Las
+búsquedas se ordenan por relevancia, que no sirve como cursor, y se paginan por
+desplazamiento sin contar resultados. El total que se muestra se guarda en el
+caché durante ``TIENDA_CONTEO_CACHE_SEGUNDOS`` y por lo tanto es aproximado.
+
+Los listados del admin usan ``PaginadorEstimado``, que en las tablas grandes
+reemplaza el COUNT(*) por una estimación.
+"""
+
+import hashlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class Pagina:
+    """Página de resultados con los parámetros GET de la anterior y la siguiente"""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.object_list = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return bool(self.siguiente)
+
+    def has_previous(self):
+        return bool(self.anterior)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def parametros_siguiente(self):
+        return urlencode(self.siguiente or {})
+
+    @property
+    def parametros_anterior(self):
+        return urlencode(self.anterior or {})
+
+
+def codificar_cursor(libro):
+    """Cursor opaco con la posición de un libro (o de su fila de values()) en el orden del catálogo"""
+    if isinstance(libro, dict):
+        texto = f'{libro["fecha_creacion"].isoformat()}|{libro["id"]}'
+    else:
+        texto = f'{libro.fecha_creacion.isoformat()}|{libro.pk}'
+    return urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha_creacion, id) del cursor, o None si no es válido"""
+    if not cursor:
+        return None
+    try:
+        texto = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, pk = texto.split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except ValueError:
+        return None
+
+
+def _consulta_cursor(queryset, por_pagina, despues=None, antes=None):
+    """Consulta de una página por cursor y la función que arma la Pagina con sus filas"""
+    queryset = queryset.order_by('-fecha_creacion', '-id')
+
+    posicion = decodificar_cursor(antes)
+    if posicion:
+        fecha, pk = posicion
+
+        def armar(filas):
+            hay_mas = len(filas) > por_pagina
+            filas = filas[:por_pagina]
+            filas.reverse()
+            return Pagina(
+                filas,
+                siguiente={'despues': codificar_cursor(filas[-1])} if filas else None,
+                anterior={'antes': codificar_cursor(filas[0])} if hay_mas else None,
+            )
+
+        # fecha_creacion >= fecha primero, para que el índice haga un rango
+        consulta = (
+            queryset.filter(Q(fecha_creacion__gte=fecha) & (Q(fecha_creacion__gt=fecha) | Q(id__gt=pk)))
+            .order_by('fecha_creacion', 'id')[:por_pagina + 1]
+        )
+        return consulta, armar
+
+    posicion = decodificar_cursor(despues)
+    if posicion:
+        fecha, pk = posicion
+        queryset = queryset.filter(Q(fecha_creacion__lte=fecha) & (Q(fecha_creacion__lt=fecha) | Q(id__lt=pk)))
+
+    def armar(filas):
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        return Pagina(
+            filas,
+            siguiente={'despues': codificar_cursor(filas[-1])} if hay_mas else None,
+            anterior={'antes': codificar_cursor(filas[0])} if posicion and filas else None,
+        )
+
+    return queryset[:por_pagina + 1], armar
+
+
+def paginar_por_cursor(queryset, por_pagina, despues=None, antes=None):
+    """Página del catálogo ordenado por (-fecha_creacion, -id) a partir de un cursor"""
+    consulta, armar = _consulta_cursor(queryset, por_pagina, despues, antes)
+    return armar(list(consulta))
+
+
+def _consulta_desplazamiento(queryset, por_pagina, numero):
+    try:
+        numero = max(int(numero), 1)
+    except (TypeError, ValueError):
+        numero = 1
+    inicio = (numero - 1) * por_pagina
+
+    def armar(filas):
+        return Pagina(
+            filas[:por_pagina],
+            siguiente={'page': numero + 1} if len(filas) > por_pagina else None,
+            anterior={'page': numero - 1} if numero > 1 else None,
+        )
+
+    return queryset[inicio:inicio + por_pagina + 1], armar
+
+
+def paginar_por_desplazamiento(queryset, por_pagina, numero):
+    """Página por número sin COUNT: se pide una fila extra para saber si hay más"""
+    consulta, armar = _consulta_desplazamiento(queryset, por_pagina, numero)
+    return armar(list(consulta))
+
+
+def _clave_conteo(queryset):
+    sql = str(queryset.order_by().query)
+    return 'tienda:conteo:' + hashlib.md5(sql.encode()).hexdigest()
+
+
+def _segundos_conteo():
+    return getattr(settings, 'TIENDA_CONTEO_CACHE_SEGUNDOS', 300)
+
+
+def contar_en_cache(queryset):
+    """Número de resultados del queryset, guardado en caché por consulta"""
+    clave = _clave_conteo(queryset)
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, _segundos_conteo())
+    return total
+
+
+def _conteo_estimado_desde():
+    return getattr(settings, 'TIENDA_CONTEO_ESTIMADO_DESDE', 10000)
+
+
+def conteo_estimado(modelo, alias='default'):
+    """Filas aproximadas de la tabla del modelo según las estadísticas del motor, o None sin ellas
+
+    Son las mismas estadísticas que usa el planificador de consultas, al día
+    tras cada ANALYZE: en PostgreSQL ``reltuples`` (autovacuum las actualiza
+    solo), en SQLite ``sqlite_stat1`` (``generar_datos`` y ``limpiar_carritos``
+    ejecutan ANALYZE al terminar).
+    """
+    conexion = connections[alias]
+    tabla = modelo._meta.db_table
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [tabla])
+            fila = cursor.fetchone()
+            # -1 mientras la tabla no se haya analizado nunca
+            return int(fila[0]) if fila and fila[0] >= 0 else None
+        if conexion.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [tabla])
+            except OperationalError:
+                # sqlite_stat1 no existe hasta el primer ANALYZE
+                return None
+            # El primer número de cada fila son las filas del índice; los parciales tienen menos
+            filas = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(filas) if filas else None
+    return None
+
+
+def actualizar_estadisticas(modelos, alias='default'):
+    """ANALYZE de las tablas de los modelos, tras cargas o borrados masivos"""
+    conexion = connections[alias]
+    if conexion.vendor not in ('sqlite', 'postgresql'):
+        return
+    with conexion.cursor() as cursor:
+        for modelo in modelos:
+            cursor.execute(f'ANALYZE {conexion.ops.quote_name(modelo._meta.db_table)}')
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator para los listados del admin de tablas grandes
+
+    Con menos de ``TIENDA_CONTEO_ESTIMADO_DESDE`` filas cuenta como siempre. Por
+    encima, el listado sin filtros usa ``conteo_estimado`` y el filtrado el
+    conteo guardado en caché, así que cada página cuesta lo mismo sea cual sea
+    el tamaño de la tabla. Sin estadísticas se usa también el conteo en caché.
+    Usarlo con ``show_full_result_count = False``.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimado = conteo_estimado(queryset.model, queryset.db)
+        if estimado is None:
+            return contar_en_cache(queryset)
+        if estimado < _conteo_estimado_desde():
+            return queryset.count()
+        if not queryset.query.where:
+            return estimado
+        return contar_en_cache(queryset)
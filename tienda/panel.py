@@ -0,0 +1,102 @@
+"""
+Estadísticas del panel del vendedor.
+
+Cada widget del panel se calcula con una sola consulta y se guarda en el caché
+durante ``TIENDA_PANEL_CACHE_SEGUNDOS``. Las claves incluyen la fecha local, así
+que "pedidos de hoy" y "ventas del mes" cambian solos al pasar el día; los
+cambios en pedidos, libros o en el resumen diario borran solo los widgets
+afectados (ver signals.py, pedidos.py y ventas_diarias.py).
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Libro, Pedido
+from .reportes import como_datetime, rango_ultimos_meses, total_vendido
+
+
+def _segundos_cache():
+    return getattr(settings, 'TIENDA_PANEL_CACHE_SEGUNDOS', 300)
+
+
+def _clave(widget):
+    return f'tienda:panel:{widget}:{timezone.localdate().isoformat()}'
+
+
+def _libros():
+    return Libro.objects.aggregate(
+        total_libros=Count('id'),
+        libros_activos=Count('id', filter=Q(activo=True)),
+        libros_sin_stock=Count('id', filter=Q(stock=0)),
+    )
+
+
+def _pedidos_pendientes():
+    return {'pedidos_pendientes': Pedido.objects.filter(estado='pendiente').count()}
+
+
+def _pedidos_hoy():
+    hoy = timezone.localdate()
+    return {'pedidos_hoy': Pedido.objects.filter(
+        fecha_creacion__gte=como_datetime(hoy),
+        fecha_creacion__lt=como_datetime(hoy + timedelta(days=1)),
+    ).count()}
+
+
+def _ventas_mes():
+    desde, hasta = rango_ultimos_meses(1)
+    return {'ventas_mes': total_vendido(desde, hasta)}
+
+
+def _ultimos_pedidos():
+    return {'ultimos_pedidos': list(Pedido.objects.order_by('-fecha_creacion')[:10])}
+
+
+WIDGETS = {
+    'libros': _libros,
+    'pedidos_pendientes': _pedidos_pendientes,
+    'pedidos_hoy': _pedidos_hoy,
+    'ventas_mes': _ventas_mes,
+    'ultimos_pedidos': _ultimos_pedidos,
+}
+
+# Widgets que dependen de cada tipo de cambio
+WIDGETS_LIBRO = ['libros']
+WIDGETS_PEDIDO = ['pedidos_pendientes', 'pedidos_hoy', 'ultimos_pedidos']
+WIDGETS_VENTAS = ['ventas_mes']
+
+
+def estadisticas_panel():
+    """Valores del panel y tiempo de cada widget, calculando solo los que faltan en caché"""
+    claves = {nombre: _clave(nombre) for nombre in WIDGETS}
+    en_cache = cache.get_many(claves.values())
+
+    contexto, tiempos, nuevos = {}, [], {}
+    for nombre, calcular in WIDGETS.items():
+        inicio = time.perf_counter()
+        valores = en_cache.get(claves[nombre])
+        origen = 'caché'
+        if valores is None:
+            valores = calcular()
+            nuevos[claves[nombre]] = valores
+            origen = 'base de datos'
+        tiempos.append({
+            'widget': nombre,
+            'origen': origen,
+            'ms': (time.perf_counter() - inicio) * 1000,
+        })
+        contexto.update(valores)
+
+    if nuevos:
+        cache.set_many(nuevos, _segundos_cache())
+    return contexto, tiempos
+
+
+def olvidar_widgets(widgets):
+    """Borra del caché los widgets indicados para que se recalculen en la próxima visita"""
+    cache.delete_many([_clave(widget) for widget in widgets])
@@ -0,0 +1,112 @@
+"""
+Creación de pedidos a partir del carrito.
+
+El stock se descuenta con una sola sentencia UPDATE condicional sobre todas las
+líneas del carrito: si alguna no tiene stock suficiente la transacción completa
+se revierte, así que el stock nunca queda negativo ni se pierden descuentos
+cuando varios compradores confirman a la vez.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from .models import IVA, Carrito, ItemPedido, Libro
+from .cache_paginas import purgar_catalogo
+from .panel import WIDGETS_LIBRO, olvidar_widgets
+from .reservas import olvidar_disponibles, reservado_por_otros, unidades_reservadas
+
+
+class CarritoVacio(Exception):
+    """El carrito no tiene items que confirmar"""
+
+    def __init__(self):
+        super().__init__('Tu carrito está vacío')
+
+
+class StockInsuficiente(Exception):
+    """Alguna línea del carrito pide más unidades de las disponibles"""
+
+    def __init__(self, libros):
+        self.libros = libros
+        titulos = ', '.join(libro.titulo for libro in libros)
+        super().__init__(f'No hay suficiente stock disponible para: {titulos}')
+
+
+def _descontar_stock(carrito, cantidades):
+    """Descuenta el stock de todas las líneas; devuelve False si alguna no alcanza
+
+    Las unidades reservadas por otros carritos no se pueden vender.
+    """
+    condicion = Q()
+    for libro_id, cantidad in cantidades.items():
+        condicion |= Q(pk=libro_id, stock__gte=F('reservado_otros') + cantidad)
+    actualizados = Libro.objects.annotate(
+        reservado_otros=reservado_por_otros(carrito),
+    ).filter(condicion, activo=True).update(
+        stock=Case(
+            *[When(pk=libro_id, then=F('stock') - cantidad) for libro_id, cantidad in cantidades.items()],
+            default=F('stock'),
+            output_field=PositiveIntegerField(),
+        )
+    )
+    return actualizados == len(cantidades)
+
+
+def _purgar_agotados(libro_ids):
+    """Los libros que se quedaron sin stock desaparecen del catálogo en caché"""
+    if Libro.objects.filter(pk__in=libro_ids, stock=0).exists():
+        purgar_catalogo()
+
+
+def confirmar_pedido(pedido, carrito):
+    """Guarda el pedido con los items del carrito, descuenta stock y vacía el carrito
+
+    Lanza CarritoVacio si el carrito no tiene items, por ejemplo cuando el mismo
+    pedido se envía dos veces y el otro envío ya lo confirmó.
+    """
+    with transaction.atomic():
+        # La primera sentencia es de escritura sobre el carrito: toma el bloqueo
+        # desde el inicio, así dos confirmaciones del mismo carrito van en serie
+        # y la segunda lee los items ya vaciados por la primera
+        Carrito.objects.filter(pk=carrito.pk).update(fecha_actualizacion=timezone.now())
+        items = list(carrito.items.select_related('libro'))
+        if not items:
+            raise CarritoVacio()
+
+        cantidades = {item.libro_id: item.cantidad for item in items}
+        subtotal = sum(item.subtotal for item in items)
+        pedido.subtotal = subtotal
+        pedido.impuestos = subtotal * IVA
+        pedido.total = subtotal + pedido.impuestos
+
+        if not _descontar_stock(carrito, cantidades):
+            transaction.set_rollback(True)
+        else:
+            pedido.save()
+            ItemPedido.objects.bulk_create([
+                ItemPedido(
+                    pedido=pedido,
+                    libro=item.libro,
+                    cantidad=item.cantidad,
+                    precio_unitario=item.libro.precio,
+                )
+                for item in items
+            ])
+            carrito.items.all().delete()
+            carrito.reservas.all().delete()
+            carrito.total = 0
+            carrito.cantidad_total = 0
+            carrito.save(update_fields=['total', 'cantidad_total', 'fecha_actualizacion'])
+            transaction.on_commit(lambda: olvidar_disponibles(cantidades))
+            # El UPDATE de stock no dispara señales; el conteo de libros sin stock puede cambiar
+            transaction.on_commit(lambda: olvidar_widgets(WIDGETS_LIBRO))
+            transaction.on_commit(lambda: _purgar_agotados(cantidades))
+            return pedido
+
+    agotados = [
+        libro for libro in Libro.objects.filter(pk__in=cantidades)
+        if not libro.activo
+        or libro.stock - unidades_reservadas(libro.pk, excluir_carrito=carrito) < cantidades[libro.pk]
+    ]
+    raise StockInsuficiente(agotados)
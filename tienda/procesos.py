@@ -0,0 +1,27 @@
+"""
+Inicialización de los procesos hijos que escriben en la base de datos.
+
+Con el método de arranque ``spawn`` (el predeterminado en macOS y Windows) cada
+proceso empieza con un intérprete nuevo: Django se configura en el
+inicializador del pool, antes de importar cualquier módulo con modelos, igual
+que en el runner de pruebas en paralelo de Django. Por eso este módulo no
+importa modelos.
+"""
+
+import os
+
+import django
+
+
+def preparar_proceso(modulo_settings, base_de_datos):
+    """Inicializador del pool: configura Django y usa la misma base que el proceso padre"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', modulo_settings)
+    django.setup()
+
+    from django.db import connection
+
+    # El padre puede trabajar sobre otra base que la de settings (pruebas, benchmarks)
+    connection.settings_dict['NAME'] = base_de_datos
+    if connection.vendor == 'sqlite':
+        # SQLite admite un solo escritor: los demás procesos esperan su turno
+        connection.settings_dict['OPTIONS']['timeout'] = 600
@@ -0,0 +1,161 @@
+"""
+Reportes de ventas agregados por periodo.
+
+Las series y el ranking de libros se leen del resumen diario (VentaDiaria), así
+que su costo depende del número de días del rango y no del número de pedidos.
+Cada serie es una sola consulta agrupada (TruncDay/TruncWeek/TruncMonth); los
+periodos sin ventas se completan en Python con ceros.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Pedido, VentaDiaria
+
+
+ESTADOS_VENTA = ['procesando', 'enviado', 'entregado']
+
+PERIODOS = {
+    'dia': (TruncDay, '%Y-%m-%d'),
+    'semana': (TruncWeek, 'Semana del %Y-%m-%d'),
+    'mes': (TruncMonth, '%Y-%m'),
+}
+
+
+def _inicio_periodo(dia, periodo):
+    if periodo == 'mes':
+        return dia.replace(day=1)
+    if periodo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    return dia
+
+
+def _siguiente_periodo(dia, periodo):
+    if periodo == 'mes':
+        return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if periodo == 'semana':
+        return dia + timedelta(days=7)
+    return dia + timedelta(days=1)
+
+
+def rango_ultimos_meses(meses=12):
+    """Rango [desde, hasta) que cubre el mes actual y los ``meses - 1`` anteriores"""
+    hoy = timezone.localdate()
+    desde = hoy.replace(day=1)
+    for _ in range(meses - 1):
+        desde = (desde - timedelta(days=1)).replace(day=1)
+    return desde, hoy + timedelta(days=1)
+
+
+def como_datetime(dia):
+    """Medianoche local del día dado, para filtrar fecha_creacion por rango"""
+    if isinstance(dia, datetime):
+        return dia
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _como_fecha(dia):
+    """Día local de una fecha o datetime, para filtrar el resumen diario"""
+    if isinstance(dia, datetime):
+        return timezone.localdate(dia) if timezone.is_aware(dia) else dia.date()
+    return dia
+
+
+def pedidos_vendidos(desde, hasta):
+    """Pedidos que cuentan como venta dentro del rango [desde, hasta)"""
+    return Pedido.objects.filter(
+        fecha_creacion__gte=como_datetime(desde),
+        fecha_creacion__lt=como_datetime(hasta),
+        estado__in=ESTADOS_VENTA,
+    )
+
+
+def serie_ventas(desde, hasta, periodo='mes'):
+    """Total y cantidad de pedidos por periodo, del más reciente al más antiguo"""
+    funcion, formato = PERIODOS[periodo]
+    filas = (
+        VentaDiaria.objects.totales_por_dia()
+        .filter(fecha__gte=_como_fecha(desde), fecha__lt=_como_fecha(hasta))
+        .annotate(periodo=funcion('fecha'))
+        .values('periodo')
+        .annotate(total=Sum('total'), cantidad=Sum('pedidos'))
+        .order_by()
+    )
+    por_periodo = {}
+    for fila in filas:
+        inicio = fila['periodo']
+        if isinstance(inicio, datetime):
+            inicio = timezone.localtime(inicio).date() if timezone.is_aware(inicio) else inicio.date()
+        por_periodo[inicio] = fila
+
+    serie = []
+    fin = _como_fecha(hasta)
+    inicio = _inicio_periodo(_como_fecha(desde), periodo)
+    while inicio < fin:
+        fila = por_periodo.get(inicio, {})
+        total = fila.get('total') or 0
+        cantidad = fila.get('cantidad') or 0
+        serie.append({
+            'inicio': inicio,
+            'periodo': inicio.strftime(formato),
+            'total': total,
+            'cantidad': cantidad,
+            'promedio': total / cantidad if cantidad else 0,
+        })
+        inicio = _siguiente_periodo(inicio, periodo)
+    serie.reverse()
+    return serie
+
+
+def libros_mas_vendidos(desde, hasta, limite=10):
+    """Libros con más unidades vendidas en el rango, con sus ingresos reales"""
+    return (
+        VentaDiaria.objects.por_libro()
+        .filter(fecha__gte=_como_fecha(desde), fecha__lt=_como_fecha(hasta))
+        .values('libro_id', 'libro__titulo')
+        .annotate(
+            cantidad_vendida=Sum('unidades'),
+            ingresos=Sum('ingresos'),
+        )
+        .order_by('-cantidad_vendida')[:limite]
+    )
+
+
+def total_vendido(desde, hasta):
+    """Suma de Pedido.total de los pedidos vendidos en el rango"""
+    return VentaDiaria.objects.totales_por_dia().filter(
+        fecha__gte=_como_fecha(desde), fecha__lt=_como_fecha(hasta),
+    ).aggregate(total=Sum('total'))['total'] or 0
+
+
+def reporte_ventas(desde, hasta, periodo='mes'):
+    """Datos completos del reporte de ventas para el rango y periodo dados"""
+    serie = serie_ventas(desde, hasta, periodo)
+    return {
+        'serie': serie,
+        'libros_vendidos': list(libros_mas_vendidos(desde, hasta)),
+        'total': sum(fila['total'] for fila in serie),
+        'cantidad': sum(fila['cantidad'] for fila in serie),
+    }
+
+
+def leer_rango(parametros):
+    """Interpreta desde/hasta/periodo de una petición GET, con valores por defecto"""
+    desde, hasta = rango_ultimos_meses()
+    try:
+        if parametros.get('desde'):
+            desde = date.fromisoformat(parametros['desde'])
+        if parametros.get('hasta'):
+            # 'hasta' es inclusivo en el formulario
+            hasta = date.fromisoformat(parametros['hasta']) + timedelta(days=1)
+    except ValueError:
+        desde, hasta = rango_ultimos_meses()
+    periodo = parametros.get('periodo')
+    if periodo not in PERIODOS:
+        periodo = 'mes'
+    if desde >= hasta:
+        desde, hasta = rango_ultimos_meses()
+    return desde, hasta, periodo
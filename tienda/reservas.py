@@ -0,0 +1,231 @@
+"""
+Reservas temporales de stock para los carritos.
+
+Al agregar un libro al carrito se apartan sus unidades durante
+``TIENDA_RESERVA_MINUTOS``; mientras la reserva esté activa ningún otro carrito
+puede comprarlas. Las reservas vencidas dejan de contar de inmediato y el
+comando ``liberar_reservas`` las elimina por lotes.
+
+Las unidades disponibles de cada libro (stock menos reservas de otros) se
+guardan en el caché para que las consultas frecuentes no lean la fila de
+``Libro``. El caché solo acelera la lectura: toda reserva se valida contra la
+base de datos dentro de una transacción.
+"""
+
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_paginas import purgar_libros
+from .models import Libro, Reserva
+
+
+def duracion_reserva():
+    return timedelta(minutes=getattr(settings, 'TIENDA_RESERVA_MINUTOS', 15))
+
+
+def _segundos_cache():
+    return getattr(settings, 'TIENDA_DISPONIBLES_CACHE_SEGUNDOS', 30)
+
+
+def _clave(libro_id):
+    return f'tienda:disponibles:{libro_id}'
+
+
+def pocas_unidades():
+    """Unidades disponibles desde las que el detalle muestra la cifra exacta"""
+    return getattr(settings, 'TIENDA_POCAS_UNIDADES', 5)
+
+
+def _mostradas(disponibles):
+    """Lo que el detalle muestra de las unidades: la cifra solo cuando quedan pocas"""
+    return min(disponibles, pocas_unidades() + 1)
+
+
+def _purgar_si_cambian(anteriores, disponibles):
+    """Purga el detalle de los libros cuya disponibilidad mostrada cambió
+
+    ``anteriores`` son los contadores que había en el caché; sin contador no se
+    sabe qué muestra la página y se purga igual.
+    """
+    cambiados = [
+        libro_id for libro_id, unidades in disponibles.items()
+        if anteriores.get(_clave(libro_id)) is None
+        or _mostradas(anteriores[_clave(libro_id)]) != _mostradas(unidades)
+    ]
+    if cambiados:
+        purgar_libros(cambiados)
+
+
+def unidades_reservadas(libro_id, excluir_carrito=None):
+    """Unidades con reserva activa, sin contar las del carrito indicado"""
+    reservas = Reserva.objects.activas().filter(libro_id=libro_id)
+    if excluir_carrito is not None:
+        reservas = reservas.exclude(carrito=excluir_carrito)
+    return reservas.aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def reservado_por_otros(carrito):
+    """Subconsulta con las unidades de cada libro (OuterRef pk) reservadas por otros carritos"""
+    reservas = (
+        Reserva.objects.activas()
+        .filter(libro=OuterRef('pk'))
+        .exclude(carrito=carrito)
+        .order_by()
+        .values('libro')
+        .annotate(total=Sum('cantidad'))
+        .values('total')
+    )
+    return Coalesce(Subquery(reservas), Value(0))
+
+
+def unidades_disponibles(libro):
+    """Unidades que se pueden agregar a un carrito, leídas del caché si es posible"""
+    disponibles = cache.get(_clave(libro.pk))
+    if disponibles is None:
+        disponibles = max(libro.stock - unidades_reservadas(libro.pk), 0) if libro.activo else 0
+        cache.set(_clave(libro.pk), disponibles, _segundos_cache())
+    return disponibles
+
+
+async def aunidades_disponibles(libro):
+    """unidades_disponibles para vistas asíncronas"""
+    disponibles = await cache.aget(_clave(libro.pk))
+    if disponibles is None:
+        disponibles = await sync_to_async(unidades_disponibles)(libro)
+    return disponibles
+
+
+def olvidar_disponibles(libro_ids):
+    """Invalida el contador en caché de los libros indicados y sus páginas de detalle"""
+    cache.delete_many([_clave(libro_id) for libro_id in libro_ids])
+    purgar_libros(libro_ids)
+
+
+def reservar(carrito, libro, cantidad):
+    """Aparta ``cantidad`` unidades del libro para el carrito, renovando la reserva
+
+    Lanza StockInsuficiente si el stock libre de reservas ajenas no alcanza.
+    """
+    from .pedidos import StockInsuficiente
+
+    with transaction.atomic():
+        # Escritura sin efecto para bloquear la fila del libro desde el inicio,
+        # así dos reservas simultáneas del mismo libro se ejecutan en serie
+        Libro.objects.filter(pk=libro.pk).update(stock=F('stock'))
+        libro.refresh_from_db(fields=['stock', 'activo'])
+
+        libres = libro.stock - unidades_reservadas(libro.pk, excluir_carrito=carrito)
+        if not libro.activo or libres < cantidad:
+            raise StockInsuficiente([libro])
+
+        Reserva.objects.update_or_create(
+            carrito=carrito,
+            libro=libro,
+            defaults={
+                'cantidad': cantidad,
+                'fecha_expiracion': timezone.now() + duracion_reserva(),
+            },
+        )
+
+    anteriores = cache.get_many([_clave(libro.pk)])
+    cache.set(_clave(libro.pk), libres - cantidad, _segundos_cache())
+    # Cada reserva no vuelve a renderizar el detalle, solo cuando cambia lo que muestra
+    _purgar_si_cambian(anteriores, {libro.pk: libres - cantidad})
+
+
+def unidades_libres(libro_ids, carrito=None):
+    """Libros indicados con ``libres``: su stock menos las reservas de otros carritos, en una consulta"""
+    libros = (
+        Libro.objects.filter(pk__in=libro_ids)
+        .annotate(reservado_otros=reservado_por_otros(carrito))
+        .only('pk', 'titulo', 'precio', 'stock', 'activo')
+    )
+    for libro in libros:
+        libro.libres = max(libro.stock - libro.reservado_otros, 0) if libro.activo else 0
+    return {libro.pk: libro for libro in libros}
+
+
+def comprobar_stock(cantidades, carrito=None):
+    """Libros de ``cantidades`` ({libro_id: cantidad}) por id, con sus unidades libres
+
+    Lanza StockInsuficiente si alguno no alcanza para la cantidad pedida o ya no existe.
+    """
+    from .pedidos import StockInsuficiente
+
+    libros = unidades_libres(cantidades, carrito)
+    insuficientes = [libro for libro_id, libro in libros.items() if libro.libres < cantidades[libro_id]]
+    if insuficientes or len(libros) < len(cantidades):
+        raise StockInsuficiente(insuficientes)
+    return libros
+
+
+def reservar_varios(carrito, cantidades, ajustar=False):
+    """Aparta de una vez las unidades de varios libros ({libro_id: cantidad}) para el carrito
+
+    El stock libre de todos los libros se lee en una sola consulta; si alguno no
+    alcanza lanza StockInsuficiente y no se aparta ninguno. Con ``ajustar`` cada
+    cantidad se reduce a las unidades libres en lugar de fallar. Devuelve las
+    cantidades reservadas.
+    """
+    if not cantidades:
+        return {}
+
+    with transaction.atomic():
+        # Escritura sin efecto para bloquear las filas, como en reservar()
+        Libro.objects.filter(pk__in=cantidades).update(stock=F('stock'))
+        if ajustar:
+            libros = unidades_libres(cantidades, carrito)
+            cantidades = {
+                libro_id: min(cantidad, libros[libro_id].libres)
+                for libro_id, cantidad in cantidades.items() if libro_id in libros
+            }
+        else:
+            libros = comprobar_stock(cantidades, carrito)
+
+        # unique_together (carrito, libro): se reemplazan en vez de un update_or_create por libro
+        Reserva.objects.filter(carrito=carrito, libro_id__in=cantidades).delete()
+        expiracion = timezone.now() + duracion_reserva()
+        Reserva.objects.bulk_create([
+            Reserva(carrito=carrito, libro_id=libro_id, cantidad=cantidad, fecha_expiracion=expiracion)
+            for libro_id, cantidad in cantidades.items() if cantidad > 0
+        ])
+
+    disponibles = {libro_id: libros[libro_id].libres - cantidad for libro_id, cantidad in cantidades.items()}
+    anteriores = cache.get_many([_clave(libro_id) for libro_id in disponibles])
+    cache.set_many({_clave(libro_id): unidades for libro_id, unidades in disponibles.items()}, _segundos_cache())
+    _purgar_si_cambian(anteriores, disponibles)
+    return cantidades
+
+
+def liberar(carrito, libro_ids=None):
+    """Elimina las reservas del carrito, o solo las de los libros indicados"""
+    reservas = Reserva.objects.filter(carrito=carrito)
+    if libro_ids is not None:
+        reservas = reservas.filter(libro_id__in=libro_ids)
+    liberados = list(reservas.values_list('libro_id', flat=True))
+    if liberados:
+        reservas.delete()
+        olvidar_disponibles(liberados)
+    return liberados
+
+
+def liberar_expiradas(lote=1000):
+    """Elimina las reservas vencidas por lotes; devuelve cuántas se liberaron"""
+    liberadas = 0
+    while True:
+        vencidas = list(
+            Reserva.objects.expiradas().values_list('pk', 'libro_id')[:lote]
+        )
+        if not vencidas:
+            return liberadas
+        # Se vuelve a filtrar por vencimiento por si alguna se renovó entretanto
+        borradas, _ = Reserva.objects.expiradas().filter(pk__in=[pk for pk, _ in vencidas]).delete()
+        olvidar_disponibles({libro_id for _, libro_id in vencidas})
+        liberadas += borradas
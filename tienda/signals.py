@@ -0,0 +1,141 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Libro, Categoria, Carrito, ItemPedido, Pedido, VentaDiaria
+from . import busqueda
+from .reservas import olvidar_disponibles
+from .ventas_diarias import marcar_dia
+from .panel import WIDGETS_LIBRO, WIDGETS_PEDIDO, olvidar_widgets
+from .miniaturas import actualizar_miniaturas, encolar_miniaturas, miniaturas_al_dia
+from .fragmentos import nueva_version_categorias
+from .cache_paginas import purgar_catalogo, purgar_libros
+from .carrito import fusionar_carrito_anonimo
+
+
+@receiver(post_save, sender=Libro)
+def indexar_libro_guardado(sender, instance, **kwargs):
+    """Mantiene el índice de búsqueda al día cuando se guarda un libro"""
+    busqueda.indexar_libro(instance)
+
+
+@receiver(post_save, sender=Libro)
+def olvidar_disponibles_libro(sender, instance, **kwargs):
+    """El stock o el estado del libro pudo cambiar; se invalida su contador en caché"""
+    olvidar_disponibles([instance.pk])
+
+
+@receiver(post_save, sender=Libro)
+def recalcular_carritos_por_precio(sender, instance, created, update_fields=None, **kwargs):
+    """Recalcula los carritos que contienen el libro si pudo cambiar su precio"""
+    if created or (update_fields is not None and 'precio' not in update_fields):
+        return
+    Carrito.objects.filter(items__libro=instance).recalcular_totales()
+
+
+@receiver(post_save, sender=Libro)
+def generar_miniaturas_libro(sender, instance, **kwargs):
+    """Genera las miniaturas de la portada cuando se sube o cambia la imagen"""
+    if miniaturas_al_dia(instance):
+        return
+    if not instance.imagen:
+        # Sin imagen solo se vacían las miniaturas, no hay nada que codificar
+        transaction.on_commit(lambda: actualizar_miniaturas(instance))
+        return
+    # La codificación de cada ancho y formato corre en el pool, no en la petición
+    transaction.on_commit(lambda: encolar_miniaturas(instance))
+
+
+@receiver(pre_delete, sender=Libro)
+def recordar_carritos_afectados(sender, instance, **kwargs):
+    """Guarda los carritos con el libro antes de que se borren sus items en cascada"""
+    instance._carritos_afectados = list(
+        Carrito.objects.filter(items__libro=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Libro)
+def desindexar_libro_eliminado(sender, instance, **kwargs):
+    """Quita del índice de búsqueda los libros eliminados"""
+    busqueda.desindexar_libro(instance.pk)
+
+
+@receiver(post_delete, sender=Libro)
+def recalcular_carritos_afectados(sender, instance, **kwargs):
+    """Recalcula los carritos que perdieron items al eliminar el libro"""
+    carritos = getattr(instance, '_carritos_afectados', None)
+    if carritos:
+        Carrito.objects.filter(pk__in=carritos).recalcular_totales()
+
+
+@receiver(post_save, sender=Libro)
+def actualizar_categoria_ventas(sender, instance, created, update_fields=None, **kwargs):
+    """Mantiene la categoría del resumen de ventas si el libro cambió de categoría"""
+    if created or (update_fields is not None and 'categoria' not in update_fields):
+        return
+    VentaDiaria.objects.filter(libro=instance).exclude(
+        categoria_id=instance.categoria_id
+    ).update(categoria_id=instance.categoria_id)
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def marcar_dia_pedido(sender, instance, **kwargs):
+    """Marca el día del pedido para recalcular su resumen de ventas"""
+    marcar_dia(instance.fecha_creacion)
+
+
+@receiver(post_save, sender=ItemPedido)
+@receiver(post_delete, sender=ItemPedido)
+def marcar_dia_item_pedido(sender, instance, **kwargs):
+    """Marca el día del pedido cuando se editan sus items (p. ej. desde el admin)"""
+    pedido = Pedido.objects.filter(pk=instance.pedido_id).values_list('fecha_creacion', flat=True).first()
+    if pedido is not None:
+        marcar_dia(pedido)
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+def olvidar_panel_libro(sender, instance, **kwargs):
+    """Los conteos de libros del panel cambian al guardar o eliminar un libro"""
+    transaction.on_commit(lambda: olvidar_widgets(WIDGETS_LIBRO))
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def olvidar_panel_pedido(sender, instance, **kwargs):
+    """Los conteos y la lista de pedidos del panel cambian con cada pedido"""
+    transaction.on_commit(lambda: olvidar_widgets(WIDGETS_PEDIDO))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def versionar_fragmentos_categoria(sender, instance, **kwargs):
+    """La barra de categorías y las tarjetas muestran nombres de categoría"""
+    transaction.on_commit(nueva_version_categorias)
+
+
+@receiver(post_save, sender=Libro)
+def purgar_paginas_libro(sender, instance, **kwargs):
+    """Precio, stock o datos del libro cambiaron: se renuevan sus páginas en caché"""
+    def purgar():
+        purgar_catalogo(instance.fecha_actualizacion)
+        purgar_libros([instance.pk], instance.fecha_actualizacion)
+
+    transaction.on_commit(purgar)
+
+
+@receiver(post_delete, sender=Libro)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def purgar_paginas_catalogo(sender, instance, **kwargs):
+    """El catálogo en caché muestra libros y nombres de categoría"""
+    transaction.on_commit(purgar_catalogo)
+
+
+@receiver(user_logged_in)
+def fusionar_carrito_al_iniciar_sesion(sender, request, user, **kwargs):
+    """Lo agregado al carrito como visitante pasa al carrito del usuario"""
+    if request is not None and hasattr(request, 'session'):
+        fusionar_carrito_anonimo(request, user)
@@ -0,0 +1,43 @@
+from django import template
+from django.core.cache import cache
+
+from ..fragmentos import FRAGMENTOS, clave_fragmento, registrar_lectura, segundos_cache
+
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nombre, partes, nodelist):
+        self.nombre = nombre
+        self.partes = partes
+        self.nodelist = nodelist
+
+    def render(self, context):
+        clave = clave_fragmento(self.nombre, [parte.resolve(context) for parte in self.partes])
+        html = cache.get(clave)
+        registrar_lectura(self.nombre, html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(clave, html, segundos_cache())
+        return html
+
+
+@register.tag
+def fragmento(parser, token):
+    """Guarda en caché el contenido del bloque con una clave versionada
+
+    {% fragmento "tarjeta_libro" libro.pk libro.fecha_actualizacion %} ... {% endfragmento %}
+
+    Los argumentos después del nombre forman la clave: deben cambiar cuando
+    cambia lo que se muestra dentro del bloque.
+    """
+    partes = token.split_contents()
+    if len(partes) < 3:
+        raise template.TemplateSyntaxError(f'{partes[0]} necesita un nombre y al menos un valor de versión')
+    nombre = partes[1].strip('"\'')
+    if nombre not in FRAGMENTOS:
+        raise template.TemplateSyntaxError(f'Fragmento desconocido: {nombre}; agrégalo a FRAGMENTOS')
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nombre, [parser.compile_filter(parte) for parte in partes[2:]], nodelist)
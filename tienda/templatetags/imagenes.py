@@ -0,0 +1,58 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..miniaturas import FORMATOS
+
+
+register = template.Library()
+
+
+def _srcset(variantes):
+    return ', '.join(f'{default_storage.url(nombre)} {ancho}w' for ancho, nombre in variantes)
+
+
+@register.simple_tag
+def imagen_libro(libro, tamanos, **atributos):
+    """Portada del libro como <picture> con un srcset por formato
+
+    ``tamanos`` es el atributo sizes (p. ej. "60px"); el resto de argumentos
+    (class, style, alt, loading...) se copian a la etiqueta <img>. Si el libro
+    aún no tiene miniaturas se usa la imagen original.
+    """
+    if not libro.imagen:
+        return ''
+    atributos.setdefault('alt', libro.titulo)
+    atributos.setdefault('loading', 'lazy')
+    atributos.setdefault('decoding', 'async')
+
+    miniaturas = libro.miniaturas
+    if miniaturas.get('origen') != libro.imagen.name or not miniaturas.get('formatos', {}).get('jpeg'):
+        return format_html(
+            '<img src="{}"{}>',
+            libro.imagen.url,
+            format_html_join('', ' {}="{}"', atributos.items()),
+        )
+
+    formatos = miniaturas['formatos']
+    fuentes = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (tipo, _srcset(formatos[formato]), tamanos)
+            # En el orden de FORMATOS: el navegador usa la primera fuente que soporte
+            for formato, (tipo, _, _) in FORMATOS.items()
+            if formato != 'jpeg' and formatos.get(formato)
+        ),
+    )
+    jpeg = formatos['jpeg']
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        fuentes,
+        default_storage.url(jpeg[-1][1]),
+        _srcset(jpeg),
+        tamanos,
+        miniaturas['ancho'],
+        miniaturas['alto'],
+        format_html_join('', ' {}="{}"', atributos.items()),
+    )
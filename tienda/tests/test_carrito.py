@@ -0,0 +1,131 @@
+"""
+Carrito de compras: el de la sesión no escribe filas, el visitante que inicia
+sesión conserva lo que agregó y los cambios simultáneos no se pierden.
+"""
+
+import threading
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tienda.carrito import CarritoBD
+from tienda.models import Carrito, Categoria, ItemCarrito, Libro, Reserva
+
+
+def crear_libros(cantidad, stock=50):
+    categoria = Categoria.objects.create(nombre='Novela')
+    return Libro.objects.bulk_create([
+        Libro(
+            titulo=f'Libro {numero}', autor='Autor', descripcion='Descripción',
+            precio=Decimal('10000'), categoria=categoria, stock=stock,
+        )
+        for numero in range(cantidad)
+    ])
+
+
+def escrituras(consultas):
+    return [
+        consulta['sql'] for consulta in consultas
+        if consulta['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+# Las sesiones en caché, la configuración recomendada con el carrito en la sesión
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache', TIENDA_CARRITO_ANONIMO='sesion')
+class CarritoDeSesion(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.libros = crear_libros(3)
+
+    def test_navegar_no_escribe(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('index'))
+            for libro in self.libros:
+                self.client.get(reverse('detalle_libro', args=[libro.pk]))
+            self.client.get(reverse('contador_carrito'))
+            self.client.get(reverse('ver_carrito'))
+        self.assertEqual(escrituras(consultas), [])
+
+    def test_agregar_no_crea_filas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            for libro in self.libros:
+                respuesta = self.client.post(reverse('agregar_al_carrito', args=[libro.pk]), {'cantidad': 2})
+                self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(escrituras(consultas), [])
+        self.assertFalse(Carrito.objects.exists())
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(self.client.get(reverse('contador_carrito')).json()['cantidad_carrito'], 6)
+
+    def test_sin_stock_suficiente(self):
+        respuesta = self.client.post(reverse('agregar_al_carrito', args=[self.libros[0].pk]), {'cantidad': 51})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.client.get(reverse('contador_carrito')).json()['cantidad_carrito'], 0)
+
+
+class FusionAlIniciarSesion:
+    """Lo agregado como visitante se suma al carrito que el usuario ya tenía"""
+
+    almacen = None
+
+    def test_fusion(self):
+        libros = crear_libros(2)
+        usuario = User.objects.create_user('cliente', password='clave')
+        carrito = Carrito.objects.create(usuario=usuario)
+        ItemCarrito.objects.create(carrito=carrito, libro=libros[0], cantidad=1)
+
+        with override_settings(TIENDA_CARRITO_ANONIMO=self.almacen):
+            self.client.post(reverse('agregar_al_carrito', args=[libros[0].pk]), {'cantidad': 2})
+            self.client.post(reverse('agregar_al_carrito', args=[libros[1].pk]), {'cantidad': 1})
+            self.client.login(username='cliente', password='clave')
+
+        self.assertEqual(
+            dict(carrito.items.values_list('libro_id', 'cantidad')), {libros[0].pk: 3, libros[1].pk: 1}
+        )
+        self.assertEqual(self.client.get(reverse('contador_carrito')).json()['cantidad_carrito'], 4)
+        # Las reservas del visitante pasaron al carrito del usuario
+        self.assertFalse(Reserva.objects.exclude(carrito=carrito).exists())
+        self.assertFalse(Carrito.objects.filter(usuario__isnull=True).exists())
+
+
+class FusionDesdeCarritoDeSesion(FusionAlIniciarSesion, TestCase):
+    almacen = 'sesion'
+
+
+class FusionDesdeCarritoBD(FusionAlIniciarSesion, TestCase):
+    almacen = 'bd'
+
+
+class CarritoBDConcurrente(TransactionTestCase):
+    """Cambios simultáneos del mismo carrito, cada uno con su conexión"""
+
+    def test_agregar_el_mismo_libro(self):
+        libro = crear_libros(1, stock=10)[0]
+        usuario = User.objects.create_user('cliente')
+        carrito = Carrito.objects.create(usuario=usuario)
+        inicio = threading.Barrier(4)
+        errores = []
+
+        def agregar():
+            try:
+                inicio.wait()
+                CarritoBD(None, usuario).agregar(libro, 1)
+            except Exception as error:
+                errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=agregar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        carrito.refresh_from_db()
+        self.assertEqual(carrito.items.get().cantidad, 4)
+        self.assertEqual(carrito.reservas.get().cantidad, 4)
+        self.assertEqual(carrito.cantidad_total, 4)
@@ -0,0 +1,160 @@
+"""
+Presupuesto de consultas SQL por vista.
+
+Cada vista debe ejecutar el mismo número de consultas con un carrito, un
+catálogo y un historial de 1, 10 y 100 elementos: una consulta por fila en
+una plantilla hace fallar la prueba en cuanto hay más de un elemento.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from tienda.busqueda import reconstruir_indice
+from tienda.models import Carrito, Categoria, ItemCarrito, ItemPedido, Libro, Pedido
+
+# Consultas de sesión y usuario que hace cualquier petición autenticada
+CONSULTAS_BASE = 2
+
+# Consultas de cada vista con el caché vacío, sin contar sesión ni autenticación.
+# Las páginas incluyen la consulta del menú de categorías de base.html, que el
+# índice comparte con su propia lista de categorías.
+PRESUPUESTO = {
+    'index': 4,
+    'index_busqueda': 4,
+    'detalle_libro': 4,
+    'ver_carrito': 3,
+    'checkout': 3,
+    'mis_pedidos': 3,
+    'detalle_pedido': 3,
+    'confirmacion_pedido': 3,
+    'panel_vendedor': 6,
+    'panel_vendedor_en_cache': 0,
+    'reportes_ventas': 3,
+    # Listados del admin: tamaño de la tabla, conteo y página
+    'admin_carritos': 3,
+    'admin_items_carrito': 3,
+    'admin_items_pedido': 3,
+    'admin_pedidos': 3,
+}
+
+
+class PresupuestoConsultas:
+    """Pruebas de presupuesto para un tamaño de datos; ver las subclases"""
+
+    tamano = None
+
+    @classmethod
+    def setUpTestData(cls):
+        tamano = cls.tamano
+        cls.usuario = User.objects.create_user('cliente', is_staff=True, is_superuser=True)
+        categorias = [Categoria.objects.create(nombre=f'Categoría {i}') for i in range(3)]
+        libros = Libro.objects.bulk_create([
+            Libro(
+                titulo=f'Libro de memoria {i}', autor='Autor', descripcion='Descripción',
+                precio=Decimal('10000'), categoria=categorias[i % 3], stock=500,
+            )
+            for i in range(tamano)
+        ])
+        carrito = Carrito.objects.create(usuario=cls.usuario)
+        ItemCarrito.objects.bulk_create([ItemCarrito(carrito=carrito, libro=libro, cantidad=1) for libro in libros])
+        carrito.recalcular_totales()
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(
+                usuario=cls.usuario, email='cliente@ejemplo.com', nombre_completo='Cliente',
+                telefono='123', direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+                subtotal=Decimal('10000'), total=Decimal('11900'),
+            )
+            for _ in range(tamano)
+        ])
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+            for pedido in pedidos for libro in libros[:3]
+        ])
+        reconstruir_indice()
+        cls.libro = libros[0]
+        cls.pedido = pedidos[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        # Primera lectura del contador del carrito, que luego queda en la sesión
+        self.client.get(reverse('contador_carrito'))
+
+    def assertConsultas(self, vista, url):
+        with self.assertNumQueries(CONSULTAS_BASE + PRESUPUESTO[vista]):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_index(self):
+        self.assertConsultas('index', reverse('index'))
+
+    def test_index_busqueda(self):
+        self.assertConsultas('index_busqueda', reverse('index') + '?busqueda=memoria')
+
+    def test_detalle_libro(self):
+        self.assertConsultas('detalle_libro', reverse('detalle_libro', args=[self.libro.pk]))
+
+    def test_ver_carrito(self):
+        self.assertConsultas('ver_carrito', reverse('ver_carrito'))
+
+    def test_checkout(self):
+        self.assertConsultas('checkout', reverse('checkout'))
+
+    def test_mis_pedidos(self):
+        self.assertConsultas('mis_pedidos', reverse('mis_pedidos'))
+
+    def test_detalle_pedido(self):
+        self.assertConsultas('detalle_pedido', reverse('detalle_pedido', args=[self.pedido.pk]))
+
+    def test_confirmacion_pedido(self):
+        self.assertConsultas('confirmacion_pedido', reverse('confirmacion_pedido', args=[self.pedido.pk]))
+
+    def test_panel_vendedor(self):
+        self.assertConsultas('panel_vendedor', reverse('panel_vendedor'))
+        # La segunda visita lee las estadísticas del caché
+        self.assertConsultas('panel_vendedor_en_cache', reverse('panel_vendedor'))
+
+    def test_reportes_ventas(self):
+        self.assertConsultas('reportes_ventas', reverse('reportes_ventas') + '?periodo=dia')
+
+    def test_admin(self):
+        listados = {
+            'admin_carritos': reverse('admin:tienda_carrito_changelist'),
+            'admin_items_carrito': reverse('admin:tienda_itemcarrito_changelist') + '?o=-5',
+            'admin_items_pedido': reverse('admin:tienda_itempedido_changelist') + '?o=-6',
+            'admin_pedidos': reverse('admin:tienda_pedido_changelist'),
+        }
+        for vista, url in listados.items():
+            with self.subTest(vista=vista):
+                self.assertConsultas(vista, url)
+
+    def test_menu_de_categorias(self):
+        # El menú de base.html se llena en todas las páginas, no solo en el índice
+        for url in (reverse('index'), reverse('ver_carrito'), reverse('detalle_libro', args=[self.libro.pk])):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), f'class="dropdown-item" href="{reverse("index")}?categoria=', 3)
+
+    def test_paginas_anonimas_en_cache(self):
+        # La segunda visita anónima se sirve del caché de páginas sin consultas
+        anonimo = Client()
+        for url in (reverse('index'), reverse('detalle_libro', args=[self.libro.pk])):
+            with self.subTest(url=url):
+                anonimo.get(url)
+                with self.assertNumQueries(0):
+                    anonimo.get(url)
+
+
+class PresupuestoConsultasUnElemento(PresupuestoConsultas, TestCase):
+    tamano = 1
+
+
+class PresupuestoConsultasDiezElementos(PresupuestoConsultas, TestCase):
+    tamano = 10
+
+
+class PresupuestoConsultasCienElementos(PresupuestoConsultas, TestCase):
+    tamano = 100
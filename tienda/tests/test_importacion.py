@@ -0,0 +1,61 @@
+"""
+Importación del catálogo: inserción o actualización por ISBN y rechazo por fila.
+"""
+
+import io
+from decimal import Decimal
+
+from django.test import TestCase
+
+from tienda.importacion import importar_libros, leer_csv, leer_jsonl
+from tienda.models import Categoria, Libro
+
+
+class ImportarLibros(TestCase):
+    def test_actualiza_por_isbn(self):
+        Libro.objects.create(
+            isbn='9780000000001', titulo='Título viejo', autor='Autor', descripcion='',
+            precio=Decimal('1000'), stock=1, categoria=Categoria.objects.create(nombre='Ensayo'),
+        )
+        archivo = io.StringIO(
+            'isbn,titulo,precio,stock,categoria\n'
+            '9780000000001,Título nuevo,25000.5,7,Novela\n'
+            '9780000000002,Otro libro,"12000",3,Novela\n'
+        )
+        resumen = importar_libros(leer_csv(archivo))
+
+        self.assertEqual((resumen['guardadas'], resumen['rechazadas']), (2, 0))
+        self.assertEqual(Libro.objects.count(), 2)
+        libro = Libro.objects.get(isbn='9780000000001')
+        self.assertEqual((libro.titulo, libro.precio, libro.stock), ('Título nuevo', Decimal('25000.50'), 7))
+        self.assertEqual(libro.categoria.nombre, 'Novela')
+
+    def test_rechaza_filas_invalidas(self):
+        archivo = io.StringIO(
+            'isbn,titulo,precio\n'
+            '9780000000001,Sin precio,\n'
+            '9780000000002,Precio NaN,NaN\n'
+            '9780000000003,Válido,1000\n'
+        )
+        resumen = importar_libros(leer_csv(archivo))
+
+        self.assertEqual((resumen['leidas'], resumen['guardadas'], resumen['rechazadas']), (3, 1, 2))
+        self.assertEqual(len(resumen['errores']), 2)
+        self.assertTrue(resumen['errores'][0].startswith('fila 1: precio inválido'))
+        self.assertEqual(list(Libro.objects.values_list('isbn', flat=True)), ['9780000000003'])
+
+    def test_lineas_jsonl_invalidas(self):
+        archivo = io.StringIO(
+            '{"isbn": "9780000000001", "titulo": "Primero", "precio": 1000}\n'
+            '{malo\n'
+            '\n'
+            '[1, 2]\n'
+            '{"isbn": "9780000000002", "titulo": "Segundo", "precio": "2000"}\n'
+        )
+        # Lotes de un libro: el primero ya está guardado cuando llegan las líneas malas
+        resumen = importar_libros(leer_jsonl(archivo), tamano_lote=1)
+
+        self.assertEqual((resumen['guardadas'], resumen['rechazadas']), (2, 2))
+        self.assertIn('línea 2: JSON inválido', resumen['errores'][0])
+        self.assertIn('línea 4: se esperaba un objeto JSON', resumen['errores'][1])
+        self.assertEqual(Libro.objects.count(), 2)
@@ -0,0 +1,102 @@
+"""
+Limpieza de carritos abandonados y sesiones vencidas (``limpiar_carritos``).
+"""
+
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from tienda.limpieza import carritos_abandonados, limpiar_sesiones
+from tienda.models import Carrito, Categoria, ItemCarrito, Libro, Reserva
+
+# Vida de la sesión de las pruebas: dos semanas, la de Django por defecto
+DOS_SEMANAS = 14 * 24 * 3600
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.db', SESSION_COOKIE_AGE=DOS_SEMANAS,
+    TIENDA_CARRITO_INACTIVO_DIAS=30, TIENDA_CARRITO_USUARIO_INACTIVO_DIAS=180,
+)
+class LimpiarCarritos(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.libro = Libro.objects.create(
+            titulo='Libro', autor='Autor', descripcion='Descripción', precio=Decimal('10000'),
+            categoria=Categoria.objects.create(nombre='Novela'), stock=50,
+        )
+        cls.ahora = timezone.now()
+
+    def sesion(self, vigente=True):
+        clave = get_random_string(32)
+        expira = self.ahora + (timedelta(days=7) if vigente else timedelta(days=-1))
+        Session.objects.create(session_key=clave, session_data=SessionStore().encode({}), expire_date=expira)
+        return clave
+
+    def carrito(self, dias, session_key=None, usuario=None, reserva_vigente=False):
+        """Carrito con un item, sin cambios desde hace ``dias``"""
+        carrito = Carrito.objects.create(session_key=session_key, usuario=usuario)
+        ItemCarrito.objects.create(carrito=carrito, libro=self.libro, cantidad=1)
+        if reserva_vigente:
+            Reserva.objects.create(
+                carrito=carrito, libro=self.libro, cantidad=1, fecha_expiracion=self.ahora + timedelta(minutes=10)
+            )
+        # fecha_actualizacion es auto_now: solo update() la deja en el pasado
+        Carrito.objects.filter(pk=carrito.pk).update(fecha_actualizacion=self.ahora - timedelta(days=dias))
+        return carrito.pk
+
+    def test_casos(self):
+        conservar = {
+            'anónimo reciente': self.carrito(2, self.sesion()),
+            'sin sesión recién creado': self.carrito(0.01, 'sin-sesion-1'),
+            'usuario reciente': self.carrito(40, usuario=User.objects.create_user('reciente')),
+            'anónimo inactivo con reserva vigente': self.carrito(40, self.sesion(), reserva_vigente=True),
+            'sin sesión con reserva vigente': self.carrito(2, 'sin-sesion-2', reserva_vigente=True),
+        }
+        eliminar = {
+            'anónimo inactivo': self.carrito(40, self.sesion()),
+            'sesión vencida': self.carrito(2, self.sesion(vigente=False)),
+            'sin sesión': self.carrito(2, 'sin-sesion-3'),
+            'usuario inactivo': self.carrito(200, usuario=User.objects.create_user('inactivo')),
+        }
+
+        call_command('limpiar_carritos', lote=2, stdout=io.StringIO())
+
+        quedan = set(Carrito.objects.values_list('pk', flat=True))
+        for caso, pk in conservar.items():
+            with self.subTest(caso=caso):
+                self.assertIn(pk, quedan)
+        for caso, pk in eliminar.items():
+            with self.subTest(caso=caso):
+                self.assertNotIn(pk, quedan)
+        self.assertFalse(ItemCarrito.objects.exclude(carrito__in=quedan).exists())
+        self.assertFalse(Session.objects.filter(expire_date__lt=self.ahora).exists())
+        self.assertEqual(Session.objects.count(), 3)
+
+    def test_nunca_dentro_de_la_vida_de_la_sesion(self):
+        # Con menos días que SESSION_COOKIE_AGE manda la vida de la sesión
+        dentro = self.carrito(10, self.sesion())
+        fuera = self.carrito(15, self.sesion())
+        abandonados = set(carritos_abandonados(dias=1, dias_usuarios=1).values_list('pk', flat=True))
+        self.assertEqual(abandonados, {fuera})
+        self.assertNotIn(dentro, abandonados)
+
+    def test_solo_contar(self):
+        self.carrito(40, self.sesion(vigente=False))
+        call_command('limpiar_carritos', solo_contar=True, stdout=io.StringIO())
+        self.assertEqual((Carrito.objects.count(), Session.objects.count()), (1, 1))
+
+    def test_sesiones_vencidas_por_lotes(self):
+        vigentes = {self.sesion() for _ in range(3)}
+        for _ in range(5):
+            self.sesion(vigente=False)
+        resultado = limpiar_sesiones(lote=2)
+        self.assertEqual((resultado.total, resultado.lotes), (5, 3))
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)), vigentes)
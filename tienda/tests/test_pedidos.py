@@ -0,0 +1,123 @@
+"""
+Confirmación de pedidos: el stock nunca se vende dos veces y un pedido que no
+se puede completar no deja filas ni descuenta stock.
+"""
+
+import threading
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from tienda.models import IVA, Carrito, Categoria, ItemCarrito, ItemPedido, Libro, Pedido
+from tienda.pedidos import CarritoVacio, StockInsuficiente, confirmar_pedido
+
+
+def crear_libro(titulo, stock):
+    categoria, _ = Categoria.objects.get_or_create(nombre='Novela')
+    return Libro.objects.create(
+        titulo=titulo, autor='Autor', descripcion='Descripción',
+        precio=Decimal('20000'), categoria=categoria, stock=stock,
+    )
+
+
+def crear_carrito(clave, cantidades):
+    """Carrito anónimo con ``cantidades`` ({libro: cantidad})"""
+    carrito = Carrito.objects.create(session_key=clave)
+    ItemCarrito.objects.bulk_create([
+        ItemCarrito(carrito=carrito, libro=libro, cantidad=cantidad) for libro, cantidad in cantidades.items()
+    ])
+    carrito.recalcular_totales()
+    return carrito
+
+
+def nuevo_pedido():
+    return Pedido(
+        email='cliente@ejemplo.com', nombre_completo='Cliente', telefono='123',
+        direccion='Calle 1', ciudad='Bogotá', metodo_pago='pse',
+    )
+
+
+class ConfirmarPedido(TestCase):
+    def test_descuenta_stock_y_vacia_el_carrito(self):
+        libro = crear_libro('Uno', stock=5)
+        carrito = crear_carrito('comprador', {libro: 2})
+
+        pedido = confirmar_pedido(nuevo_pedido(), carrito)
+
+        libro.refresh_from_db()
+        self.assertEqual(libro.stock, 3)
+        self.assertEqual(pedido.total, Decimal('40000') * (1 + IVA))
+        self.assertEqual(list(pedido.items.values_list('libro_id', 'cantidad')), [(libro.pk, 2)])
+        self.assertFalse(carrito.items.exists())
+
+    def test_carrito_vacio(self):
+        carrito = Carrito.objects.create(session_key='vacio')
+        with self.assertRaises(CarritoVacio):
+            confirmar_pedido(nuevo_pedido(), carrito)
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_stock_insuficiente_en_una_linea(self):
+        alcanza = crear_libro('Alcanza', stock=5)
+        falta = crear_libro('Falta', stock=1)
+        carrito = crear_carrito('comprador', {alcanza: 1, falta: 2})
+
+        with self.assertRaises(StockInsuficiente) as error:
+            confirmar_pedido(nuevo_pedido(), carrito)
+
+        self.assertEqual(error.exception.libros, [falta])
+        self.assertFalse(Pedido.objects.exists())
+        self.assertFalse(ItemPedido.objects.exists())
+        # Ninguna línea descuenta stock, tampoco la que alcanzaba
+        self.assertEqual(
+            dict(Libro.objects.values_list('pk', 'stock')), {alcanza.pk: 5, falta.pk: 1}
+        )
+        self.assertEqual(carrito.items.count(), 2)
+
+
+class ConfirmarPedidoConcurrente(TransactionTestCase):
+    """Compradores que confirman a la vez, cada uno con su conexión"""
+
+    def _en_paralelo(self, carritos):
+        """Confirma cada carrito en un hilo; devuelve el resultado o la excepción de cada uno"""
+        inicio = threading.Barrier(len(carritos))
+        resultados = [None] * len(carritos)
+
+        def confirmar(numero, carrito):
+            try:
+                inicio.wait()
+                resultados[numero] = confirmar_pedido(nuevo_pedido(), carrito)
+            except Exception as error:
+                resultados[numero] = error
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=confirmar, args=(n, c)) for n, c in enumerate(carritos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_ultima_unidad(self):
+        libro = crear_libro('Última unidad', stock=1)
+        carritos = [crear_carrito(f'comprador{numero}', {libro: 1}) for numero in range(2)]
+
+        resultados = self._en_paralelo(carritos)
+
+        self.assertEqual(sorted(type(r).__name__ for r in resultados), ['Pedido', 'StockInsuficiente'])
+        libro.refresh_from_db()
+        self.assertEqual(libro.stock, 0)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(ItemPedido.objects.count(), 1)
+
+    def test_mismo_carrito_dos_veces(self):
+        libro = crear_libro('Doble envío', stock=10)
+        carrito = crear_carrito('comprador', {libro: 2})
+
+        resultados = self._en_paralelo([carrito, Carrito.objects.get(pk=carrito.pk)])
+
+        self.assertEqual(sorted(type(r).__name__ for r in resultados), ['CarritoVacio', 'Pedido'])
+        libro.refresh_from_db()
+        self.assertEqual(libro.stock, 8)
+        self.assertEqual(Pedido.objects.count(), 1)
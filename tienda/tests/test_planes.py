@@ -0,0 +1,144 @@
+"""
+Planes de ejecución de las consultas de las vistas.
+
+Con un catálogo, un historial de pedidos y carritos de tamaño realista y las
+estadísticas de ANALYZE al día, ninguna consulta de las vistas de la tienda ni
+de los listados del admin puede recorrer completa una tabla grande (``SCAN
+tabla`` sin índice en SQLite, ``Seq Scan`` en PostgreSQL).
+"""
+
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tienda.busqueda import reconstruir_indice
+from tienda.models import Carrito, Categoria, ItemCarrito, ItemPedido, Libro, Pedido
+from tienda.ventas_diarias import reconstruir
+
+TABLAS_GRANDES = ['tienda_libro', 'tienda_pedido', 'tienda_itempedido', 'tienda_carrito', 'tienda_itemcarrito']
+
+PALABRAS = ['amor', 'guerra', 'historia', 'ciudad', 'noche', 'mar', 'sombra', 'tiempo', 'memoria', 'camino']
+
+
+def plan_de(cursor, vendor, sql):
+    """Líneas del plan de ejecución de una consulta"""
+    if vendor == 'sqlite':
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [fila[-1] for fila in cursor.fetchall()]
+    cursor.execute(f'EXPLAIN {sql}')
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def recorridos_completos(plan, vendor):
+    """Tablas grandes que el plan recorre completas"""
+    if vendor == 'sqlite':
+        patron = re.compile(r'^SCAN (\w+)$')
+    else:
+        patron = re.compile(r'Seq Scan on (\w+)')
+    tablas = []
+    for linea in plan:
+        encontrado = patron.search(linea.strip())
+        if encontrado and encontrado.group(1) in TABLAS_GRANDES:
+            tablas.append(encontrado.group(1))
+    return tablas
+
+
+class PlanesDeEjecucion(TestCase):
+    libros = 5000
+    pedidos = 5000
+    carritos = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        aleatorio = random.Random(42)
+        ahora = timezone.now()
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(20)])
+        libros = Libro.objects.bulk_create([
+            Libro(
+                titulo=' '.join(aleatorio.sample(PALABRAS, 3)).capitalize(), autor='Autor',
+                descripcion='Descripción', precio=Decimal(aleatorio.randint(10, 200) * 1000),
+                categoria=categorias[i % len(categorias)], stock=aleatorio.randint(0, 50),
+                isbn=f'978{i:010d}',
+            )
+            for i in range(cls.libros)
+        ])
+
+        cls.usuario = User.objects.create_user('cliente', is_staff=True, is_superuser=True)
+        carrito = Carrito.objects.create(usuario=cls.usuario)
+        ItemCarrito.objects.bulk_create([ItemCarrito(carrito=carrito, libro=libro) for libro in libros[:100]])
+        carrito.recalcular_totales()
+
+        # Pedidos del cliente y de visitantes, repartidos en dos años
+        estados = ['pendiente', 'procesando', 'enviado', 'entregado', 'entregado', 'cancelado']
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(
+                usuario=cls.usuario if i < 100 else None, email='cliente@ejemplo.com',
+                nombre_completo='Cliente', telefono='123', direccion='Calle 1', ciudad='Bogotá',
+                metodo_pago='pse', estado=aleatorio.choice(estados),
+                subtotal=Decimal('10000'), total=Decimal('11900'),
+            )
+            for i in range(cls.pedidos)
+        ])
+        for pedido in pedidos:
+            pedido.fecha_creacion = ahora - timedelta(seconds=aleatorio.randrange(730 * 86400))
+        Pedido.objects.bulk_update(pedidos, ['fecha_creacion'], batch_size=1000)
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=pedido, libro=libro, cantidad=1, precio_unitario=libro.precio)
+            for pedido in pedidos for libro in aleatorio.sample(libros[:500], 2)
+        ])
+
+        carritos = Carrito.objects.bulk_create([
+            Carrito(session_key=f'sesion{i:034d}') for i in range(cls.carritos)
+        ])
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=anonimo, libro=libro, cantidad=1)
+            for anonimo in carritos for libro in aleatorio.sample(libros, 3)
+        ])
+
+        reconstruir_indice()
+        reconstruir()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.libro = libros[0]
+        cls.pedido = pedidos[0]
+        cls.categoria = categorias[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_sin_recorridos_completos(self):
+        urls = {
+            'index': reverse('index'),
+            'index_categoria': reverse('index') + f'?categoria={self.categoria.pk}',
+            'index_busqueda': reverse('index') + '?busqueda=memoria',
+            'detalle_libro': reverse('detalle_libro', args=[self.libro.pk]),
+            'ver_carrito': reverse('ver_carrito'),
+            'checkout': reverse('checkout'),
+            'mis_pedidos': reverse('mis_pedidos'),
+            'detalle_pedido': reverse('detalle_pedido', args=[self.pedido.pk]),
+            'panel_vendedor': reverse('panel_vendedor'),
+            'reportes_ventas': reverse('reportes_ventas'),
+            'admin_libros': reverse('admin:tienda_libro_changelist'),
+            'admin_pedidos': reverse('admin:tienda_pedido_changelist'),
+            'admin_pedidos_estado': reverse('admin:tienda_pedido_changelist') + '?estado__exact=pendiente',
+        }
+        with connection.cursor() as cursor:
+            for vista, url in urls.items():
+                with self.subTest(vista=vista):
+                    with CaptureQueriesContext(connection) as consultas:
+                        respuesta = self.client.get(url)
+                    self.assertEqual(respuesta.status_code, 200)
+                    selects = [c['sql'] for c in consultas if c['sql'].lstrip().upper().startswith('SELECT')]
+                    for sql in selects:
+                        tablas = recorridos_completos(plan_de(cursor, connection.vendor, sql), connection.vendor)
+                        self.assertEqual(tablas, [], f'{vista} recorre {", ".join(tablas)} en {sql}')
@@ -0,0 +1,85 @@
+"""
+Reservas temporales de stock: las de otros carritos restan unidades, las
+vencidas dejan de contar y el contador en caché sigue a cada reserva.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tienda.cache_paginas import marcas_libro
+from tienda.models import Carrito, Categoria, Libro, Reserva
+from tienda.pedidos import StockInsuficiente
+from tienda.reservas import liberar, liberar_expiradas, reservar, unidades_disponibles
+
+
+class Reservas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.libro = Libro.objects.create(
+            titulo='Libro', autor='Autor', descripcion='Descripción', precio=Decimal('10000'),
+            categoria=Categoria.objects.create(nombre='Novela'), stock=5,
+        )
+        cls.carrito = Carrito.objects.create(session_key='propio')
+        cls.otro = Carrito.objects.create(session_key='otro')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reservas_de_otros_carritos(self):
+        reservar(self.otro, self.libro, 3)
+        cache.clear()
+        self.assertEqual(unidades_disponibles(self.libro), 2)
+        with self.assertRaises(StockInsuficiente):
+            reservar(self.carrito, self.libro, 3)
+        reservar(self.carrito, self.libro, 2)
+        self.assertEqual(unidades_disponibles(self.libro), 0)
+
+    def test_renovar_reemplaza_la_cantidad(self):
+        reservar(self.carrito, self.libro, 2)
+        reservar(self.carrito, self.libro, 4)
+        self.assertEqual(Reserva.objects.get(carrito=self.carrito).cantidad, 4)
+
+    @override_settings(TIENDA_RESERVA_MINUTOS=15)
+    def test_reserva_vencida(self):
+        reservar(self.otro, self.libro, 5)
+        Reserva.objects.update(fecha_expiracion=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+
+        # Vencida ya no aparta unidades, aunque liberar_reservas no haya corrido
+        self.assertEqual(unidades_disponibles(self.libro), 5)
+        reservar(self.carrito, self.libro, 5)
+
+        self.assertEqual(liberar_expiradas(), 1)
+        vigente = Reserva.objects.get()
+        self.assertEqual(vigente.carrito, self.carrito)
+        self.assertAlmostEqual(
+            vigente.fecha_expiracion, timezone.now() + timedelta(minutes=15), delta=timedelta(minutes=1)
+        )
+
+    def test_contador_en_cache(self):
+        self.assertEqual(unidades_disponibles(self.libro), 5)
+        reservar(self.carrito, self.libro, 2)
+        # reservar deja el contador nuevo en el caché
+        with self.assertNumQueries(0):
+            self.assertEqual(unidades_disponibles(self.libro), 3)
+
+        liberar(self.carrito)
+        self.assertEqual(unidades_disponibles(self.libro), 5)
+
+    @override_settings(TIENDA_POCAS_UNIDADES=2)
+    def test_purga_el_detalle_solo_si_cambia_lo_que_muestra(self):
+        unidades_disponibles(self.libro)
+        antes = marcas_libro(self.libro.pk)
+        # De 5 a 4 unidades el detalle sigue diciendo "Disponible"
+        reservar(self.otro, self.libro, 1)
+        self.assertEqual(marcas_libro(self.libro.pk), antes)
+        # Con 2 o menos muestra la cifra, y al llegar a cero, "Agotado"
+        reservar(self.carrito, self.libro, 2)
+        self.assertNotEqual(marcas_libro(self.libro.pk), antes)
+        antes = marcas_libro(self.libro.pk)
+        reservar(self.carrito, self.libro, 4)
+        self.assertNotEqual(marcas_libro(self.libro.pk), antes)
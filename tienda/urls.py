@@ -1,15 +1,23 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Páginas principales
     path('', views.index, name='index'),
     path('libro/<int:libro_id>/', views.detalle_libro, name='detalle_libro'),
     
+    # API del catálogo
+    path('api/v1/libros/', api.libros, name='api_v1_libros'),
+    path('api/v1/libros/<int:libro_id>/', api.libro, name='api_v1_libro'),
+    path('api/v1/categorias/', api.categorias, name='api_v1_categorias'),
+    path('api/v1/categorias/<int:categoria_id>/', api.categoria, name='api_v1_categoria'),
+    
     # Carrito de compras
     path('carrito/', views.ver_carrito, name='ver_carrito'),
+    path('carrito/contador/', views.contador_carrito, name='contador_carrito'),
     path('agregar-carrito/<int:libro_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
     path('actualizar-carrito/<int:item_id>/', views.actualizar_carrito, name='actualizar_carrito'),
+    path('carrito/actualizar/', views.actualizar_carrito_lote, name='actualizar_carrito_lote'),
     path('eliminar-carrito/<int:item_id>/', views.eliminar_del_carrito, name='eliminar_del_carrito'),
     
     # Proceso de compra
@@ -23,5 +31,6 @@ urlpatterns = [
     # Panel del vendedor
     path('vendedor/', views.panel_vendedor, name='panel_vendedor'),
     path('vendedor/reportes/', views.reportes_ventas, name='reportes_ventas'),
+    path('vendedor/exportar/<str:datos>.<str:formato>', views.exportar, name='exportar'),
 ]
 
@@ -0,0 +1,114 @@
+"""
+Resumen diario de ventas (VentaDiaria).
+
+Los reportes y el panel del vendedor leen de esta tabla en lugar de agrupar
+todos los pedidos en cada petición. Cada cambio en un pedido o en sus items
+marca su día como pendiente (ver signals.py) y ``actualizar_pendientes``
+recalcula solo esos días; ``reconstruir`` rehace el rango completo.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ItemPedido, Pedido, VentaDiaria, VentaDiariaPendiente
+from .panel import WIDGETS_VENTAS, olvidar_widgets
+from .reportes import ESTADOS_VENTA, como_datetime, pedidos_vendidos
+
+
+DIAS_POR_LOTE = 31
+
+
+def marcar_dia(fecha_creacion):
+    """Marca como pendiente el día local de un pedido, sin duplicar marcas"""
+    dia = timezone.localdate(fecha_creacion) if timezone.is_aware(fecha_creacion) else fecha_creacion.date()
+    VentaDiariaPendiente.objects.bulk_create(
+        [VentaDiariaPendiente(fecha=dia)], ignore_conflicts=True
+    )
+
+
+def _filas_del_rango(desde, hasta):
+    """Construye las filas de VentaDiaria para los días en [desde, hasta)"""
+    filas = [
+        VentaDiaria(fecha=dia['dia'], pedidos=dia['pedidos'], total=dia['total'])
+        for dia in (
+            pedidos_vendidos(desde, hasta)
+            .annotate(dia=TruncDate('fecha_creacion'))
+            .values('dia')
+            .annotate(pedidos=Count('id'), total=Sum('total'))
+            .order_by()
+        )
+    ]
+    libros = (
+        ItemPedido.objects.filter(
+            pedido__fecha_creacion__gte=como_datetime(desde),
+            pedido__fecha_creacion__lt=como_datetime(hasta),
+            pedido__estado__in=ESTADOS_VENTA,
+        )
+        .annotate(dia=TruncDate('pedido__fecha_creacion'))
+        .values('dia', 'libro_id', 'libro__categoria_id')
+        .annotate(
+            pedidos=Count('pedido_id', distinct=True),
+            unidades=Sum('cantidad'),
+            ingresos=Sum(F('cantidad') * F('precio_unitario')),
+        )
+        .order_by()
+    )
+    filas.extend(
+        VentaDiaria(
+            fecha=fila['dia'],
+            libro_id=fila['libro_id'],
+            categoria_id=fila['libro__categoria_id'],
+            pedidos=fila['pedidos'],
+            unidades=fila['unidades'],
+            ingresos=fila['ingresos'],
+        )
+        for fila in libros
+    )
+    return filas
+
+
+def recalcular_rango(desde, hasta):
+    """Reemplaza el resumen de los días en [desde, hasta); devuelve las filas escritas"""
+    filas = _filas_del_rango(desde, hasta)
+    with transaction.atomic():
+        VentaDiaria.objects.filter(fecha__gte=desde, fecha__lt=hasta).delete()
+        VentaDiaria.objects.bulk_create(filas, batch_size=1000)
+    # Dentro de otra transacción, los widgets se olvidan cuando esta confirma
+    transaction.on_commit(lambda: olvidar_widgets(WIDGETS_VENTAS))
+    return len(filas)
+
+
+def actualizar_pendientes():
+    """Recalcula los días marcados como pendientes; devuelve los días procesados"""
+    dias = list(VentaDiariaPendiente.objects.order_by('fecha').values_list('fecha', flat=True))
+    for dia in dias:
+        # La marca se borra antes de recalcular: un cambio posterior la vuelve a crear.
+        # Si el recálculo falla, la marca vuelve con el rollback y el día queda pendiente.
+        with transaction.atomic():
+            VentaDiariaPendiente.objects.filter(fecha=dia).delete()
+            recalcular_rango(dia, dia + timedelta(days=1))
+    return dias
+
+
+def reconstruir():
+    """Rehace el resumen completo por lotes de días; devuelve las filas escritas"""
+    primero = Pedido.objects.aggregate(primero=Min('fecha_creacion'))['primero']
+    VentaDiariaPendiente.objects.all().delete()
+    if primero is None:
+        VentaDiaria.objects.all().delete()
+        olvidar_widgets(WIDGETS_VENTAS)
+        return 0
+
+    desde = timezone.localdate(primero)
+    fin = timezone.localdate() + timedelta(days=1)
+    VentaDiaria.objects.exclude(fecha__gte=desde, fecha__lt=fin).delete()
+    escritas = 0
+    while desde < fin:
+        hasta = min(desde + timedelta(days=DIAS_POR_LOTE), fin)
+        escritas += recalcular_rango(desde, hasta)
+        desde = hasta
+    return escritas
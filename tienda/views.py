@@ -1,175 +1,241 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-from django.db import transaction, models
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
-from decimal import Decimal
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlencode
 import json
 
-from .models import Libro, Categoria, Carrito, ItemCarrito, Pedido, ItemPedido
+from .models import Libro, Pedido
 from .forms import PedidoForm
+from .busqueda import buscar_libros
+from .carrito import obtener_carrito, recordar_cantidad, aagregar_libro, acambiar_cantidades, acantidad_en_carrito
+from .pedidos import CarritoVacio, StockInsuficiente
+from .reservas import aunidades_disponibles, pocas_unidades, unidades_disponibles
+from .reportes import leer_rango, reporte_ventas
+from . import exportacion
+from .paginacion import contar_en_cache, paginar_por_cursor, paginar_por_desplazamiento
+from .panel import estadisticas_panel
+from .fragmentos import estadisticas_fragmentos
+from .cache_paginas import cache_anonimo, marcas_catalogo, marcas_libro
 
 
-def obtener_o_crear_carrito(request):
-    """Obtiene el carrito del usuario o crea uno nuevo"""
-    if request.user.is_authenticated:
-        carrito, created = Carrito.objects.get_or_create(usuario=request.user)
-    else:
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        carrito, created = Carrito.objects.get_or_create(session_key=session_key)
-    return carrito
+# Máximo de items por petición a actualizar_carrito_lote
+MAXIMO_CAMBIOS_CARRITO = 100
+
+
+def _metodos_async(*metodos):
+    """require_http_methods para vistas asíncronas (el de Django 4.2 solo envuelve vistas síncronas)"""
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                return HttpResponseNotAllowed(metodos)
+            return await vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+async def _aobtener_o_404(queryset, **filtros):
+    try:
+        return await queryset.aget(**filtros)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'{queryset.model._meta.verbose_name} no encontrado')
 
 
+def _catalogo(categoria_id, busqueda):
+    """Libros visibles en la tienda, filtrados por categoría y búsqueda"""
+    libros = Libro.objects.filter(activo=True, stock__gt=0).select_related('categoria')
+    if categoria_id:
+        libros = libros.filter(categoria_id=categoria_id)
+    if busqueda:
+        libros = buscar_libros(libros, busqueda)
+    return libros
+
+
+def _paginar_catalogo(request, libros, busqueda, por_pagina):
+    """Pagina por cursor, o por número si la búsqueda ordena por relevancia"""
+    if busqueda:
+        return paginar_por_desplazamiento(libros, por_pagina, request.GET.get('page'))
+    return paginar_por_cursor(
+        libros, por_pagina,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+    )
+
+
+@cache_anonimo(marcas_catalogo)
 def index(request):
     """Página principal con catálogo de libros"""
-    categorias = Categoria.objects.all()
-    libros_destacados = Libro.objects.filter(activo=True, stock__gt=0)[:8]
+    libros_destacados = Libro.objects.filter(activo=True, stock__gt=0).select_related('categoria')[:8]
     
     # Filtros
     categoria_id = request.GET.get('categoria')
     busqueda = request.GET.get('busqueda')
-    
-    libros = Libro.objects.filter(activo=True, stock__gt=0)
-    
-    if categoria_id:
-        libros = libros.filter(categoria_id=categoria_id)
-    
-    if busqueda:
-        libros = libros.filter(
-            models.Q(titulo__icontains=busqueda) | 
-            models.Q(autor__icontains=busqueda)
-        )
-    
-    # Paginación
-    paginator = Paginator(libros, 12)
-    page_number = request.GET.get('page')
-    libros_paginados = paginator.get_page(page_number)
-    
-    # Obtener carrito para mostrar cantidad
-    carrito = obtener_o_crear_carrito(request)
+    libros = _catalogo(categoria_id, busqueda)
     
     context = {
         'libros_destacados': libros_destacados,
-        'libros': libros_paginados,
-        'categorias': categorias,
+        'libros': _paginar_catalogo(request, libros, busqueda, 12),
+        'total_libros': contar_en_cache(libros),
         'categoria_actual': categoria_id,
         'busqueda_actual': busqueda,
-        'cantidad_carrito': carrito.cantidad_total,
     }
     return render(request, 'tienda/index.html', context)
 
 
+@cache_anonimo(marcas_libro)
 def detalle_libro(request, libro_id):
     """Detalle de un libro específico"""
-    libro = get_object_or_404(Libro, id=libro_id, activo=True)
+    libro = get_object_or_404(Libro.objects.select_related('categoria'), id=libro_id, activo=True)
     libros_relacionados = Libro.objects.filter(
         categoria=libro.categoria, 
         activo=True, 
         stock__gt=0
     ).exclude(id=libro_id)[:4]
     
-    carrito = obtener_o_crear_carrito(request)
-    
     context = {
         'libro': libro,
         'libros_relacionados': libros_relacionados,
-        'cantidad_carrito': carrito.cantidad_total,
+        'unidades_disponibles': unidades_disponibles(libro),
+        'pocas_unidades': pocas_unidades(),
     }
     return render(request, 'tienda/detalle_libro.html', context)
 
 
-@require_POST
-def agregar_al_carrito(request, libro_id):
+@_metodos_async('POST')
+async def agregar_al_carrito(request, libro_id):
     """Agrega un libro al carrito"""
-    libro = get_object_or_404(Libro, id=libro_id, activo=True)
+    libro = await _aobtener_o_404(Libro.objects.all(), id=libro_id, activo=True)
     cantidad = int(request.POST.get('cantidad', 1))
     
     if cantidad <= 0:
         return JsonResponse({'error': 'La cantidad debe ser mayor a 0'}, status=400)
     
-    if cantidad > libro.stock:
+    # Rechazo rápido con el contador en caché, sin tocar la fila del libro
+    if cantidad > await aunidades_disponibles(libro):
         return JsonResponse({'error': 'No hay suficiente stock disponible'}, status=400)
     
-    carrito = obtener_o_crear_carrito(request)
-    item, created = ItemCarrito.objects.get_or_create(
-        carrito=carrito,
-        libro=libro,
-        defaults={'cantidad': cantidad}
-    )
-    
-    if not created:
-        item.cantidad += cantidad
-        if item.cantidad > libro.stock:
-            return JsonResponse({'error': 'No hay suficiente stock disponible'}, status=400)
-        item.save()
+    try:
+        resumen = await aagregar_libro(request, libro, cantidad)
+    except StockInsuficiente:
+        return JsonResponse({'error': 'No hay suficiente stock disponible'}, status=400)
     
     return JsonResponse({
         'success': True,
         'mensaje': f'{libro.titulo} agregado al carrito',
-        'cantidad_carrito': carrito.cantidad_total
+        'cantidad_carrito': resumen['cantidad_carrito']
     })
 
 
 def ver_carrito(request):
     """Muestra el contenido del carrito"""
-    carrito = obtener_o_crear_carrito(request)
-    items = carrito.items.all()
+    carrito = obtener_carrito(request)
     
     context = {
         'carrito': carrito,
-        'items': items,
-        'cantidad_carrito': carrito.cantidad_total,
+        'items': carrito.items(),
     }
     return render(request, 'tienda/carrito.html', context)
 
 
-@require_POST
-def actualizar_carrito(request, item_id):
+@_metodos_async('GET')
+async def contador_carrito(request):
+    """Cantidad de libros en el carrito, para refrescar el badge sin cargar la página
+
+    También entrega la cookie CSRF, que las páginas en caché no pueden incluir.
+    """
+    # Lo mismo que ensure_csrf_cookie, que en Django 4.2 no envuelve vistas asíncronas
+    get_token(request)
+    return JsonResponse({'cantidad_carrito': await acantidad_en_carrito(request)})
+
+
+@_metodos_async('POST')
+async def actualizar_carrito(request, item_id):
     """Actualiza la cantidad de un item en el carrito"""
-    item = get_object_or_404(ItemCarrito, id=item_id)
     nueva_cantidad = int(request.POST.get('cantidad', 1))
-    
-    if nueva_cantidad <= 0:
-        item.delete()
-        return JsonResponse({'success': True, 'mensaje': 'Item eliminado del carrito'})
-    
-    if nueva_cantidad > item.libro.stock:
+    try:
+        cambiados, _, resumen = await acambiar_cantidades(request, {item_id: nueva_cantidad})
+    except StockInsuficiente:
         return JsonResponse({'error': 'No hay suficiente stock disponible'}, status=400)
     
-    item.cantidad = nueva_cantidad
-    item.save()
+    if nueva_cantidad <= 0:
+        return JsonResponse({
+            'success': True,
+            'mensaje': 'Item eliminado del carrito',
+            'total': resumen['total'],
+            'cantidad_carrito': resumen['cantidad_carrito']
+        })
+    if not cambiados:
+        raise Http404('Item no encontrado en el carrito')
     
     return JsonResponse({
         'success': True,
-        'subtotal': float(item.subtotal),
-        'total': float(item.carrito.total)
+        'subtotal': float(cambiados[0].subtotal),
+        'total': resumen['total'],
+        'cantidad_carrito': resumen['cantidad_carrito']
     })
 
 
-@require_POST
-def eliminar_del_carrito(request, item_id):
+@_metodos_async('POST')
+async def actualizar_carrito_lote(request):
+    """Aplica varios cambios de cantidad del carrito en una sola petición
+
+    Recibe JSON ``{"cambios": [{"item_id": 1, "cantidad": 3}, ...]}``; una
+    cantidad de 0 elimina el item. Si algún libro no tiene stock suficiente no
+    se aplica ningún cambio.
+    """
+    try:
+        cambios = json.loads(request.body)['cambios']
+        cantidades = {int(cambio['item_id']): int(cambio['cantidad']) for cambio in cambios}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {'error': 'Se espera {"cambios": [{"item_id": ..., "cantidad": ...}]}'}, status=400
+        )
+    if not cantidades or len(cantidades) > MAXIMO_CAMBIOS_CARRITO:
+        return JsonResponse(
+            {'error': f'Se aceptan entre 1 y {MAXIMO_CAMBIOS_CARRITO} cambios por petición'}, status=400
+        )
+
+    try:
+        items, eliminados, resumen = await acambiar_cantidades(request, cantidades)
+    except StockInsuficiente as error:
+        return JsonResponse({
+            'error': str(error),
+            'libros_sin_stock': [libro.pk for libro in error.libros],
+        }, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'items': [
+            {'item_id': item.id, 'cantidad': item.cantidad, 'subtotal': float(item.subtotal)}
+            for item in items
+        ],
+        'eliminados': eliminados,
+        **resumen,
+    })
+
+
+@_metodos_async('POST')
+async def eliminar_del_carrito(request, item_id):
     """Elimina un item del carrito"""
-    item = get_object_or_404(ItemCarrito, id=item_id)
-    item.delete()
+    _, _, resumen = await acambiar_cantidades(request, {item_id: 0})
     
     return JsonResponse({
         'success': True,
         'mensaje': 'Item eliminado del carrito',
-        'total': float(item.carrito.total)
+        'total': resumen['total'],
+        'cantidad_carrito': resumen['cantidad_carrito']
     })
 
 
 def checkout(request):
     """Proceso de checkout"""
-    carrito = obtener_o_crear_carrito(request)
-    items = carrito.items.all()
+    carrito = obtener_carrito(request)
+    items = carrito.items()
     
     if not items:
         messages.warning(request, 'Tu carrito está vacío')
@@ -178,40 +244,23 @@ def checkout(request):
     if request.method == 'POST':
         form = PedidoForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                # Crear el pedido
-                pedido = form.save(commit=False)
-                if request.user.is_authenticated:
-                    pedido.usuario = request.user
-                
-                # Calcular totales
-                subtotal = carrito.total
-                impuestos = subtotal * Decimal('0.19')  # 19% IVA
-                total = subtotal + impuestos
-                
-                pedido.subtotal = subtotal
-                pedido.impuestos = impuestos
-                pedido.total = total
-                pedido.save()
-                
-                # Crear items del pedido y actualizar stock
-                for item in items:
-                    ItemPedido.objects.create(
-                        pedido=pedido,
-                        libro=item.libro,
-                        cantidad=item.cantidad,
-                        precio_unitario=item.libro.precio
-                    )
-                    
-                    # Actualizar stock
-                    item.libro.stock -= item.cantidad
-                    item.libro.save()
-                
-                # Limpiar carrito
-                items.delete()
-                
-                messages.success(request, f'Pedido #{pedido.id} creado exitosamente')
-                return redirect('confirmacion_pedido', pedido_id=pedido.id)
+            pedido = form.save(commit=False)
+            if request.user.is_authenticated:
+                pedido.usuario = request.user
+            
+            try:
+                carrito.confirmar(pedido)
+            except CarritoVacio as error:
+                # Otro envío del mismo formulario ya confirmó el pedido
+                messages.warning(request, str(error))
+                return redirect('ver_carrito')
+            except StockInsuficiente as error:
+                messages.error(request, str(error))
+                return redirect('ver_carrito')
+            
+            recordar_cantidad(request, carrito)
+            messages.success(request, f'Pedido #{pedido.id} creado exitosamente')
+            return redirect('confirmacion_pedido', pedido_id=pedido.id)
     else:
         # Pre-llenar formulario si el usuario está autenticado
         initial_data = {}
@@ -226,18 +275,16 @@ def checkout(request):
         'form': form,
         'carrito': carrito,
         'items': items,
-        'cantidad_carrito': carrito.cantidad_total,
     }
     return render(request, 'tienda/checkout.html', context)
 
 
 def confirmacion_pedido(request, pedido_id):
     """Página de confirmación del pedido"""
-    pedido = get_object_or_404(Pedido, id=pedido_id)
+    pedido = get_object_or_404(Pedido.objects.con_items(), id=pedido_id)
     
     context = {
         'pedido': pedido,
-        'cantidad_carrito': 0,  # Carrito ya está vacío
     }
     return render(request, 'tienda/confirmacion_pedido.html', context)
 
@@ -245,11 +292,10 @@ def confirmacion_pedido(request, pedido_id):
 @login_required
 def mis_pedidos(request):
     """Lista de pedidos del usuario"""
-    pedidos = Pedido.objects.filter(usuario=request.user).order_by('-fecha_creacion')
+    pedidos = Pedido.objects.filter(usuario=request.user).con_items().order_by('-fecha_creacion')
     
     context = {
         'pedidos': pedidos,
-        'cantidad_carrito': obtener_o_crear_carrito(request).cantidad_total,
     }
     return render(request, 'tienda/mis_pedidos.html', context)
 
@@ -257,11 +303,10 @@ def mis_pedidos(request):
 @login_required
 def detalle_pedido(request, pedido_id):
     """Detalle de un pedido específico"""
-    pedido = get_object_or_404(Pedido, id=pedido_id, usuario=request.user)
+    pedido = get_object_or_404(Pedido.objects.con_items(), id=pedido_id, usuario=request.user)
     
     context = {
         'pedido': pedido,
-        'cantidad_carrito': obtener_o_crear_carrito(request).cantidad_total,
     }
     return render(request, 'tienda/detalle_pedido.html', context)
 
@@ -274,34 +319,8 @@ def panel_vendedor(request):
         messages.error(request, 'No tienes permisos para acceder a esta sección')
         return redirect('index')
     
-    # Estadísticas básicas
-    total_libros = Libro.objects.count()
-    libros_activos = Libro.objects.filter(activo=True).count()
-    libros_sin_stock = Libro.objects.filter(stock=0).count()
-    
-    pedidos_pendientes = Pedido.objects.filter(estado='pendiente').count()
-    pedidos_hoy = Pedido.objects.filter(fecha_creacion__date=timezone.now().date()).count()
-    
-    # Ventas del mes actual
-    from django.db.models import Sum
-    ventas_mes = Pedido.objects.filter(
-        fecha_creacion__month=timezone.now().month,
-        fecha_creacion__year=timezone.now().year,
-        estado__in=['procesando', 'enviado', 'entregado']
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    # Últimos pedidos
-    ultimos_pedidos = Pedido.objects.order_by('-fecha_creacion')[:10]
-    
-    context = {
-        'total_libros': total_libros,
-        'libros_activos': libros_activos,
-        'libros_sin_stock': libros_sin_stock,
-        'pedidos_pendientes': pedidos_pendientes,
-        'pedidos_hoy': pedidos_hoy,
-        'ventas_mes': ventas_mes,
-        'ultimos_pedidos': ultimos_pedidos,
-    }
+    estadisticas, tiempos = estadisticas_panel()
+    context = {**estadisticas, 'tiempos_panel': tiempos, 'fragmentos': estadisticas_fragmentos()}
     return render(request, 'tienda/panel_vendedor.html', context)
 
 
@@ -312,36 +331,54 @@ def reportes_ventas(request):
         messages.error(request, 'No tienes permisos para acceder a esta sección')
         return redirect('index')
     
-    # Aquí puedes agregar más lógica para reportes avanzados
-    from django.db.models import Sum, Count
-    from datetime import datetime, timedelta
-    
-    # Ventas por mes (últimos 12 meses)
-    ventas_por_mes = []
-    for i in range(12):
-        fecha = timezone.now() - timedelta(days=30*i)
-        ventas = Pedido.objects.filter(
-            fecha_creacion__month=fecha.month,
-            fecha_creacion__year=fecha.year,
-            estado__in=['procesando', 'enviado', 'entregado']
-        ).aggregate(
-            total=Sum('total'),
-            cantidad=Count('id')
-        )
-        ventas_por_mes.append({
-            'mes': fecha.strftime('%Y-%m'),
-            'total': ventas['total'] or 0,
-            'cantidad': ventas['cantidad'] or 0
-        })
-    
-    # Libros más vendidos
-    libros_vendidos = ItemPedido.objects.values('libro__titulo').annotate(
-        cantidad_vendida=Sum('cantidad'),
-        ingresos=Sum('precio_unitario')
-    ).order_by('-cantidad_vendida')[:10]
+    desde, hasta, periodo = leer_rango(request.GET)
+    reporte = reporte_ventas(desde, hasta, periodo)
     
     context = {
-        'ventas_por_mes': ventas_por_mes,
-        'libros_vendidos': libros_vendidos,
+        'ventas_por_periodo': reporte['serie'],
+        'libros_vendidos': reporte['libros_vendidos'],
+        'total_ventas': reporte['total'],
+        'total_pedidos': reporte['cantidad'],
+        'periodo': periodo,
+        'desde': desde,
+        'hasta': hasta - timedelta(days=1),
+        'filtros_exportacion': urlencode({
+            'desde': desde.isoformat(),
+            'hasta': (hasta - timedelta(days=1)).isoformat(),
+            'periodo': periodo,
+        }),
     }
     return render(request, 'tienda/reportes_ventas.html', context)
+
+
+@login_required
+def exportar(request, datos, formato):
+    """Exporta pedidos, líneas de pedido o el reporte de ventas en CSV o XLSX"""
+    if not request.user.is_staff:
+        messages.error(request, 'No tienes permisos para acceder a esta sección')
+        return redirect('index')
+    if formato not in exportacion.TIPOS_CONTENIDO:
+        raise Http404('Formato no soportado')
+
+    desde, hasta, periodo = leer_rango(request.GET)
+    estado = request.GET.get('estado')
+    if estado not in dict(Pedido.ESTADO_CHOICES):
+        estado = None
+
+    if datos == 'pedidos':
+        encabezados, filas = exportacion.datos_pedidos(desde, hasta, estado)
+    elif datos == 'items':
+        encabezados, filas = exportacion.datos_items(desde, hasta, estado)
+    elif datos == 'ventas':
+        encabezados, filas = exportacion.datos_ventas(desde, hasta, periodo)
+    else:
+        raise Http404('Exportación no encontrada')
+
+    if formato == 'csv':
+        contenido = exportacion.filas_csv(encabezados, filas)
+    else:
+        contenido = exportacion.filas_xlsx(encabezados, filas, hoja=datos.capitalize())
+    respuesta = StreamingHttpResponse(contenido, content_type=exportacion.TIPOS_CONTENIDO[formato])
+    nombre = f'{datos}_{desde:%Y%m%d}_{hasta - timedelta(days=1):%Y%m%d}.{formato}'
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta